@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+
+# Compares the package joins of todo_generator.py and json_generator.py with
+# the linear scans they used to do, and the chroot state matrix of
+# html_generator.py with the per-package state checks it used to do, on
+# synthetic monitor responses.
+
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'copr-reporter'))
+
+import todo_generator
+import json_generator
+import html_generator
+
+NUM_PKGS = 25000
+CHROOTS = ['fedora-39-x86_64', 'fedora-39-aarch64', 'fedora-39-s390x', 'fedora-39-ppc64le']
+
+def make_monitor_packages(num_pkgs, seed):
+    packages = []
+    for i in range(num_pkgs):
+        # Leave out a few packages on each side, so the joins have misses.
+        if (i + seed) % 50 == 0:
+            continue
+        chroots = {}
+        for j, c in enumerate(CHROOTS):
+            chroots[c] = {'state' : 'failed' if (i + j + seed) % 9 == 0 else 'succeeded',
+                          'build_id' : 100000 + i, 'status' : 0}
+        packages.append({'name' : 'pkg{}'.format(i), 'chroots' : chroots})
+    return packages
+
+def linear_get_package(name, pkg_list):
+    for p in pkg_list:
+        if p['name'] == name:
+            return p
+    return None
+
+def linear_handle_missing_packages(packages_a, packages_b):
+    for p_a in packages_a:
+        if not linear_get_package(p_a['name'], packages_b):
+            packages_b.append({'name' : p_a['name'], 'chroots' : {} })
+    for p_b in packages_b:
+        if not linear_get_package(p_b['name'], packages_a):
+            packages_a.append({'name' : p_b['name'], 'chroots' : {} })
+
+# The current side of a TODO page as it used to be read, the whole monitor
+# response parsed and then scanned for each failed package, and as it is
+# read now, filtered while it streams in.
+def todo_join_linear(failed, monitor_current):
+    packages_current = json.loads(monitor_current)['packages']
+    return [linear_get_package(p['name'], packages_current) for p in failed]
+
+def todo_join_streaming(failed, monitor_current):
+    packages_current = todo_generator.get_packages_named(io.StringIO(monitor_current),
+                                                         set([p['name'] for p in failed]))
+    return [packages_current.get(p['name']) for p in failed]
+
+def dict_get_combined_build_state(chroots):
+    state = 'failed'
+    for c in chroots:
+        if chroots[c]['state'] == 'failed':
+            return 'failed'
+        if chroots[c]['state'] == 'succeeded':
+            state = 'succeeded'
+    return state
+
+def dict_get_state_change(chroots_a, chroots_b):
+    state = 'Same results'
+    for c in set(list(chroots_a) + list(chroots_b)):
+        if c not in chroots_a or c not in chroots_b:
+            continue
+        a = chroots_a[c]['state']
+        b = chroots_b[c]['state']
+        if a == 'succeeded' and b == 'failed':
+            return 'Regression'
+        if a == 'failed' and b == 'succeeded':
+            state = 'Fixed'
+        elif a != b:
+            state = 'Something has changed. You should verify the builds'
+    return state
+
+def make_report_packages(num_pkgs):
+    packages_a = {p['name'] : p for p in make_monitor_packages(num_pkgs, 1)}
+    packages_b = {p['name'] : p for p in make_monitor_packages(num_pkgs, 2)}
+    return [{'builds_a' : packages_a.get(n, {'chroots' : {}}), 'builds_b' : packages_b.get(n, {'chroots' : {}})}
+            for n in sorted(set(packages_a) | set(packages_b))]
+
+# What generate_todo_report() used to do for each package, including the
+# combined states it computed and never used.
+def states_dict(packages):
+    for p in packages:
+        dict_get_combined_build_state(p['builds_a']['chroots'])
+        dict_get_combined_build_state(p['builds_b']['chroots'])
+        dict_get_state_change(p['builds_a']['chroots'], p['builds_b']['chroots'])
+
+# What generate_todo_report() does now.
+def states_matrix(packages):
+    chroots, states = html_generator.get_state_tables(packages)
+    columns_a = html_generator.get_state_matrix(packages, 'builds_a', chroots, states)
+    columns_b = html_generator.get_state_matrix(packages, 'builds_b', chroots, states)
+    html_generator.get_state_changes(columns_a, columns_b, len(packages))
+    html_generator.get_chroot_summary(columns_b, chroots, states)
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def report(name, linear, indexed, labels = ('linear', 'indexed')):
+    print('{:<26} {} {:8.3f}s  {} {:8.3f}s  speedup {:8.1f}x'.format(
+          name, labels[0], linear, labels[1], indexed, linear / indexed))
+
+
+if __name__ == '__main__':
+    num_pkgs = NUM_PKGS
+    if len(sys.argv) == 2:
+        num_pkgs = int(sys.argv[1])
+    print('{} packages, {} chroots'.format(num_pkgs, len(CHROOTS)))
+
+    packages_next = make_monitor_packages(num_pkgs, 1)
+    monitor_current = json.dumps({'packages' : make_monitor_packages(num_pkgs, 2)})
+    failed = [p for p in packages_next
+              if todo_generator.get_combined_build_state(p['chroots']) != 'succeeded']
+    report('todo_generator join', timed(todo_join_linear, failed, monitor_current),
+           timed(todo_join_streaming, failed, monitor_current), ('linear', 'streaming'))
+
+    linear = timed(linear_handle_missing_packages, make_monitor_packages(num_pkgs, 1), make_monitor_packages(num_pkgs, 2))
+    indexed = timed(json_generator.handle_missing_packages, make_monitor_packages(num_pkgs, 1), make_monitor_packages(num_pkgs, 2))
+    report('handle_missing_packages', linear, indexed)
+
+    packages = make_report_packages(num_pkgs)
+    report('state aggregation', timed(states_dict, packages), timed(states_matrix, packages), ('dicts', 'matrix'))
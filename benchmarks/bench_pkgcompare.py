@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+
+# Times the status computation of a PkgCompare list the same way update.py
+# drives it: is_up_to_date() and get_other_pkg_status() from the stats loop,
+# then html_row().  The 'uncached' run times OriginalPkgCompare, a copy of
+# PkgCompare and its helpers from before NVRs were parsed once and cached.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rpm
+from dnf.subject import Subject
+import hawkey
+
+import update
+from update import KojiPkg, CoprPkg, PkgCompare, get_build_link
+
+NUM_PKGS = 20000
+
+class FakeCoprResults:
+    def get_build_link(self, pkg_id):
+        return 'https://copr.example/build/{}/'.format(pkg_id)
+
+def make_pkgs(num_pkgs):
+    baseline = []
+    test = []
+    for i in range(num_pkgs):
+        name = 'pkg{}'.format(i)
+        release = (i % 7) + 1
+        baseline.append(KojiPkg(name, '{}-1.{}.{}-{}.fc39'.format(name, i % 13, i % 5, release), i,
+                                'https://koji.example/koji/'))
+        test_release = release + (i % 3) - 1
+        test.append(CoprPkg(name, '{}-1.{}.{}-{}.fc39'.format(name, i % 13, i % 5, test_release), i,
+                            FakeCoprResults(), i % 11 != 0))
+    return baseline, test
+
+def run(baseline, test, compare_class):
+    start = time.perf_counter()
+    compare_list = []
+    for pkg, other_pkg in zip(baseline, test):
+        c = compare_class(pkg)
+        c.package_base_link = 'https://copr.example/package/'
+        c.add_other_pkg(other_pkg)
+        c.is_up_to_date()
+        c.get_other_pkg_status()
+        compare_list.append(c)
+    for index, c in enumerate(compare_list):
+        c.html_row(index, {})
+    return time.perf_counter() - start
+
+def remove_dist_tag(pkg):
+    return pkg.get_nvr_without_dist()
+
+def remove_epoch(pkg):
+    subject = Subject(pkg)
+    possible_nevr = subject.get_nevra_possibilities(forms=hawkey.FORM_NEVR)
+    if not len(possible_nevr):
+        print("Cannot remove epoch for ", pkg, sys.stderr)
+        return pkg
+
+    nevr = possible_nevr[0]
+    return "{}-{}-{}".format(nevr.name, nevr.version, nevr.release)
+
+class OriginalPkgCompare:
+
+    STATUS_REGRESSION = 0
+    STATUS_MISSING = 1
+    STATUS_OLD = 2
+    STATUS_FIXED = 3
+    STATUS_FAILED = 4
+    STATUS_PASS = 5
+
+    def __init__(self, pkg):
+        self.pkg = pkg
+        self.other_pkg = None
+        self.note = None
+
+    def add_other_pkg(self, pkg):
+        self.other_pkg = pkg
+
+    def add_note(self, note):
+        self.note = note
+
+    def compare_nvr(self, a_nvr, b_nvr):
+        subject_a = Subject(a_nvr)
+        subject_b = Subject(b_nvr)
+        possible_nevra_a = subject_a.get_nevra_possibilities(forms=hawkey.FORM_NEVR)
+        if not len(possible_nevra_a):
+            return 1
+        possible_nevra_b = subject_b.get_nevra_possibilities(forms=hawkey.FORM_NEVR)
+        if not len(possible_nevra_b):
+            return -1
+        nevra_a = possible_nevra_a[0]
+        nevra_b = possible_nevra_b[0]
+        return rpm.labelCompare(("", nevra_a.version, nevra_a.release), ("", nevra_b.version, nevra_b.release))
+
+    def is_up_to_date(self):
+        if not self.other_pkg:
+            return False
+        if not self.other_pkg.build_passes:
+            return False
+        pkg_nvr = remove_epoch(remove_dist_tag(self.pkg))
+        other_nvr = remove_epoch(remove_dist_tag(self.other_pkg))
+
+        return self.compare_nvr(pkg_nvr, other_nvr) <= 0
+
+    def get_pkg_status(self):
+        if not self.pkg.build_passes:
+            return self.STATUS_FAILED
+        else:
+            return self.STATUS_PASS
+
+    def get_other_pkg_status(self):
+        if not self.other_pkg:
+            return self.STATUS_MISSING
+
+        if not self.other_pkg.build_passes:
+            if self.get_pkg_status() == self.STATUS_PASS:
+                return self.STATUS_REGRESSION
+            return self.STATUS_FAILED
+
+        # other_pkg build passes
+        if not self.is_up_to_date():
+            return self.STATUS_OLD
+
+        # other pkg is up-to-date.
+        if self.get_pkg_status() == self.STATUS_FAILED:
+            return self.STATUS_FIXED
+
+        return self.STATUS_PASS
+
+
+    def html_row(self, index, pkg_notes):
+        row_style=''
+        clang_nvr=''
+        build_success = False
+        has_note = False
+
+        if index % 2 == 0:
+            row_style=" class='even_row'"
+        if self.other_pkg:
+            clang_nvr = self.other_pkg.nvr
+
+        column2 = ''
+        if not self.is_up_to_date():
+            column2 = "<a target='_blank' href='{}/rebuild'>Rebuild</a>".format(self.package_base_link + self.pkg.name)
+
+        column3 = ''
+        column4 = ''
+        status = self.get_other_pkg_status()
+        if status == self.STATUS_FIXED or status == self.STATUS_PASS:
+            column3 = "<a href='{link}'><span class='tooltip'>{clang_nvr}</span>{clang_nvr}</a>".format(
+                    link = get_build_link('', self.other_pkg),
+                    clang_nvr = clang_nvr)
+            column4 = "SAME"
+            build_success = True
+        else:
+            if status == self.STATUS_MISSING or status == self.STATUS_OLD:
+                url = self.package_base_link + self.pkg.name
+                text = 'MISSING'
+            else:
+                url = get_build_link('', self.other_pkg)
+                text = 'FAILED'
+
+            column3 = "<a href='{link}'>{text}</a>".format(link=url, text=text)
+
+            if status == self.STATUS_OLD:
+                column4 = "<a href='{link}'><span class='tooltip'>{clang_nvr}</span>{clang_nvr}</a>".format(
+                        link = get_build_link('', self.other_pkg),
+                        clang_nvr = clang_nvr)
+                build_success = True
+            else:
+                column4 = "NONE"
+
+        note = ""
+        short_note = ""
+        if self.note:
+            has_note = True
+            note = self.note
+            short_note = self.note
+
+        history_url = self.package_base_link + self.pkg.name
+        history="<a href='{history_url}'>[Build History]</a></td>".format(history_url=history_url)
+        if not update.use_copr and not self.other_pkg:
+           history=""
+
+        if not has_note and not build_success:
+            row_style=" class='todo_row'"
+
+        self.row_style = row_style
+        self.fedora_build_url = get_build_link('https://koji.fedoraproject.org/koji/', self.pkg)
+        self.nvr = self.pkg.nvr + (' (FAILED)' if update.use_copr and not self.pkg.build_passes else '')
+        self.rebuild_link = column2
+        self.clang_build_latest_url = column3
+        self.clang_build_url = column4
+        self.history = history
+
+
+if __name__ == '__main__':
+    num_pkgs = NUM_PKGS
+    if len(sys.argv) == 2:
+        num_pkgs = int(sys.argv[1])
+
+    baseline, test = make_pkgs(num_pkgs)
+    uncached = run(baseline, test, OriginalPkgCompare)
+
+    baseline, test = make_pkgs(num_pkgs)
+    cached = run(baseline, test, PkgCompare)
+
+    print('{} packages'.format(num_pkgs))
+    print('uncached: {:.3f}s'.format(uncached))
+    print('cached:   {:.3f}s'.format(cached))
+    print('speedup:  {:.1f}x'.format(uncached / cached))
@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+
+# Times how long update.py --watch takes to bring a status page up to date
+# after a build finishes, from the event being queued to the page being
+# written, against regenerating the whole page the way a normal run does.
+#
+#   python3 benchmarks/bench_watch.py [num_pkgs]
+
+import datetime
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+
+import fixtures
+import manifest
+import update
+from notes import EMPTY_NOTES
+from page_cache import PageHashStore
+from scheduler import Scheduler
+from snapshot_cache import CoprSnapshotStore
+from status_engine import PackageIndex
+from watch import BuildEvent, QueueEventSource, watch
+
+NUM_PKGS = 20000
+NUM_EVENTS = 50
+
+COPR_URL = 'https://copr.example'
+OWNER = '@fedora-llvm-team'
+BASELINE_PROJECT = 'clang-built-f38'
+TEST_PROJECT = 'clang-built-f39'
+
+def regenerate(baseline_pkgs, test_pkgs, package_base_link):
+    page = update.StatusPage('bench', baseline_pkgs, test_pkgs, EMPTY_NOTES, package_base_link)
+    update.render_status_page('bench', page.get_stats(), page.rows, datetime.datetime.utcnow())
+    return page
+
+def run(num_pkgs, workdir):
+    projects = {}
+    for seed, project in enumerate([BASELINE_PROJECT, TEST_PROJECT], 1):
+        projects[project] = {'packages' : fixtures.make_copr_packages(num_pkgs, seed)}
+    client = fixtures.CoprClient(projects)
+
+    update.scheduler = Scheduler(update.backend_limits)
+    update.copr_snapshots = CoprSnapshotStore(directory = os.path.join(workdir, 'copr-snapshots'))
+    update.page_hashes = PageHashStore(os.path.join(workdir, 'page-hashes.json'))
+    update.history = None
+    sources = {p : update.CoprResults(COPR_URL, OWNER, p, client) for p in projects}
+    spec = manifest.StatusPage('bench', {'baseline' : BASELINE_PROJECT, 'test' : TEST_PROJECT})
+    index = PackageIndex({p : r.packages.result() for p, r in sources.items()}, update.package_exclude_list)
+    baseline_pkgs = index.packages[BASELINE_PROJECT]
+    test_pkgs = index.packages[TEST_PROJECT]
+    package_base_link = sources[TEST_PROJECT].get_package_base_link()
+
+    start = time.perf_counter()
+    page = regenerate(baseline_pkgs, test_pkgs, package_base_link)
+    full = time.perf_counter() - start
+
+    watcher = update.Watcher([spec], [], [], sources, index, {'bench' : page}, False, False)
+    done = threading.Event()
+    def handle(events):
+        watcher.handle(events)
+        done.set()
+
+    source = QueueEventSource()
+    stop = threading.Event()
+    thread = threading.Thread(target = watch, args = (source, handle, stop))
+    thread.start()
+    latencies = []
+    names = sorted(test_pkgs)
+    try:
+        for i in range(NUM_EVENTS):
+            name = names[i * len(names) // NUM_EVENTS]
+            build = fixtures.make_copr_build(10000000 + i, name, '99.0.0-1.fc39', 'succeeded')
+            done.clear()
+            event = BuildEvent(TEST_PROJECT, name, build)
+            source.put(event)
+            done.wait()
+            latencies.append(time.time() - event.time)
+    finally:
+        stop.set()
+        thread.join()
+        update.scheduler.shutdown()
+    return full, latencies
+
+
+if __name__ == '__main__':
+    num_pkgs = NUM_PKGS
+    if len(sys.argv) == 2:
+        num_pkgs = int(sys.argv[1])
+
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        shutil.copy(os.path.join(ROOT, 'status-template.html'), workdir)
+        os.chdir(workdir)
+        try:
+            full, latencies = run(num_pkgs, workdir)
+        finally:
+            os.chdir(old_cwd)
+
+    print('{} packages, {} builds'.format(num_pkgs, len(latencies)))
+    print('full page:       {:.3f}s'.format(full))
+    print('watch, median:   {:.3f}s'.format(statistics.median(latencies)))
+    print('watch, max:      {:.3f}s'.format(max(latencies)))
@@ -0,0 +1,252 @@
+# Synthetic Copr, Koji and repodata responses for the benchmarks, and local
+# stand-ins that serve them in place of the real services.
+
+import gzip
+import hashlib
+import http.server
+import io
+import json
+import random
+import threading
+
+ARCHES = ['x86_64', 'aarch64', 'ppc64le', 's390x', 'i386', 'riscv64']
+
+RELEASE = '39'
+
+def get_names(num_pkgs):
+    return ['pkg{:05d}'.format(i) for i in range(num_pkgs)]
+
+def get_chroots(num_chroots):
+    return ['fedora-{}-{}'.format(RELEASE, a) for a in ARCHES[:num_chroots]]
+
+def get_version(rng):
+    return '{}.{}.{}-{}.fc{}'.format(rng.randint(0, 9), rng.randint(0, 20), rng.randint(0, 5),
+                                     rng.randint(1, 4), RELEASE)
+
+def make_copr_build(build_id, name, version, state):
+    return {'id' : build_id, 'state' : state,
+            'source_package' : {'name' : name, 'version' : version}}
+
+# package_proxy.get_list(..., with_latest_succeeded_build=True, with_latest_build=True)
+def make_copr_packages(num_pkgs, seed):
+    rng = random.Random(seed)
+    packages = []
+    for i, name in enumerate(get_names(num_pkgs)):
+        if rng.random() < 0.02:
+            continue
+        version = get_version(rng)
+        build_id = seed * 1000000 + i
+        if rng.random() < 0.1:
+            latest = make_copr_build(build_id, name, version, 'failed')
+            succeeded = None
+            if rng.random() < 0.5:
+                succeeded = make_copr_build(build_id - 500000, name, get_version(rng), 'succeeded')
+        else:
+            latest = make_copr_build(build_id, name, version, 'succeeded')
+            succeeded = latest
+        packages.append({'name' : name, 'builds' : {'latest' : latest, 'latest_succeeded' : succeeded}})
+    return packages
+
+# monitor_proxy.monitor()
+def make_monitor(num_pkgs, num_chroots, seed):
+    rng = random.Random(seed)
+    packages = []
+    for i, name in enumerate(get_names(num_pkgs)):
+        chroots = {}
+        for c in get_chroots(num_chroots):
+            chroots[c] = {'state' : 'failed' if rng.random() < 0.08 else 'succeeded',
+                          'build_id' : seed * 1000000 + i, 'status' : 0}
+        packages.append({'name' : name, 'chroots' : chroots})
+    return {'output' : 'ok', 'message' : '', 'packages' : packages}
+
+# project_proxy.get()
+def make_project(owner, project, num_chroots, results_url = 'https://download.copr.example/'):
+    repos = {}
+    for c in get_chroots(num_chroots):
+        repos[c] = '{}results/{}/{}/{}/'.format(results_url, owner, project, c)
+    return {'name' : project, 'ownername' : owner, 'full_name' : '{}/{}'.format(owner, project),
+            'chroot_repos' : repos}
+
+# listTagged(tag = tag, inherit = True, latest = True)
+def make_tagged(tag, num_pkgs, seed):
+    rng = random.Random(seed)
+    builds = []
+    for i, name in enumerate(get_names(num_pkgs)):
+        # Some builds are inherited from the previous release.
+        tag_name = tag if rng.random() < 0.8 else 'f{}'.format(int(RELEASE) - 1)
+        builds.append({'name' : name, 'nvr' : '{}-{}'.format(name, get_version(rng)),
+                       'build_id' : seed * 1000000 + i, 'tag_name' : tag_name,
+                       'owner_name' : 'someone', 'creation_time' : '2024-01-01 00:00:00',
+                       'package_id' : i, 'state' : 1, 'volume_name' : 'DEFAULT'})
+    return builds
+
+def make_primary(num_pkgs, seed):
+    rng = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<metadata xmlns="http://linux.duke.edu/metadata/common" '
+           'xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="{}">'.format(num_pkgs)]
+    for name in get_names(num_pkgs):
+        requires = ['make', 'cmake']
+        if rng.random() < 0.8:
+            requires.append(rng.choice(['gcc', 'gcc-c++', 'clang']))
+        entries = ''.join(['<rpm:entry name="{}"/>'.format(r) for r in requires])
+        out.append('<package type="rpm"><name>{}</name><arch>src</arch><format>'
+                   '<rpm:requires>{}</rpm:requires></format></package>'.format(name, entries))
+    out.append('</metadata>')
+    return gzip.compress(''.join(out).encode())
+
+BUILD_LOG_ERRORS = [
+    "foo.c:12:5: error: call to undeclared function 'bar'; ISO C99 and later do not support implicit function declarations [-Wimplicit-function-declaration]",
+    "foo.cpp:40:20: error: integer value 8 is outside the valid range of values [0, 7] for the enumeration type 'Mode' [-Wenum-constexpr-conversion]",
+    "ld.lld: error: undefined symbol: baz",
+    "FAIL: test-suite",
+    "error: Bad exit status from /var/tmp/rpm-tmp.XXXXXX (%build)",
+]
+
+# builder-live.log.gz of a failed build, ending in one of BUILD_LOG_ERRORS.
+def make_build_log(num_lines, error):
+    lines = ['[{:6d}] gcc -O2 -flto=auto -c src/file{}.c -o src/file{}.o'.format(i, i, i) for i in range(num_lines)]
+    lines.append(BUILD_LOG_ERRORS[error])
+    return gzip.compress('\n'.join(lines).encode())
+
+def make_repomd(primary):
+    checksum = hashlib.sha256(primary).hexdigest()
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<repomd xmlns="http://linux.duke.edu/metadata/repo"><data type="primary">'
+            '<checksum type="sha256">{}</checksum>'
+            '<location href="repodata/{}-primary.xml.gz"/></data></repomd>'.format(checksum, checksum)).encode()
+
+
+class Proxy:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+# Stand-in for copr.v3.Client.  projects maps a project name to a dict with
+# the 'packages', 'monitor', 'project' and 'builds' fixtures of that project.
+class CoprClient:
+    def __init__(self, projects):
+        self.projects = projects
+        self.package_proxy = Proxy(get_list = self.get_package_list, get = self.get_package)
+        self.build_proxy = Proxy(get_list = self.get_build_list)
+        self.monitor_proxy = Proxy(monitor = self.monitor)
+        self.project_proxy = Proxy(get = self.get_project)
+        self.base_proxy = Proxy(home = lambda : {})
+
+    def get_package_list(self, ownername, projectname, **kwargs):
+        return self.projects[projectname]['packages']
+
+    def get_package(self, ownername, projectname, packagename, **kwargs):
+        for p in self.projects[projectname]['packages']:
+            if p['name'] == packagename:
+                return p
+        raise Exception('No package {}'.format(packagename))
+
+    # Serves the 'builds' of the project, if it has any, newest first.
+    def get_build_list(self, ownername, projectname, pagination = None, **kwargs):
+        builds = sorted(self.projects[projectname].get('builds', []), key = lambda b : b['id'], reverse = True)
+        pagination = pagination or {}
+        offset = pagination.get('offset', 0)
+        return builds[offset:offset + pagination.get('limit', len(builds))]
+
+    def monitor(self, ownername, projectname, **kwargs):
+        return self.projects[projectname]['monitor']
+
+    # Stand-in for copr_monitor.open_monitor(), serving the monitor response
+    # as the text stream it would read from Copr.
+    def open_monitor(self, copr_url, ownername, projectname):
+        project = self.projects[projectname]
+        if 'monitor_json' not in project:
+            project['monitor_json'] = json.dumps(project['monitor'])
+        return io.StringIO(project['monitor_json'])
+
+    def get_project(self, ownername, projectname):
+        return self.projects[projectname]['project']
+
+
+class MulticallResult:
+    def __init__(self, result):
+        self.result = result
+
+class Multicall:
+    def __init__(self, session):
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def listTagged(self, tag, **kwargs):
+        return MulticallResult(self.session.listTagged(tag, **kwargs))
+
+# Stand-in for koji.ClientSession.  tags maps a tag to its listTagged() fixture.
+class KojiSession:
+    def __init__(self, tags):
+        self.tags = tags
+
+    def multicall(self, strict = False):
+        return Multicall(self)
+
+    def listTagged(self, tag, **kwargs):
+        return self.tags[tag.replace('-updates', '')]
+
+
+# Serves the build log of any failed build, picking its error from the path.
+class BuildLogServer:
+    def __init__(self, num_lines = 20000):
+        logs = [make_build_log(num_lines, i) for i in range(len(BUILD_LOG_ERRORS))]
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not self.path.endswith('builder-live.log.gz'):
+                    self.send_error(404)
+                    return
+                body = logs[sum(self.path.encode()) % len(logs)]
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# Serves repodata/repomd.xml and the primary metadata for any compose path.
+class RepodataServer:
+    def __init__(self, primary):
+        repomd = make_repomd(primary)
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.endswith('repomd.xml'):
+                    body = repomd
+                elif self.path.endswith('primary.xml.gz'):
+                    body = primary
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+
+# Times every stage of a status run against synthetic data served by local
+# stand-ins, for a range of project sizes and chroot counts, and writes the
+# timings as JSON so runs of different versions can be compared.
+#
+#   python3 benchmarks/run.py --sizes 1000,10000,50000 --chroots 1,6 --output bench.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'copr-reporter'))
+
+import fixtures
+import br_index
+import build_logs
+import update
+import todo_generator
+import html_generator
+from koji_backend import KojiBackend
+from notes import EMPTY_NOTES
+from scheduler import Scheduler
+from snapshot_cache import CoprSnapshotStore
+from status_engine import PackageIndex
+
+COPR_URL = 'https://copr.example'
+OWNER = '@fedora-llvm-team'
+BASELINE_PROJECT = 'clang-built-f38'
+TEST_PROJECT = 'clang-built-f39'
+TAG = 'f' + fixtures.RELEASE
+
+BUILD_LOG_PACKAGES = 200
+
+TODO_CONFIG = """[current]
+url={url}
+owner={owner}
+project={current}
+
+[next]
+url={url}
+owner={owner}
+project={next}
+"""
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd = ROOT,
+                                       stderr = subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+class Timer:
+    def __init__(self, num_pkgs, num_chroots):
+        self.num_pkgs = num_pkgs
+        self.num_chroots = num_chroots
+        self.results = []
+
+    def run(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        self.results.append({'packages' : self.num_pkgs, 'chroots' : self.num_chroots, 'stage' : stage,
+                             'seconds' : seconds,
+                             'max_rss_kb' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+        print('{:>6} pkgs {} chroots  {:<28} {:9.3f}s'.format(self.num_pkgs, self.num_chroots, stage, seconds))
+        return result
+
+def get_copr_packages(client):
+    return [update.CoprResults(COPR_URL, OWNER, p, client).packages.result()
+            for p in [BASELINE_PROJECT, TEST_PROJECT]]
+
+def get_koji_packages(backend, br_pkgs):
+    tagged = update.scheduler.submit('koji', 'koji', backend.list_tagged, [TAG])
+    br = update.scheduler.submit('eln-buildrequires', 'local', lambda : br_pkgs)
+    return update.KojiResults(TAG, tagged, br).packages.result()
+
+def run_benchmark(num_pkgs, num_chroots, workdir):
+    timer = Timer(num_pkgs, num_chroots)
+    update.get_version_key.cache_clear()
+    html_generator.get_environment.cache_clear()
+
+    log_server = fixtures.BuildLogServer()
+    projects = {}
+    for seed, project in enumerate([BASELINE_PROJECT, TEST_PROJECT], 1):
+        projects[project] = {'packages' : fixtures.make_copr_packages(num_pkgs, seed),
+                             'monitor' : fixtures.make_monitor(num_pkgs, num_chroots, seed),
+                             'project' : fixtures.make_project(OWNER, project, num_chroots, log_server.url)}
+    copr_client = fixtures.CoprClient(projects)
+    koji_session = fixtures.KojiSession({TAG : fixtures.make_tagged(TAG, num_pkgs, 3)})
+    server = fixtures.RepodataServer(fixtures.make_primary(num_pkgs, 4))
+
+    update.scheduler = Scheduler(update.backend_limits)
+    update.copr_snapshots = CoprSnapshotStore(directory = os.path.join(workdir, 'copr-snapshots'))
+    br_index.ELN_URL = server.url + '{}/'
+    br_index.BR_INDEX_DIR = os.path.join(workdir, 'br-index')
+    requires = ['gcc', 'gcc-c++', 'clang']
+    try:
+        br_pkgs = timer.run('fetch-buildrequires-cold', br_index.get_reverse_requires, 'eln', requires)
+        timer.run('fetch-buildrequires-warm', br_index.get_reverse_requires, 'eln', requires)
+
+        timer.run('fetch-copr-cold', get_copr_packages, copr_client)
+        test_pkgs = timer.run('fetch-copr-warm', get_copr_packages, copr_client)[1]
+
+        koji_backend = KojiBackend('https://koji.example/kojihub')
+        koji_backend.session = koji_session
+        baseline_pkgs = timer.run('fetch-koji', get_koji_packages, koji_backend, br_pkgs)
+    finally:
+        server.shutdown()
+        update.scheduler.shutdown()
+
+    index = timer.run('package-index', PackageIndex, {TAG : baseline_pkgs, TEST_PROJECT : test_pkgs},
+                      update.package_exclude_list)
+    baseline_pkgs = index.packages[TAG]
+    test_pkgs = index.packages[TEST_PROJECT]
+    comparison = timer.run('pkgcompare', update.get_comparison, baseline_pkgs, test_pkgs, EMPTY_NOTES)
+    stats = timer.run('stats', comparison.get_stats)
+    pkg_compare_list = timer.run('pkgcompare-objects', update.compare_packages, baseline_pkgs, test_pkgs, comparison,
+                                 'https://copr.example/package/')
+    rows = timer.run('status-rows', update.get_status_rows, pkg_compare_list, EMPTY_NOTES)
+    date = datetime.datetime.utcnow()
+    timer.run('render-status', update.render_status_page, 'bench', stats, rows, date)
+    timer.run('render-status-data', update.render_status_page, 'bench-data', stats, rows, date, True)
+    matrix_rows = timer.run('matrix-rows', update.get_matrix_rows, index, [TAG, TEST_PROJECT])
+    timer.run('render-matrix', update.render_matrix_page, 'bench', [TAG, TEST_PROJECT], matrix_rows, date)
+
+    config_file = os.path.join(workdir, 'bench.ini')
+    with open(config_file, 'w') as f:
+        f.write(TODO_CONFIG.format(url = COPR_URL, owner = OWNER, current = BASELINE_PROJECT, next = TEST_PROJECT))
+    for project in [BASELINE_PROJECT, TEST_PROJECT]:
+        copr_client.open_monitor(COPR_URL, OWNER, project).close()
+    packages = timer.run('todo-packages', todo_generator.get_todo_packages, config_file,
+                         lambda **kwargs : copr_client, copr_client.open_monitor, None)
+
+    # Only a slice of the failures, the logs are big.
+    failed = [p['builds_b'] for p in packages.values()][:BUILD_LOG_PACKAGES]
+    analyzer = build_logs.BuildLogAnalyzer(os.path.join(workdir, 'build-logs'))
+    try:
+        timer.run('todo-build-logs-cold', todo_generator.add_failure_tags, failed, analyzer.analyze)
+        timer.run('todo-build-logs-warm', todo_generator.add_failure_tags, failed, analyzer.analyze)
+    finally:
+        log_server.shutdown()
+        build_logs.log_analyzer.shutdown()
+    timer.run('todo-render', html_generator.generate_todo_report, packages, 'bench-todo.html')
+    timer.run('todo-render-data', html_generator.generate_todo_report, packages, 'bench-data-todo.html',
+              'template.html', 'bench-todo-data.json')
+    return timer.results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default = '1000,10000,50000',
+                        help = 'Comma separated numbers of packages per project')
+    parser.add_argument('--chroots', default = '1,6',
+                        help = 'Comma separated numbers of chroots per project (at most {})'.format(len(fixtures.ARCHES)))
+    parser.add_argument('--output', default = 'bench_results.json',
+                        help = 'Where to write the timings')
+    args = parser.parse_args()
+
+    results = []
+    old_cwd = os.getcwd()
+    output = os.path.abspath(args.output)
+    for num_pkgs in [int(s) for s in args.sizes.split(',')]:
+        for num_chroots in [int(c) for c in args.chroots.split(',')]:
+            with tempfile.TemporaryDirectory() as workdir:
+                # The pages are written to, and the templates read from, the
+                # current directory.
+                for t in ['template.html', 'status-template.html', 'matrix-template.html']:
+                    shutil.copy(os.path.join(ROOT, t), workdir)
+                os.mkdir(os.path.join(workdir, 'status'))
+                with open(os.path.join(workdir, 'status', 'fedora-{}.cfg'.format(fixtures.RELEASE)), 'w') as f:
+                    f.write('[willfix]\n\n[wontfix]\n')
+                os.chdir(workdir)
+                try:
+                    results += run_benchmark(num_pkgs, num_chroots, workdir)
+                finally:
+                    os.chdir(old_cwd)
+
+    with open(output, 'w') as f:
+        json.dump({'commit' : get_commit(),
+                   'date' : datetime.datetime.utcnow().isoformat(),
+                   'python' : platform.python_version(),
+                   'machine' : platform.machine(),
+                   'results' : results}, f, indent = 2)
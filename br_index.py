@@ -0,0 +1,154 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+import sys
+import urllib.request
+import xml.etree.ElementTree as ET
+
+from tracing import tracer
+
+# Fedora and ELN ship primary.xml.zst, which needs python3-zstandard.
+# Without it, those repos are read with dnf instead.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BR_INDEX_DIR = '.cache/br-index'
+
+REPO_NS = '{http://linux.duke.edu/metadata/repo}'
+COMMON_NS = '{http://linux.duke.edu/metadata/common}'
+RPM_NS = '{http://linux.duke.edu/metadata/rpm}'
+
+ELN_COMPOSES = ['BaseOS', 'AppStream', 'CRB', 'Extras']
+ELN_URL = 'https://odcs.fedoraproject.org/composes/production/latest-Fedora-ELN/compose/{}/source/tree/'
+
+# Releases that went EOL are moved from dl.fedoraproject.org to the archive.
+FEDORA_MIRRORS = [
+    'https://dl.fedoraproject.org/pub/fedora/linux',
+    'https://archives.fedoraproject.org/pub/archive/fedora/linux'
+]
+# Seconds a mirror may take to answer or to send more data, so a stalled
+# download fails and is retried instead of holding its worker.
+SOCKET_TIMEOUT = 60
+
+FEDORA_REPOS = ['releases/{}/Everything/source/tree/', 'updates/{}/Everything/source/tree/']
+
+def get_repo_urls(release):
+    if release == 'eln':
+        return [[ELN_URL.format(c)] for c in ELN_COMPOSES]
+    version = release[1:]
+    return [['{}/{}'.format(m, r.format(version)) for m in FEDORA_MIRRORS] for r in FEDORA_REPOS]
+
+def get_primary_location(baseurl):
+    with urllib.request.urlopen(baseurl + 'repodata/repomd.xml', timeout = SOCKET_TIMEOUT) as f:
+        repomd = ET.parse(f)
+    for data in repomd.getroot().iter(REPO_NS + 'data'):
+        if data.get('type') != 'primary':
+            continue
+        checksum = data.find(REPO_NS + 'checksum').text
+        href = data.find(REPO_NS + 'location').get('href')
+        return checksum, baseurl + href
+    raise Exception('No primary metadata in {}'.format(baseurl))
+
+def open_compressed(f, url):
+    if url.endswith('.gz'):
+        return gzip.GzipFile(fileobj = f)
+    if url.endswith('.xz'):
+        return lzma.LZMAFile(f)
+    if url.endswith('.bz2'):
+        return bz2.BZ2File(f)
+    if url.endswith('.zst'):
+        return zstandard.ZstdDecompressor().stream_reader(f)
+    return f
+
+def parse_requires(f, requires):
+    index = {r : set() for r in requires}
+    context = ET.iterparse(f, events = ('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag != COMMON_NS + 'package':
+            continue
+        name = elem.findtext(COMMON_NS + 'name')
+        for entry in elem.iterfind('{}format/{}requires/{}entry'.format(COMMON_NS, RPM_NS, RPM_NS)):
+            r = entry.get('name')
+            if r in index:
+                index[r].add(name)
+        # Drop the packages we've already seen, so memory use stays flat.
+        root.clear()
+    return index
+
+def get_index_path(checksum):
+    return os.path.join(BR_INDEX_DIR, '{}.json'.format(checksum))
+
+def load_index(checksum, requires):
+    try:
+        with open(get_index_path(checksum)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not set(requires).issubset(index):
+        return None
+    return index
+
+def save_index(checksum, index):
+    path = get_index_path(checksum)
+    os.makedirs(BR_INDEX_DIR, exist_ok = True)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump({r : sorted(p) for r, p in index.items()}, f)
+    os.replace(tmp, path)
+
+def get_repo_index(baseurls, requires):
+    error = None
+    for baseurl in baseurls:
+        try:
+            checksum, primary_url = get_primary_location(baseurl)
+            break
+        except Exception as e:
+            error = e
+    else:
+        raise error
+
+    index = load_index(checksum, requires)
+    if index is not None:
+        return index
+
+    if primary_url.endswith('.zst') and zstandard is None:
+        index = get_repo_index_dnf(baseurl, requires)
+    else:
+        with tracer.span('primary.xml', 'repodata', url = primary_url) as span:
+            with urllib.request.urlopen(primary_url, timeout = SOCKET_TIMEOUT) as f:
+                span.set(bytes = int(f.headers.get('Content-Length', 0)) or None)
+                index = parse_requires(open_compressed(f, primary_url), requires)
+    save_index(checksum, index)
+    return index
+
+def get_repo_index_dnf(baseurl, requires):
+    import dnf
+    base = dnf.Base()
+    base.repos.add_new_repo('br-index', base.conf, baseurl = [baseurl])
+    with tracer.span('dnf sack', 'repodata', url = baseurl):
+        base.fill_sack(load_system_repo = False)
+    q = base.sack.query().available()
+    index = {r : set([p.name for p in q.filter(requires = [r])]) for r in requires}
+    base.close()
+    return index
+
+def get_reverse_requires(release, requires):
+    pkgs = set()
+    for baseurls in get_repo_urls(release):
+        index = get_repo_index(baseurls, requires)
+        for r in requires:
+            pkgs.update(index[r])
+    return pkgs
+
+
+if __name__ == '__main__':
+    release = 'eln'
+    if len(sys.argv) == 2:
+        release = sys.argv[1]
+    for p in sorted(get_reverse_requires(release, ['gcc', 'gcc-c++', 'clang'])):
+        print(p)
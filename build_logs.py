@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+
+# Tags the failed builds of the TODO pages with the kind of failure, by
+# matching a set of signatures against their build logs.  The logs of
+# finished builds never change, so the tags of each one are cached on disk
+# under its build id and a log is only downloaded once.
+#
+#   python3 build_logs.py https://.../builder-live.log.gz
+
+import concurrent.futures
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import urllib.request
+
+from tracing import tracer
+
+BUILD_LOG_DIR = '.cache/build-logs'
+
+# Number of build logs downloaded at the same time, across all TODO pages.
+FETCH_LIMIT = 8
+
+CHUNK_SIZE = 1 << 20
+
+# Seconds Copr may take to answer or to send more of a log.  A stalled
+# download fails like any other unreadable log instead of holding up the
+# TODO page.
+SOCKET_TIMEOUT = 60
+
+MAX_LINE_LENGTH = 200
+
+# (tag, description, patterns) of the failures worth telling apart.  A log
+# gets the tag of every signature with a pattern that matches one of its
+# lines, and the first matching line is kept to propose notes from, so the
+# more specific signatures come first.  Patterns must not match across
+# lines, and are kept apart rather than joined with |, since re only skips
+# ahead to a literal prefix when there is one.
+SIGNATURES = [
+    ('enum-constexpr-conversion', 'Integer value outside the range of an enum in a constant expression',
+     [r"-Wenum-constexpr-conversion", r"is outside the valid range of values \[[^]\n]*\] for (?:the )?enumeration type"]),
+    ('implicit-function-declaration', 'Call to an undeclared function',
+     [r"call to undeclared (?:library )?function", r"-Wimplicit-function-declaration"]),
+    ('implicit-int', 'Missing type specifier',
+     [r"-Wimplicit-int", r"type specifier missing, defaults to 'int'"]),
+    ('incompatible-function-pointer-types', 'Incompatible function pointer types',
+     [r"-Wincompatible-function-pointer-types"]),
+    ('int-conversion', 'Incompatible integer to pointer conversion',
+     [r"-Wint-conversion"]),
+    ('register', "ISO C++17 does not allow the 'register' storage class",
+     [r"ISO C\+\+17 does not allow 'register' storage class specifier"]),
+    ('unsupported-option', 'Compiler option that clang does not support',
+     [r"error: unknown argument", r"error: unsupported option", r"error: optimization flag '[^'\n]*' is not supported",
+      r"error: unknown warning option"]),
+    ('lto', 'Object files the linker can not read',
+     [r"file format not recognized", r"plugin needed to handle lto object", r"error: Invalid record"]),
+    ('undefined-symbol', 'Undefined symbol at link time',
+     [r"undefined reference to [`']", r"error: undefined symbol"]),
+    ('fortran', 'Needs a Fortran compiler',
+     [r"gfortran", r"o Fortran compiler"]),
+    ('missing-file', 'File listed in %files not found',
+     [r"File not found: /"]),
+    ('missing-buildrequires', 'Build dependencies can not be installed',
+     [r"No matching package to install", r"nothing provides [^\n]* needed by"]),
+    ('test-failure', 'Test failure',
+     [r"\nFAIL: ", r"\*\*\* \[[^]\n]*(?:check|test)[^]\n]*\] Error"]),
+]
+
+PATTERNS = [(s[0], [re.compile(p.encode()) for p in s[2]]) for s in SIGNATURES]
+
+# Cached tags are thrown away when the signatures change.
+SIGNATURES_HASH = hashlib.sha256(json.dumps(SIGNATURES).encode()).hexdigest()
+
+DESCRIPTIONS = {s[0] : s[1] for s in SIGNATURES}
+
+def get_line(data, pos):
+    start = data.rfind(b'\n', 0, pos) + 1
+    end = data.find(b'\n', pos)
+    if end < 0:
+        end = len(data)
+    return data[start:end].decode('utf-8', 'replace').strip()[:MAX_LINE_LENGTH]
+
+# Returns {'tags' : [...], 'lines' : {tag : line}} for the log read from f,
+# with the first line each tag matched.  The log is scanned a chunk at a
+# time, cut at the last full line, and a signature is no longer searched
+# for once it has matched.  Every chunk starts with the newline before its
+# first line, so patterns can match the start of a line with \n.
+def scan_log(f, chunk_size = CHUNK_SIZE):
+    lines = {}
+    patterns = PATTERNS
+    rest = b'\n'
+    while patterns:
+        chunk = f.read(chunk_size)
+        data = rest + chunk
+        if chunk:
+            end = data.rfind(b'\n')
+            data, rest = data[:end], data[end:]
+        for tag, alternatives in patterns:
+            ends = [m.end() for m in [p.search(data) for p in alternatives] if m]
+            if ends:
+                lines[tag] = get_line(data, min(ends) - 1)
+        patterns = [(tag, alternatives) for tag, alternatives in patterns if tag not in lines]
+        if not chunk:
+            break
+    return {'tags' : [s[0] for s in SIGNATURES if s[0] in lines], 'lines' : lines}
+
+# Copr serves the logs gzipped, but fall back to plain text if they are not.
+def open_log(f):
+    f = io.BufferedReader(f)
+    if f.peek(2)[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj = f)
+    return f
+
+def fetch_log(url):
+    with tracer.span('build log', 'build-logs', url = url) as span:
+        with urllib.request.urlopen(url, timeout = SOCKET_TIMEOUT) as f:
+            span.set(bytes = int(f.headers.get('Content-Length', 0)) or None)
+            return scan_log(open_log(f))
+
+
+class BuildLogAnalyzer:
+    def __init__(self, directory = BUILD_LOG_DIR, max_workers = FETCH_LIMIT, fetch = fetch_log):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.fetch = fetch
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def get_path(self, build_id, chroot):
+        return os.path.join(self.directory, '{}-{}.json'.format(build_id, chroot))
+
+    def load(self, build_id, chroot):
+        try:
+            with open(self.get_path(build_id, chroot)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('signatures') != SIGNATURES_HASH:
+            return None
+        return cached['result']
+
+    def save(self, build_id, chroot, result):
+        path = self.get_path(build_id, chroot)
+        os.makedirs(self.directory, exist_ok = True)
+        tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(tmp, 'w') as f:
+            json.dump({'signatures' : SIGNATURES_HASH, 'result' : result}, f)
+        os.replace(tmp, path)
+
+    def analyze(self, build_id, chroot, url):
+        result = self.load(build_id, chroot)
+        if result is None:
+            result = self.fetch(url)
+            self.save(build_id, chroot, result)
+        return result
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = concurrent.futures.ThreadPoolExecutor(max_workers = self.max_workers,
+                                                                  thread_name_prefix = 'build-logs')
+            return self.pool
+
+    # builds is a list of (build_id, chroot, url) tuples.  Returns the
+    # result of analyze(), or of the analyze function given in its place,
+    # for each of them, and None for the logs that could not be read.
+    def analyze_all(self, builds, analyze = None):
+        analyze = analyze or self.analyze
+        futures = [self.get_pool().submit(analyze, *b) for b in builds]
+        results = []
+        for b, f in zip(builds, futures):
+            try:
+                results.append(f.result())
+            except Exception as e:
+                print('Failed to read build log {}: {}'.format(b[2], e), file = sys.stderr)
+                results.append(None)
+        return results
+
+    def shutdown(self, wait = True):
+        with self.lock:
+            if self.pool:
+                self.pool.shutdown(wait)
+            self.pool = None
+
+log_analyzer = BuildLogAnalyzer()
+
+
+if __name__ == '__main__':
+    for url in sys.argv[1:]:
+        result = fetch_log(url)
+        print(url)
+        for tag in result['tags']:
+            print('  {}: {}'.format(tag, result['lines'][tag]))
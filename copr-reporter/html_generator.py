@@ -1,5 +1,8 @@
+import array
 import json
 import datetime
+import functools
+import os
 import configparser
 import io
 import urllib.request
@@ -7,80 +10,217 @@ import urllib.request
 import jinja2
 
 
+TEMPLATE_CACHE_DIR = '.cache/jinja'
+
+STATE_ICONS = {
+    'importing' : 'bi-hourglass-top', 'pending' : 'bi-hourglass-top',
+    'starting' : 'bi-hourglass-split', 'running' : 'bi-hourglass-split',
+    'succeeded' : 'bi-check-circle', 'forked' : 'bi-check-circle', 'skipped' : 'bi-check-circle',
+    'failed' : 'bi-exclamation-octagon',
+    'canceled' : 'bi-slash-circle'
+}
+
+# Chroot build states are encoded as indexes into a table of state names,
+# which always starts with these.  NO_BUILD marks a chroot a package has no
+# entry for.
+SUCCEEDED = 0
+FAILED = 1
+MISSING = 2
+NO_BUILD = 255
+
+# The values of get_state_changes(), in order of precedence.
+SAME = 0
+FIXED = 1
+CHANGED = 2
+REGRESSION = 3
+CHANGE_NAMES = ['Same results', 'Fixed', 'Something has changed. You should verify the builds', 'Regression']
+
+# One environment per template directory, shared by every page we render.
+# Compiled templates are also kept on disk, so later runs skip compiling.
+@functools.lru_cache(maxsize = None)
+def get_environment(searchpath):
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok = True)
+    loader = jinja2.FileSystemLoader(searchpath=searchpath)
+    return jinja2.Environment(loader=loader,
+                              bytecode_cache=jinja2.FileSystemBytecodeCache(TEMPLATE_CACHE_DIR))
+
+def get_template(template_file):
+    environment = get_environment(os.path.dirname(template_file) or "./")
+    return environment.get_template(os.path.basename(template_file))
+
+def render_to_file(template_file, output, **context):
+    template = get_template(template_file)
+    with open(output, 'w') as f:
+        template.stream(**context).dump(f)
+
 # TODO: Add a summary of the new broken packages
 # TODO: Add in the summary the total amount of packages
-def generate_report(title, results, description):
-    loader = jinja2.FileSystemLoader(searchpath="./")
-    environment = jinja2.Environment(loader=loader)
-    file = "template.html"
-
-    template = environment.get_template(file)
-    text = template.render(
+def generate_report(title, results, description, output = 'report.html', template_file = 'template.html',
+                    data_file = None, summary = None):
+    render_to_file(template_file, output,
         title=title,
         date=datetime.datetime.now().isoformat(),
         results=results,
-        description = description
+        description = description,
+        data_file = data_file,
+        summary = summary,
+        icons = STATE_ICONS
     )
-    report = open("report.html", 'w')
-    report.write(text)
-    report.close()
-
-def get_combined_build_state(chroots):
-    state = None
-    for c in chroots:
-        chroot = chroots[c]
-        if chroot['state'] == 'failed':
-            state = 'failed'
-            break
-        if chroot['state'] == 'succeeded':
-            state = 'succeeded'
-            continue
-        if chroot['state'] == 'missing':
-            if not state:
-                state = 'missing'
-            continue
-    return 'failed' if not state else state
-
-
-def get_state_change(chroots_a, chroots_b):
-    chroots = set(chroots_a.keys()) | set(chroots_b.keys())
-    state = "Same results"
-    for c in chroots:
-        if c not in chroots_a or c not in chroots_b:
-            continue
-        chroot_a = chroots_a[c]
-        chroot_b = chroots_b[c]
-
-        if chroot_a['state'] == 'succeeded' and chroot_b['state'] == 'failed':
-            return 'Regression'
-        if chroot_a['state'] == 'failed' and chroot_b['state'] == 'succeeded':
-            state = "Fixed"
-            continue
-        if chroot_a['state'] != chroot_b['state']:
-            state = "Something has changed. You should verify the builds"
-            continue
-    return state
 
+def get_index(table, key):
+    return table.setdefault(key, len(table))
 
-if __name__ == '__main__':
+def get_builds_data(builds, chroots, states):
+    data = []
+    for k, b in sorted(builds['chroots'].items()):
+        data.append([get_index(chroots, k), get_index(states, b['state']),
+                     b.get('url_build_log', ''), b.get('url_resubmit', '')])
+    return [builds.get('url_rebuild', ''), data]
+
+# Writes the rows of a TODO page in the compact form the client side
+# renderer in template.html expects.  Chroot names and states are stored
+# once and referenced by index, using the tables of the state matrix if
+# there is one.
+def write_todo_data(packages, data_file, chroots = None, states = None):
+    chroots = chroots if chroots is not None else {}
+    states = states if states is not None else {}
+    rows = []
+    for name, data in packages.items():
+        rows.append([name,
+                     get_builds_data(data['builds_a'], chroots, states),
+                     get_builds_data(data['builds_b'], chroots, states),
+                     data['changed'] if data['changed'] == 'Regression' else '',
+                     data.get('tags', []),
+                     data['note']])
+    with open(data_file, 'w') as f:
+        json.dump({'chroots' : list(chroots), 'states' : list(states), 'packages' : rows},
+                  f, separators=(',', ':'))
+
+def get_state_index(states, state):
+    index = get_index(states, state)
+    if index >= NO_BUILD:
+        raise Exception('too many build states')
+    return index
+
+def get_state_tables(packages):
+    chroots = {}
+    for c in sorted(set().union(*[p[side]['chroots'] for p in packages for side in ['builds_a', 'builds_b']])):
+        get_index(chroots, c)
+    states = {}
+    for state in ['succeeded', 'failed', 'missing']:
+        get_index(states, state)
+    return chroots, states
+
+# Returns one column per chroot, holding the state of that chroot for every
+# package, in the order of packages.
+def get_state_matrix(packages, side, chroots, states):
+    columns = [array.array('B', [NO_BUILD]) * len(packages) for c in chroots]
+    for i, p in enumerate(packages):
+        for c, b in p[side]['chroots'].items():
+            state = states.get(b['state'])
+            if state is None:
+                state = get_state_index(states, b['state'])
+            columns[chroots[c]][i] = state
+    return columns
+
+# The columns are processed whole: translating a column through one of these
+# tables gives a byte per package that is 1 if its state is in the table, and
+# reading those bytes as one integer gives a mask that can be combined with
+# the masks of other columns with bitwise operators.
+def get_table(states):
+    table = bytearray(256)
+    for state in states:
+        table[state] = 1
+    return bytes(table)
+
+IS_SUCCEEDED = get_table([SUCCEEDED])
+IS_FAILED = get_table([FAILED])
+HAS_BUILD = get_table(range(NO_BUILD))
+IS_NONZERO = get_table(range(1, 256))
+
+def get_mask(column, table):
+    return int.from_bytes(bytes(column).translate(table), 'little')
+
+def get_codes(mask, num_packages):
+    return mask.to_bytes(num_packages, 'little')
+
+def count_packages(mask):
+    return bin(mask).count('1')
+
+# Compares the chroots that both sides have.  A regression in any chroot
+# wins over any other change, and any other change wins over a fix.
+# Indexed by regression << 2 | changed << 1 | fixed.
+CHANGES = bytes([SAME, FIXED, CHANGED, CHANGED] + [REGRESSION] * 4 + [SAME] * 248)
+
+def get_state_changes(columns_a, columns_b, num_packages):
+    regression = changed = fixed = 0
+    for column_a, column_b in zip(columns_a, columns_b):
+        both = get_mask(column_a, HAS_BUILD) & get_mask(column_b, HAS_BUILD)
+        differ = int.from_bytes(column_a, 'little') ^ int.from_bytes(column_b, 'little')
+        differ = get_mask(get_codes(differ, num_packages), IS_NONZERO)
+        column_regression = get_mask(column_a, IS_SUCCEEDED) & get_mask(column_b, IS_FAILED)
+        column_fixed = get_mask(column_a, IS_FAILED) & get_mask(column_b, IS_SUCCEEDED)
+        regression |= column_regression
+        fixed |= column_fixed
+        changed |= differ & both & ~column_regression & ~column_fixed
+    return list(get_codes(regression << 2 | changed << 1 | fixed, num_packages).translate(CHANGES))
+
+# Counts the states of each chroot, and the packages that fail in that
+# chroot and in no other.
+def get_chroot_summary(columns, chroots, states):
+    failed_once = failed_more = 0
+    for column in columns:
+        failed = get_mask(column, IS_FAILED)
+        failed_more |= failed_once & failed
+        failed_once |= failed
+    failed_once &= ~failed_more
+
+    summary = []
+    for c, column in zip(chroots, columns):
+        counts = {}
+        for state, i in states.items():
+            n = column.count(i)
+            if n:
+                counts[state] = n
+        summary.append({'chroot' : c, 'arch' : c.split('-')[-1], 'counts' : counts,
+                        'failed' : counts.get('failed', 0),
+                        'failed_only_here' : count_packages(get_mask(column, IS_FAILED) & failed_once)})
+    return summary
+
+
+def load_packages(packages_file = 'packages.json'):
+    with open(packages_file, "r") as f:
+        return json.load(f)
+
+def generate_todo_report(packages, output = 'report.html', template_file = 'template.html', data_file = None):
     title = "Clang Mass Rebuild TODO dashboard"
-    packages = {}
-    with open("packages.json", "r") as f:
-        packages = json.load(f)
 
     current_ver = None
     next_ver = None
 
-    for k, v in packages.items():
-        packages[k]['changed'] = 'Same results'
-        state_a = get_combined_build_state(packages[k]['builds_a']['chroots'])
-        state_b = get_combined_build_state(packages[k]['builds_b']['chroots'])
-        packages[k]['changed'] = get_state_change(packages[k]['builds_a']['chroots'], packages[k]['builds_b']['chroots'])
+    description = ''
+    rows = list(packages.values())
+    chroots, states = get_state_tables(rows)
+    columns_a = get_state_matrix(rows, 'builds_a', chroots, states)
+    columns_b = get_state_matrix(rows, 'builds_b', chroots, states)
+    for p, change in zip(rows, get_state_changes(columns_a, columns_b, len(rows))):
+        p['changed'] = CHANGE_NAMES[change]
+    summary = get_chroot_summary(columns_b, chroots, states)
+    if rows:
         description = f"""
     Explanation of the columns:<ul>
     <li>Name: The name of the package.</li>
     <li>Builds with current Clang release on {current_ver}.</li>
     <li>Builds with next Clang release on {next_ver}.</li>
-    <li>Changes: Notes so you can search results easily.</li></ul>
+    <li>Changes: Notes so you can search results easily.</li>
+    <li>Failure tags: The kinds of failure found in the build logs of the next Clang release.</li></ul>
     """
-    generate_report(title, packages, description)
+    if data_file:
+        write_todo_data(packages, data_file, chroots, states)
+        generate_report(title, {}, description, output, template_file, os.path.basename(data_file), summary)
+        return
+    generate_report(title, packages, description, output, template_file, summary = summary)
+
+
+if __name__ == '__main__':
+    generate_todo_report(load_packages())
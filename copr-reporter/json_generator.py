@@ -1,3 +1,4 @@
+import functools
 import json
 import configparser
 from copr.v3 import Client
@@ -20,31 +21,32 @@ def retrieve_packages(client, project_owner, project_name):
     response = client.monitor_proxy.monitor(project_owner, project_name, additional_fields = ['url_build_log'])
     return response['packages']
 
-def get_package(name, pkg_list):
-    for p in pkg_list:
-        if p['name'] == name:
-            return p
-
 def handle_missing_packages(packages_a, packages_b):
+    names_a = set([p['name'] for p in packages_a])
+    names_b = set([p['name'] for p in packages_b])
 
     for p_a in packages_a:
-        p_b = get_package(p_a['name'], packages_b)
-        if not p_b:
+        if p_a['name'] not in names_b:
             packages_b.append({'name' : p_a['name'], 'chroots' : {} })
 
     for p_b in packages_b:
-        p_a = get_package(p_b['name'], packages_a)
-        if not p_a:
+        if p_b['name'] not in names_a:
             packages_a.append({'name' : p_b['name'], 'chroots' : {} })
 
 def get_chroot_arch(chroot):
     return chroot.split('-')[-1]
 
-def has_arch(builds, arch):
-    for build in builds:
-        if get_chroot_arch(build.name) == arch:
-            return True
-    return False
+def get_arches(builds):
+    return set([get_chroot_arch(build.name) for build in builds])
+
+def handle_missing_builds(builds_a, builds_b):
+    arches_a = get_arches(builds_a)
+    arches_b = get_arches(builds_b)
+
+    for arch in sorted(arches_b - arches_a):
+        builds_a.append(create_missing_build(arch))
+    for arch in sorted(arches_a - arches_b):
+        builds_b.append(create_missing_build(arch))
 
 def retrieve_builds(client, package):
 
@@ -69,6 +71,9 @@ def retrieve_builds(client, package):
     return b
 
 
+# Both sides of a page are usually on the same Copr instance, so they share a
+# client.
+@functools.lru_cache(maxsize = None)
 def create_copr_client(configfile = None, copr_url = None):
     if copr_url:
         config = {'copr_url' : copr_url }
@@ -0,0 +1,214 @@
+import concurrent.futures
+import configparser
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+
+import requests
+
+from tracing import tracer
+
+DEFAULT_COPR_URL = 'https://copr.fedorainfracloud.org'
+
+HTTP_CACHE_DIR = '.cache/copr-http'
+
+# Keep-alive connections kept open to each Copr instance, enough for the
+# copr and todo workers of update.py to each have one.
+POOL_SIZE = 10
+
+# (connect, read) timeouts; the monitor responses can take minutes to start.
+REQUEST_TIMEOUT = (30, 600)
+
+CHUNK_SIZE = 1 << 16
+
+class CoprError(Exception):
+    pass
+
+class Proxy:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+def get_copr_url(configfile):
+    config = configparser.ConfigParser()
+    config.read(os.path.expanduser(configfile or '~/.config/copr'))
+    return config.get('copr-cli', 'copr_url', fallback = DEFAULT_COPR_URL)
+
+def check_response(url, response):
+    if response.status_code < 400:
+        return
+    try:
+        error = response.json().get('error')
+    except ValueError:
+        error = None
+    raise CoprError('{} {}: {}'.format(response.status_code, url, error or response.reason))
+
+
+# Talks to the read only API endpoints of one Copr instance that the pages
+# use, through one pool of keep-alive connections.  It has the *_proxy
+# attributes of a copr.v3.Client for those endpoints, returning plain dicts
+# and lists.
+#
+# The project and monitor responses are kept on disk with their ETag and
+# Last-Modified headers, and asked for again with If-None-Match and
+# If-Modified-Since, so an unchanged one is not sent again.  Callers asking
+# for the same URL at the same time share one request.
+class CoprClient:
+    def __init__(self, copr_url, cache_dir = HTTP_CACHE_DIR, pool_size = POOL_SIZE):
+        self.copr_url = copr_url.rstrip('/')
+        self.config = {'copr_url' : self.copr_url}
+        self.cache_dir = cache_dir
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections = 1, pool_maxsize = pool_size)
+        self.session.mount(self.copr_url + '/', adapter)
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+        self.project_proxy = Proxy(get = self.get_project)
+        self.package_proxy = Proxy(get = self.get_package, get_list = self.get_package_list)
+        self.build_proxy = Proxy(get_list = self.get_build_list)
+        self.monitor_proxy = Proxy(monitor = self.monitor)
+
+    def get_url(self, endpoint, params):
+        params = [(k, v) for k, v in params.items() if v is not None]
+        return '{}/api_3/{}?{}'.format(self.copr_url, endpoint, urllib.parse.urlencode(params))
+
+    def get_cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def load_validators(self, path):
+        try:
+            with open(path + '.json') as f:
+                validators = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not os.path.exists(path + '.body'):
+            return {}
+        return validators
+
+    def save_response(self, path, response):
+        os.makedirs(self.cache_dir, exist_ok = True)
+        tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(tmp, 'wb') as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(tmp, path + '.body')
+        validators = {'etag' : response.headers.get('ETag'),
+                      'last_modified' : response.headers.get('Last-Modified')}
+        with open(tmp, 'w') as f:
+            json.dump(validators, f)
+        os.replace(tmp, path + '.json')
+
+    # Runs fetch(url) once for all the callers that ask for url while it is
+    # running.
+    def dedup(self, url, fetch):
+        with self.lock:
+            future = self.inflight.get(url)
+            first = future is None
+            if first:
+                future = self.inflight[url] = concurrent.futures.Future()
+        if not first:
+            return future.result()
+        try:
+            result = fetch(url)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[url]
+        future.set_result(result)
+        return result
+
+    def fetch(self, url):
+        with tracer.span('GET ' + urllib.parse.urlsplit(url).path, 'copr', url = url) as span:
+            response = self.session.get(url, timeout = REQUEST_TIMEOUT)
+            check_response(url, response)
+            span.set(bytes = len(response.content))
+            return response.content
+
+    # Returns the path of the cached body of url, after checking with Copr
+    # that it is still current.
+    def fetch_conditional(self, url):
+        path = self.get_cache_path(url)
+        validators = self.load_validators(path)
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        with tracer.span('GET ' + urllib.parse.urlsplit(url).path, 'copr', url = url) as span:
+            with self.session.get(url, headers = headers, stream = True, timeout = REQUEST_TIMEOUT) as response:
+                span.set(status = response.status_code)
+                if response.status_code == 304 and headers:
+                    return path + '.body'
+                check_response(url, response)
+                self.save_response(path, response)
+                span.set(bytes = os.path.getsize(path + '.body'))
+        return path + '.body'
+
+    def get_json(self, endpoint, params):
+        return json.loads(self.dedup(self.get_url(endpoint, params), self.fetch))
+
+    def get_json_conditional(self, endpoint, params):
+        with open(self.dedup(self.get_url(endpoint, params), self.fetch_conditional), 'rb') as f:
+            return json.load(f)
+
+    def get_project(self, ownername, projectname):
+        return self.get_json_conditional('project', {'ownername' : ownername, 'projectname' : projectname})
+
+    def get_package(self, ownername, projectname, packagename, with_latest_build = False,
+                    with_latest_succeeded_build = False):
+        return self.get_json('package', {'ownername' : ownername, 'projectname' : projectname,
+                                         'packagename' : packagename, 'with_latest_build' : with_latest_build,
+                                         'with_latest_succeeded_build' : with_latest_succeeded_build})
+
+    def get_package_list(self, ownername, projectname, pagination = None, with_latest_build = False,
+                         with_latest_succeeded_build = False):
+        params = {'ownername' : ownername, 'projectname' : projectname, 'with_latest_build' : with_latest_build,
+                  'with_latest_succeeded_build' : with_latest_succeeded_build}
+        params.update(pagination or {})
+        return self.get_json('package/list', params)['items']
+
+    def get_build_list(self, ownername, projectname, packagename = None, status = None, pagination = None):
+        params = {'ownername' : ownername, 'projectname' : projectname, 'packagename' : packagename,
+                  'status' : status}
+        params.update(pagination or {})
+        return self.get_json('build/list', params)['items']
+
+    def monitor(self, ownername, projectname):
+        with self.open_monitor(ownername, projectname) as f:
+            return json.load(f)
+
+    # Returns the monitor response as a text stream, read from the cache.
+    def open_monitor(self, ownername, projectname):
+        path = self.dedup(self.get_url('monitor', {'ownername' : ownername, 'projectname' : projectname}),
+                          self.fetch_conditional)
+        return open(path, encoding = 'utf-8')
+
+    def close(self):
+        self.session.close()
+
+
+# Hands out one CoprClient per Copr instance, so that every comparison and
+# TODO page of a run shares its connections.
+class CoprClients:
+    def __init__(self):
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def get(self, copr_url = None, configfile = None):
+        copr_url = (copr_url or get_copr_url(configfile)).rstrip('/')
+        with self.lock:
+            if copr_url not in self.clients:
+                self.clients[copr_url] = CoprClient(copr_url)
+            return self.clients[copr_url]
+
+    def close(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients = {}
+
+copr_clients = CoprClients()
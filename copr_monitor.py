@@ -0,0 +1,108 @@
+import json
+
+from copr_client import copr_clients
+
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = ' \t\n\r'
+
+NUMBER_CHARS = '0123456789.eE+-'
+
+# Decodes the JSON values of a text stream one at a time, keeping no more
+# of the stream in memory than the value being decoded.
+class StreamDecoder:
+    def __init__(self, f, chunk_size = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    # Returns the next character that is not whitespace, without consuming it.
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError('unexpected end of JSON stream')
+            self.fill()
+
+    def expect(self, c):
+        if self.peek() != c:
+            raise ValueError('expected {!r} at {!r}'.format(c, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def may_continue(self, value, end):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return end == len(self.buf) or self.buf[end] in NUMBER_CHARS
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut by the end of the chunk decodes as its
+                # prefix, "12." as 12, read on until it cannot go on.
+                if self.eof or not self.may_continue(value, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+# Yields the elements of the array under key in the JSON object read from f,
+# one at a time.  The other members of the object are skipped.
+def iter_array(f, key, chunk_size = CHUNK_SIZE):
+    d = StreamDecoder(f, chunk_size)
+    d.expect('{')
+    if d.peek() == '}':
+        return
+    while True:
+        name = d.value()
+        d.expect(':')
+        if name != key:
+            d.value()
+        else:
+            d.expect('[')
+            if d.peek() == ']':
+                d.pos += 1
+            else:
+                while True:
+                    yield d.value()
+                    c = d.peek()
+                    d.pos += 1
+                    if c == ']':
+                        break
+                    if c != ',':
+                        raise ValueError('expected , or ] in {}'.format(key))
+        c = d.peek()
+        d.pos += 1
+        if c == '}':
+            return
+        if c != ',':
+            raise ValueError('expected , or }')
+
+# Opens the response of monitor_proxy.monitor() as a text stream.
+def open_monitor(copr_url, owner, project):
+    return copr_clients.get(copr_url).open_monitor(owner, project)
+
+def read_monitor(copr_url, owner, project):
+    with open_monitor(copr_url, owner, project) as f:
+        return f.read()
+
+# Yields the packages of a monitor response as they are parsed.
+def iter_packages(f):
+    return iter_array(f, 'packages')
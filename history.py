@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+
+# Keeps the status of every package of every comparison across runs.  Only
+# changes are stored: a row is added when the status, the NVRs or the build
+# ids of a package differ from the ones recorded by an earlier run, and a
+# row with a NULL status when the package is no longer in the comparison.
+#
+#   python3 history.py log f39 zlib
+#   python3 history.py failing-since f39 zlib
+#   python3 history.py regressions --days 7
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+
+from status_engine import STATUS_NAMES, STATUS_REGRESSION, STATUS_FAILED
+
+# The pages workflow keeps this file on the gh-pages branch between runs.
+HISTORY_FILE = '.cache/history.sqlite'
+
+FAILING_STATUSES = [STATUS_REGRESSION, STATUS_FAILED]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    comparison TEXT NOT NULL,
+    package TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    status INTEGER,
+    nvr TEXT,
+    other_nvr TEXT,
+    build_id INTEGER,
+    other_build_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS latest (
+    comparison TEXT NOT NULL,
+    package TEXT NOT NULL,
+    status INTEGER,
+    nvr TEXT,
+    other_nvr TEXT,
+    build_id INTEGER,
+    other_build_id INTEGER,
+    PRIMARY KEY (comparison, package)
+);
+CREATE INDEX IF NOT EXISTS runs_time ON runs(time);
+CREATE INDEX IF NOT EXISTS history_package ON history(comparison, package, run_id);
+CREATE INDEX IF NOT EXISTS history_status ON history(status, run_id);
+"""
+
+def get_status_name(status):
+    if status is None:
+        return 'REMOVED'
+    return STATUS_NAMES[status]
+
+def format_time(time):
+    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class HistoryStore:
+    def __init__(self, path = HISTORY_FILE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def start_run(self, time = None):
+        time = time or datetime.datetime.utcnow()
+        with self.db:
+            return self.db.execute('INSERT INTO runs (time) VALUES (?)', (format_time(time),)).lastrowid
+
+    # rows are (package, status, nvr, other_nvr, build_id, other_build_id)
+    # tuples for every package of the comparison.  Returns the number of
+    # rows that changed.
+    def record(self, run_id, comparison, rows):
+        latest = {r[0] : r[1:] for r in self.db.execute(
+                      'SELECT package, status, nvr, other_nvr, build_id, other_build_id FROM latest '
+                      'WHERE comparison = ?', (comparison,))}
+        changed = []
+        for r in rows:
+            if latest.pop(r[0], None) != tuple(r[1:]):
+                changed.append(tuple(r))
+        for package, old in latest.items():
+            if old[0] is not None:
+                changed.append((package, None, None, None, None, None))
+
+        with self.db:
+            self.db.executemany('INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                [(comparison, r[0], run_id) + r[1:] for r in changed])
+            self.db.executemany('INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                [(comparison,) + r for r in changed])
+        return len(changed)
+
+    def get_package_log(self, comparison, package):
+        return self.db.execute('SELECT runs.time, status, nvr, other_nvr, build_id, other_build_id '
+                               'FROM history JOIN runs ON runs.id = history.run_id '
+                               'WHERE comparison = ? AND package = ? ORDER BY run_id',
+                               (comparison, package)).fetchall()
+
+    # Returns the time of the run that first saw the current run of failures
+    # of package, or None if it is not failing.
+    def get_failing_since(self, comparison, package):
+        since = None
+        for time, status in self.db.execute('SELECT runs.time, status '
+                                            'FROM history JOIN runs ON runs.id = history.run_id '
+                                            'WHERE comparison = ? AND package = ? ORDER BY run_id DESC',
+                                            (comparison, package)):
+            if status not in FAILING_STATUSES:
+                break
+            since = time
+        return since
+
+    # Returns the (time, comparison, package, nvr, other_nvr) of every
+    # package that became a regression in the last days.
+    def get_regressions(self, days = 7, comparison = None):
+        start = format_time(datetime.datetime.utcnow() - datetime.timedelta(days = days))
+        query = ('SELECT runs.time, comparison, package, nvr, other_nvr '
+                 'FROM history JOIN runs ON runs.id = history.run_id '
+                 'WHERE status = ? AND runs.time >= ?')
+        params = [STATUS_REGRESSION, start]
+        if comparison:
+            query += ' AND comparison = ?'
+            params.append(comparison)
+        return self.db.execute(query + ' ORDER BY run_id, comparison, package', params).fetchall()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', default = HISTORY_FILE)
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    log = commands.add_parser('log', help = 'Show every change of a package')
+    log.add_argument('comparison')
+    log.add_argument('package')
+    failing = commands.add_parser('failing-since', help = 'Show when a package started failing')
+    failing.add_argument('comparison')
+    failing.add_argument('package')
+    regressions = commands.add_parser('regressions', help = 'List the recent regressions')
+    regressions.add_argument('--days', type = int, default = 7)
+    regressions.add_argument('--comparison')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print('No history in', args.db, file = sys.stderr)
+        sys.exit(1)
+    history = HistoryStore(args.db)
+
+    if args.command == 'log':
+        for time, status, nvr, other_nvr, build_id, other_build_id in history.get_package_log(args.comparison, args.package):
+            print(time, get_status_name(status), nvr or '', other_nvr or '')
+    elif args.command == 'failing-since':
+        since = history.get_failing_since(args.comparison, args.package)
+        if since:
+            print(since)
+        else:
+            print('{} is not failing in {}'.format(args.package, args.comparison))
+    elif args.command == 'regressions':
+        for time, comparison, package, nvr, other_nvr in history.get_regressions(args.days, args.comparison):
+            print(time, comparison, package, nvr, other_nvr or '')
+    history.close()
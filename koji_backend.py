@@ -0,0 +1,66 @@
+import sys
+import threading
+
+import koji
+
+from tracing import tracer
+
+KOJI_URL = 'https://koji.fedoraproject.org/kojihub'
+
+# Seconds a single call may take.  The ClientSession default is 12 hours,
+# which would hold the Koji worker long after the task timed out.
+CALL_TIMEOUT = 5 * 60
+
+# The only fields of a listTagged() build that we use.
+BUILD_FIELDS = ['name', 'nvr', 'build_id', 'tag_name']
+
+class KojiBackend:
+    def __init__(self, url = KOJI_URL, timeout = CALL_TIMEOUT):
+        self.url = url
+        self.session = koji.ClientSession(url, {'timeout' : timeout})
+        # ClientSession is not thread safe.
+        self.lock = threading.Lock()
+
+    def filter_builds(self, tag, response):
+        builds = []
+        for b in response:
+            if not b['tag_name'].startswith(tag):
+                continue
+            builds.append({f : b[f] for f in BUILD_FIELDS})
+        return builds
+
+    def list_tag(self, tag):
+        with self.lock, tracer.span('listTagged ' + tag, 'koji') as span:
+            response = self.session.listTagged(tag = '{}-updates'.format(tag), inherit = True, latest = True)
+            span.set(items = len(response))
+        return self.filter_builds(tag, response)
+
+    # Returns the latest builds tagged into {tag}-updates for each of the
+    # given tags, fetched with a single multicall.  Builds inherited from
+    # other tags (e.g. a previous release) are dropped.  A tag whose
+    # call faults is asked for again on its own, and if that fails too it
+    # is left out of the results, so only its pages are skipped, unless all
+    # of them fail.
+    def list_tagged(self, tags):
+        with self.lock, tracer.span('listTagged multicall', 'koji', tags = len(tags)):
+            with self.session.multicall(strict = False) as m:
+                calls = [m.listTagged(tag = '{}-updates'.format(t), inherit = True, latest = True) for t in tags]
+
+        results = {}
+        error = None
+        for i, t in enumerate(tags):
+            try:
+                results[t] = self.filter_builds(t, calls[i].result)
+            except Exception as e:
+                print('Failed to list the builds tagged {} in the multicall, asking for it alone: {}'.format(t, e),
+                      file = sys.stderr)
+                try:
+                    results[t] = self.list_tag(t)
+                except Exception as e:
+                    print('Failed to list the builds tagged {}: {}'.format(t, e), file = sys.stderr)
+                    error = e
+            # Let the full response for this tag go before filtering the next one.
+            calls[i] = None
+        if error and not results:
+            raise error
+        return results
@@ -0,0 +1,103 @@
+import configparser
+
+MANIFEST_FILE = 'manifest.ini'
+
+SOURCE_TYPES = ['copr', 'koji']
+
+class Source:
+    def __init__(self, name, section):
+        self.name = name
+        self.type = section['type']
+        if self.type not in SOURCE_TYPES:
+            raise Exception('source {} has unknown type {}'.format(name, self.type))
+        self.tag = section.get('tag')
+        self.url = section.get('url')
+        self.owner = section.get('owner')
+        self.project = section.get('project')
+
+class StatusPage:
+    def __init__(self, name, section):
+        self.name = name
+        self.baseline = section['baseline']
+        self.test = section['test']
+        self.notes = section.get('notes')
+
+class TodoPage:
+    def __init__(self, name, section):
+        self.name = name
+        self.config = section['config']
+
+class MatrixPage:
+    def __init__(self, name, section):
+        self.name = name
+        self.sources = [s.strip() for s in section.get('sources', '').split(',') if s.strip()]
+
+
+# Reads the sources, status pages and TODO pages from the manifest, keeping
+# the order they are listed in.
+class Manifest:
+    def __init__(self, path = MANIFEST_FILE):
+        config = configparser.ConfigParser()
+        with open(path) as f:
+            config.read_file(f)
+
+        self.sources = {}
+        self.status_pages = []
+        self.todo_pages = []
+        self.matrix_pages = []
+        for s in config.sections():
+            kind, _, name = s.partition(':')
+            if kind == 'source':
+                self.sources[name] = Source(name, config[s])
+            elif kind == 'comparison':
+                self.status_pages.append(StatusPage(name, config[s]))
+            elif kind == 'todo':
+                self.todo_pages.append(TodoPage(name, config[s]))
+            elif kind == 'matrix':
+                self.matrix_pages.append(MatrixPage(name, config[s]))
+            else:
+                raise Exception('{}: unknown section {}'.format(path, s))
+
+        for p in self.status_pages:
+            for s in [p.baseline, p.test]:
+                if s not in self.sources:
+                    raise Exception('status page {} uses unknown source {}'.format(p.name, s))
+        for p in self.matrix_pages:
+            # A matrix without a source list shows all of them.
+            if not p.sources:
+                p.sources = list(self.sources)
+            for s in p.sources:
+                if s not in self.sources:
+                    raise Exception('matrix page {} uses unknown source {}'.format(p.name, s))
+
+    # Returns the status, TODO and matrix pages picked by targets.  A target
+    # is a page name, which picks every kind of page of that name, or
+    # <name>-status, <name>-todo or <name>-matrix.  No targets picks
+    # everything.
+    def select(self, targets = None):
+        if not targets:
+            return self.status_pages, self.todo_pages, self.matrix_pages
+        status_pages = [p for p in self.status_pages if p.name in targets or p.name + '-status' in targets]
+        todo_pages = [p for p in self.todo_pages if p.name in targets or p.name + '-todo' in targets]
+        matrix_pages = [p for p in self.matrix_pages if p.name in targets or p.name + '-matrix' in targets]
+        known = set()
+        for p in self.status_pages:
+            known.update([p.name, p.name + '-status'])
+        for p in self.todo_pages:
+            known.update([p.name, p.name + '-todo'])
+        for p in self.matrix_pages:
+            known.update([p.name, p.name + '-matrix'])
+        unknown = [t for t in targets if t not in known]
+        if unknown:
+            raise Exception('unknown pages: {}'.format(' '.join(unknown)))
+        return status_pages, todo_pages, matrix_pages
+
+    # Returns the sources the status and matrix pages need, in manifest
+    # order.
+    def get_sources(self, status_pages, matrix_pages = []):
+        names = set()
+        for p in status_pages:
+            names.update([p.baseline, p.test])
+        for p in matrix_pages:
+            names.update(p.sources)
+        return [s for n, s in self.sources.items() if n in names]
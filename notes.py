@@ -0,0 +1,69 @@
+import configparser
+import os
+import threading
+
+NOTES_DIR = 'status'
+
+# The notes of one status/*.cfg file.  sections maps a section name, e.g.
+# willfix or wontfix, to the notes of its packages.
+class Notes:
+    def __init__(self, sections = None, error = None):
+        self.sections = sections or {}
+        self.error = error
+        # When a package is in more than one section, the last one wins.
+        self.packages = {}
+        for s in self.sections.values():
+            self.packages.update(s)
+
+    def get(self, package):
+        return self.packages.get(package)
+
+    def get_section(self, name):
+        return self.sections.get(name, {})
+
+EMPTY_NOTES = Notes()
+
+def load_notes(path):
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    try:
+        with open(path) as f:
+            config.read_file(f)
+    except configparser.Error as e:
+        return Notes(error = str(e))
+    return Notes({s : dict(config[s]) for s in config.sections()})
+
+
+# Parses each notes file once and keeps it until the file changes, so that
+# every comparison and TODO page of a run shares the same copy.
+class NotesIndex:
+    def __init__(self, directory = NOTES_DIR):
+        self.directory = directory
+        self.notes = {}
+        self.lock = threading.Lock()
+
+    # Returns the Notes of status/<name>.cfg, or None if there is no such file.
+    def get(self, name):
+        path = os.path.join(self.directory, name + '.cfg')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.notes.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        notes = load_notes(path)
+        with self.lock:
+            self.notes[path] = (mtime, notes)
+        return notes
+
+    # Returns the Notes of the first of names that has a notes file.
+    def find(self, names):
+        for name in names:
+            notes = self.get(name)
+            if notes is not None:
+                return notes
+        return None
+
+notes_index = NotesIndex()
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+import threading
+
+PAGE_HASHES_FILE = '.cache/page-hashes.json'
+
+# Remembers a hash of everything each page was rendered from, so that a page
+# is only rendered and written again when something it shows has changed.
+class PageHashStore:
+    def __init__(self, path = PAGE_HASHES_FILE, force_render = False):
+        self.path = path
+        self.force_render = force_render
+        self.lock = threading.Lock()
+        self.hashes = self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok = True)
+            tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump(self.hashes, f, indent = 1, sort_keys = True)
+            os.replace(tmp, self.path)
+
+    # templates are hashed by content, the other inputs must be JSON
+    # serializable.
+    def get_hash(self, templates, *inputs):
+        h = hashlib.sha256()
+        for t in templates:
+            with open(t, 'rb') as f:
+                h.update(f.read())
+        h.update(json.dumps(inputs, sort_keys = True, separators = (',', ':')).encode())
+        return h.hexdigest()
+
+    def is_current(self, page, page_hash):
+        if self.force_render:
+            return False
+        with self.lock:
+            return self.hashes.get(page) == page_hash
+
+    def update(self, page, page_hash):
+        with self.lock:
+            self.hashes[page] = page_hash
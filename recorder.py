@@ -0,0 +1,78 @@
+import gzip
+import json
+import threading
+
+# Keeps the backend responses of a run in a single gzipped JSON bundle, so
+# the pages can be rebuilt later from the bundle without any network access.
+class Recorder:
+    def __init__(self):
+        self.mode = None
+        self.path = None
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def record(self, path):
+        self.mode = 'record'
+        self.path = path
+
+    def replay(self, path):
+        self.mode = 'replay'
+        self.path = path
+        with gzip.open(path, 'rt') as f:
+            self.responses = json.load(f, object_hook = decode_set)['responses']
+
+    def call(self, key, fn, *args, **kwargs):
+        if self.mode == 'replay':
+            if key not in self.responses:
+                raise Exception('{} is not in {}'.format(key, self.path))
+            return self.responses[key]
+        result = fn(*args, **kwargs)
+        if self.mode == 'record':
+            with self.lock:
+                self.responses[key] = result
+        return result
+
+    def wrap(self, key, fn):
+        return lambda *args, **kwargs : self.call(key, fn, *args, **kwargs)
+
+    def save(self):
+        if self.mode != 'record':
+            return
+        with self.lock:
+            with gzip.open(self.path, 'wt') as f:
+                json.dump({'responses' : self.responses}, f, separators = (',', ':'), default = encode_set)
+
+
+# Records every method called through the proxies of a copr.v3.Client, e.g.
+# client.monitor_proxy.monitor(owner, project).  When replaying, client is
+# None and the calls are answered from the bundle.
+class ClientProxy:
+    def __init__(self, recorder, name, client):
+        self.recorder = recorder
+        self.name = name
+        self.client = client
+
+    def __getattr__(self, attr):
+        target = getattr(self.client, attr) if self.client is not None else None
+        if attr.endswith('_proxy'):
+            return ClientProxy(self.recorder, '{}.{}'.format(self.name, attr), target)
+        def method(*args, **kwargs):
+            key = make_key('{}.{}'.format(self.name, attr), *args, **kwargs)
+            return self.recorder.call(key, target, *args, **kwargs)
+        return method
+
+
+def make_key(name, *args, **kwargs):
+    return json.dumps([name, args, kwargs], sort_keys = True, default = encode_set)
+
+def encode_set(o):
+    if isinstance(o, (set, frozenset)):
+        return {'__set__' : sorted(o)}
+    raise TypeError('{} is not JSON serializable'.format(type(o).__name__))
+
+def decode_set(d):
+    if len(d) == 1 and '__set__' in d:
+        return set(d['__set__'])
+    return d
+
+bundle = Recorder()
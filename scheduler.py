@@ -0,0 +1,185 @@
+import concurrent.futures
+import sys
+import threading
+
+from tracing import tracer
+
+class DependencyError(Exception):
+    pass
+
+class TaskTimeout(Exception):
+    pass
+
+class Task:
+    def __init__(self, name, backend, fn, args, deps, timeout, retries, backoff):
+        self.name = name
+        self.backend = backend
+        self.fn = fn
+        self.args = args
+        self.deps = deps
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.attempt = 0
+        self.pending_deps = len(deps)
+        self.finished = False
+        self.future = concurrent.futures.Future()
+        # The attempts that failed or timed out, and the ones of those that
+        # timed out, whose workers may still be running.
+        self.failed = set()
+        self.expired = set()
+        self.threads = []
+
+    def result(self, timeout = None):
+        return self.future.result(timeout)
+
+    def exception(self, timeout = None):
+        return self.future.exception(timeout)
+
+    def done(self):
+        return self.future.done()
+
+
+# Runs fetch tasks with a separate limit on the number of running tasks per
+# backend, so a slow backend can't starve the others.  A task is only
+# started once all of its dependencies have finished, and it receives their
+# results as extra positional arguments.
+#
+# The timeout of a task applies to each attempt.  Python threads can't be
+# interrupted, so the transports are given timeouts of their own, and an
+# attempt that still hangs is abandoned: its slot is handed back, the task is
+# retried, and the worker, a daemon thread, is not waited for at shutdown.
+class Scheduler:
+
+    def __init__(self, limits, default_limit = 2):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.slots = {}
+        self.tasks = []
+        self.lock = threading.Lock()
+
+    def get_slots(self, backend):
+        with self.lock:
+            if backend not in self.slots:
+                self.slots[backend] = threading.Semaphore(self.limits.get(backend, self.default_limit))
+            return self.slots[backend]
+
+    def submit(self, name, backend, fn, *args, deps = [], timeout = None, retries = 0, backoff = 5):
+        task = Task(name, backend, fn, args, list(deps), timeout, retries, backoff)
+        with self.lock:
+            self.tasks.append(task)
+        if not task.deps:
+            self.run(task)
+        for d in task.deps:
+            d.future.add_done_callback(lambda f, task = task: self.dependency_done(task))
+        return task
+
+    def dependency_done(self, task):
+        with self.lock:
+            task.pending_deps -= 1
+            if task.pending_deps:
+                return
+        for d in task.deps:
+            if d.exception():
+                self.finish(task, exception = DependencyError('{} failed'.format(d.name)))
+                return
+        self.run(task)
+
+    def run(self, task):
+        if task.done():
+            return
+        args = task.args + tuple([d.result() for d in task.deps])
+        thread = threading.Thread(target = self.call, args = (task, task.attempt, args),
+                                  name = '{}-{}'.format(task.backend, task.name), daemon = True)
+        with self.lock:
+            task.threads.append(thread)
+        thread.start()
+
+    def call(self, task, attempt, args):
+        slots = self.get_slots(task.backend)
+        slots.acquire()
+        released = threading.Event()
+        def release():
+            if not released.is_set():
+                released.set()
+                slots.release()
+        timer = None
+        if task.timeout:
+            timer = threading.Timer(task.timeout, self.expire, [task, attempt, release])
+            timer.daemon = True
+            timer.start()
+        try:
+            with tracer.span(task.name, task.backend, attempt = attempt) as span:
+                result = task.fn(*args)
+                if hasattr(result, '__len__'):
+                    span.set(items = len(result))
+        except Exception as e:
+            self.attempt_done(task, attempt, exception = e)
+        else:
+            self.attempt_done(task, attempt, result = result)
+        finally:
+            if timer:
+                timer.cancel()
+            release()
+
+    def attempt_done(self, task, attempt, result = None, exception = None):
+        if not exception:
+            # A late result of an attempt that timed out is still good.
+            self.finish(task, result = result)
+            return
+        with self.lock:
+            if attempt in task.failed:
+                # It timed out, and has already been retried.
+                return
+            task.failed.add(attempt)
+        self.retry(task, exception)
+
+    def retry(self, task, exception):
+        if task.attempt >= task.retries or task.done():
+            self.finish(task, exception = exception)
+            return
+        delay = task.backoff * 2 ** task.attempt
+        task.attempt += 1
+        print('{}: {}, retrying in {}s'.format(task.name, str(exception), delay), file = sys.stderr)
+        timer = threading.Timer(delay, self.run, [task])
+        timer.daemon = True
+        timer.start()
+
+    def expire(self, task, attempt, release):
+        with self.lock:
+            if task.finished or attempt in task.failed:
+                return
+            task.failed.add(attempt)
+            task.expired.add(attempt)
+        release()
+        self.retry(task, TaskTimeout('{} timed out after {}s'.format(task.name, task.timeout)))
+
+    def finish(self, task, result = None, exception = None):
+        with self.lock:
+            if task.finished:
+                return
+            task.finished = True
+        # Done callbacks run right away, so don't hold the lock here.
+        if exception:
+            task.future.set_exception(exception)
+        else:
+            task.future.set_result(result)
+
+    def get_failures(self):
+        failures = {}
+        for t in self.tasks:
+            if t.done() and t.exception():
+                failures[t.name] = t.exception()
+        return failures
+
+    # Waits for the running attempts, but not for the ones that timed out.
+    def shutdown(self, wait = True):
+        if not wait:
+            return
+        with self.lock:
+            tasks = list(self.tasks)
+        for task in tasks:
+            task.future.exception()
+            for attempt, thread in enumerate(task.threads):
+                if attempt not in task.expired:
+                    thread.join()
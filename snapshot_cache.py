@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+from tracing import tracer
+
+SNAPSHOT_DIR = '.cache/copr-snapshots'
+
+# Listings older than this are fetched in full again, so that deleted
+# packages and anything the incremental refresh missed get cleaned up.
+SNAPSHOT_TTL = 24 * 60 * 60
+
+BUILD_PAGE_SIZE = 100
+
+FINAL_BUILD_STATES = ['succeeded', 'failed', 'canceled', 'skipped', 'forked']
+
+def trim_build(build):
+    if not build:
+        return None
+    return {'id' : build['id'],
+            'state' : build['state'],
+            'source_package' : {'version' : (build['source_package'] or {}).get('version')}}
+
+def trim_package(p):
+    return {'name' : p['name'],
+            'builds' : {'latest' : trim_build(p['builds']['latest']),
+                        'latest_succeeded' : trim_build(p['builds']['latest_succeeded'])}}
+
+# Makes build, which has just finished, the latest build of the trimmed
+# package p, and the latest succeeded one if it succeeded.
+def apply_build(p, build):
+    build = trim_build(build)
+    latest = p['builds']['latest']
+    if latest is None or build['id'] >= latest['id']:
+        p['builds']['latest'] = build
+    succeeded = p['builds']['latest_succeeded']
+    if build['state'] == 'succeeded' and (succeeded is None or build['id'] >= succeeded['id']):
+        p['builds']['latest_succeeded'] = build
+
+def get_max_build_id(packages):
+    max_id = 0
+    for p in packages.values():
+        for b in p['builds'].values():
+            if b and b['id'] > max_id:
+                max_id = b['id']
+    return max_id
+
+def is_unfinished(p):
+    latest = p['builds']['latest']
+    return latest is not None and latest['state'] not in FINAL_BUILD_STATES
+
+
+class CoprSnapshotStore:
+    def __init__(self, directory = SNAPSHOT_DIR, ttl = SNAPSHOT_TTL, force_refresh = False):
+        self.directory = directory
+        self.ttl = ttl
+        self.force_refresh = force_refresh
+
+    def get_path(self, url, owner, project):
+        key = hashlib.sha256('{}\0{}\0{}'.format(url, owner, project).encode()).hexdigest()
+        return os.path.join(self.directory, '{}.json'.format(key))
+
+    def load(self, url, owner, project):
+        try:
+            with open(self.get_path(url, owner, project)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get('key') != [url, owner, project]:
+            return None
+        return snapshot
+
+    def save(self, snapshot):
+        path = self.get_path(*snapshot['key'])
+        os.makedirs(self.directory, exist_ok = True)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        # dumps() uses the C encoder, dump() to a file does not.
+        with open(tmp, 'w') as f:
+            f.write(json.dumps(snapshot, separators = (',', ':')))
+        os.replace(tmp, path)
+
+    def is_expired(self, snapshot):
+        return time.time() - snapshot['time'] > self.ttl
+
+    def get_list(self, client, url, owner, project):
+        snapshot = None
+        if not self.force_refresh:
+            snapshot = self.load(url, owner, project)
+
+        if snapshot and not self.is_expired(snapshot):
+            try:
+                self.refresh(client, owner, project, snapshot)
+            except Exception as e:
+                print(project, 'incremental refresh failed:', str(e), file = sys.stderr)
+                snapshot = None
+        else:
+            snapshot = None
+
+        if not snapshot:
+            snapshot = self.fetch_all(client, url, owner, project)
+
+        self.save(snapshot)
+        return list(snapshot['packages'].values())
+
+    def fetch_all(self, client, url, owner, project):
+        packages = {}
+        with tracer.span('package list ' + project, 'copr') as span:
+            for p in client.package_proxy.get_list(owner, project, with_latest_succeeded_build=True, with_latest_build=True):
+                packages[p['name']] = trim_package(p)
+            span.set(items = len(packages))
+        return {'key' : [url, owner, project],
+                'time' : time.time(),
+                'max_build_id' : get_max_build_id(packages),
+                'packages' : packages}
+
+    def get_new_builds(self, client, owner, project, since_id):
+        offset = 0
+        while True:
+            builds = client.build_proxy.get_list(owner, project,
+                                                 pagination = {'order' : 'id', 'order_type' : 'DESC',
+                                                               'offset' : offset, 'limit' : BUILD_PAGE_SIZE})
+            for b in builds:
+                if b['id'] <= since_id:
+                    return
+                yield b
+            if len(builds) < BUILD_PAGE_SIZE:
+                return
+            offset += BUILD_PAGE_SIZE
+
+    def refresh(self, client, owner, project, snapshot):
+        packages = snapshot['packages']
+        changed = set([p['name'] for p in packages.values() if is_unfinished(p)])
+        max_build_id = snapshot['max_build_id']
+        for b in self.get_new_builds(client, owner, project, snapshot['max_build_id']):
+            name = (b['source_package'] or {}).get('name')
+            if not name:
+                # The build has not been imported yet, so we can't tell
+                # which package it belongs to.
+                raise Exception('build {} has no package name'.format(b['id']))
+            changed.add(name)
+            max_build_id = max(max_build_id, b['id'])
+
+        with tracer.span('changed packages ' + project, 'copr', items = len(changed)):
+            for name in changed:
+                p = client.package_proxy.get(owner, project, name, with_latest_succeeded_build=True, with_latest_build=True)
+                packages[name] = trim_package(p)
+
+        snapshot['max_build_id'] = max_build_id
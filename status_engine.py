@@ -0,0 +1,165 @@
+# Works out the status of every package of a comparison, and the counts
+# shown at the top of the status pages, from the package sets of the two
+# sides.  The sets are joined into aligned columns first, so each status and
+# counter is derived in a single pass over plain lists, without any
+# per-package objects.
+
+import copy
+import types
+
+STATUS_REGRESSION = 0
+STATUS_MISSING = 1
+STATUS_OLD = 2
+STATUS_FIXED = 3
+STATUS_FAILED = 4
+STATUS_PASS = 5
+
+STATUS_NAMES = ['REGRESSION', 'MISSING', 'OLD', 'FIXED', 'FAILED', 'PASS']
+
+class Stats:
+    def __init__(self):
+        self.num_fedora_pkgs = 0
+        self.num_clang_pkgs = 0
+        self.num_up_to_date_pkgs = 0
+        self.num_pass_or_note = 0
+
+        self.num_regressions = 0
+        self.num_fixed = 0
+        self.num_missing = 0
+
+    def html_color_for_percent(percent):
+        return 'black'
+        if percent < 33.3:
+            return 'red'
+        if percent < 66.7:
+            return '#CC9900'
+        return 'green'
+
+
+def get_status(present, baseline_passes, test_passes, up_to_date):
+    if not present:
+        return STATUS_MISSING
+    if not test_passes:
+        return STATUS_REGRESSION if baseline_passes else STATUS_FAILED
+    if not up_to_date:
+        return STATUS_OLD
+    if not baseline_passes:
+        return STATUS_FIXED
+    return STATUS_PASS
+
+
+class Comparison:
+    def __init__(self, names, present, baseline_passes, test_passes, up_to_date, notes):
+        self.names = names
+        self.present = present
+        self.baseline_passes = baseline_passes
+        self.test_passes = test_passes
+        self.up_to_date = up_to_date
+        self.notes = notes
+        self.statuses = list(map(get_status, present, baseline_passes, test_passes, up_to_date))
+
+    def get_stats(self):
+        stats = Stats()
+        stats.num_fedora_pkgs = len(self.names)
+        stats.num_missing = stats.num_fedora_pkgs - sum(self.present)
+        stats.num_clang_pkgs = sum(self.test_passes)
+        stats.num_up_to_date_pkgs = sum(self.up_to_date)
+        stats.num_pass_or_note = sum([p and (t or bool(n)) for p, t, n in zip(self.present, self.test_passes, self.notes)])
+        stats.num_regressions = self.statuses.count(STATUS_REGRESSION)
+        stats.num_fixed = self.statuses.count(STATUS_FIXED)
+        return stats
+
+    # Updates the columns of the package at index i, after baseline or test,
+    # which may be None, changed.
+    def set(self, i, baseline, test, compare_versions):
+        self.present[i] = test is not None
+        self.baseline_passes[i] = baseline.build_passes
+        self.test_passes[i] = test is not None and test.build_passes
+        self.up_to_date[i] = self.test_passes[i] and compare_versions(baseline, test) <= 0
+        self.statuses[i] = get_status(self.present[i], self.baseline_passes[i], self.test_passes[i],
+                                      self.up_to_date[i])
+
+    def get_status_names(self):
+        return {n : STATUS_NAMES[s] for n, s in zip(self.names, self.statuses)}
+
+
+# The package sets of all the sources of a run, joined on package name once
+# for every comparison.  names is the sorted union of the names of all the
+# sources, without the excluded ones, and columns maps each source to a
+# tuple with its record of each name, or None.  packages maps each source
+# to a read only mapping of its records, which the pages share.
+class PackageIndex:
+    def __init__(self, sources, exclude = ()):
+        self.exclude = exclude = set(exclude)
+        names = set()
+        for pkgs in sources.values():
+            names.update(pkgs)
+        self.names = tuple(sorted(names - exclude))
+        self.name_set = frozenset(self.names)
+        self.columns = {}
+        self.packages = {}
+        for source, pkgs in sources.items():
+            self.set_column(source, {n : p for n, p in pkgs.items() if n not in exclude})
+
+    def set_column(self, source, pkgs):
+        self.packages[source] = types.MappingProxyType(pkgs)
+        self.columns[source] = tuple(map(pkgs.get, self.names))
+
+    # Returns a new index with the records of updates, which maps package
+    # names to records, replacing those of source.  The other sources are
+    # shared with this index.
+    def replace(self, source, updates):
+        updates = {n : p for n, p in updates.items() if n not in self.exclude}
+        pkgs = dict(self.packages[source])
+        pkgs.update(updates)
+        if not self.name_set.issuperset(updates):
+            sources = dict(self.packages)
+            sources[source] = pkgs
+            return PackageIndex(sources, self.exclude)
+        index = copy.copy(self)
+        index.columns = dict(self.columns)
+        index.packages = dict(self.packages)
+        index.set_column(source, pkgs)
+        return index
+
+
+# baseline_pkgs and test_pkgs map package names to records with a
+# build_passes attribute.  compare_versions(baseline, test) orders the
+# versions of a package present on both sides like rpm.labelCompare(), and
+# is only called when the test build passes.  get_note(name) returns the
+# note of a package, or None.
+def join(baseline_pkgs, test_pkgs, compare_versions, get_note = None):
+    names = sorted(baseline_pkgs)
+    baseline = [baseline_pkgs[n] for n in names]
+    test = [test_pkgs.get(n) for n in names]
+    present = [t is not None for t in test]
+    baseline_passes = [b.build_passes for b in baseline]
+    test_passes = [t is not None and t.build_passes for t in test]
+    up_to_date = [p and compare_versions(b, t) <= 0 for b, t, p in zip(baseline, test, test_passes)]
+    notes = [get_note(n) for n in names] if get_note else [None] * len(names)
+    return Comparison(names, present, baseline_passes, test_passes, up_to_date, notes)
+
+# Joins every (baseline, test) source pair of pairs in a single pass over
+# index, and returns their comparisons in the same order.  get_notes[k] is
+# the get_note function of the k-th pair, or None.  The comparisons are the
+# same as join() makes from the packages of each pair.
+def join_all(index, pairs, compare_versions, get_notes):
+    columns = [(index.columns[b], index.columns[t]) for b, t in pairs]
+    joined = [([], [], [], [], []) for p in pairs]
+    for i, name in enumerate(index.names):
+        for (baseline, test), (names, present, baseline_passes, test_passes, up_to_date) in zip(columns, joined):
+            b = baseline[i]
+            if b is None:
+                continue
+            t = test[i]
+            names.append(name)
+            present.append(t is not None)
+            baseline_passes.append(b.build_passes)
+            passes = t is not None and t.build_passes
+            test_passes.append(passes)
+            up_to_date.append(passes and compare_versions(b, t) <= 0)
+    comparisons = []
+    for (names, present, baseline_passes, test_passes, up_to_date), get_note in zip(joined, get_notes):
+        notes = [get_note(n) for n in names] if get_note else [None] * len(names)
+        comparisons.append(Comparison(names, present, baseline_passes, test_passes, up_to_date, notes))
+    return comparisons
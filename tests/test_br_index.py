@@ -0,0 +1,69 @@
+import gzip
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import br_index
+import fixtures
+
+REQUIRES = ['gcc', 'gcc-c++', 'clang']
+
+PRIMARY = '''<?xml version="1.0" encoding="UTF-8"?>
+<metadata xmlns="http://linux.duke.edu/metadata/common" xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="3">
+<package type="rpm"><name>zlib</name><arch>src</arch><format><rpm:requires>
+<rpm:entry name="gcc"/><rpm:entry name="make"/></rpm:requires></format></package>
+<package type="rpm"><name>llvm</name><arch>src</arch><format><rpm:requires>
+<rpm:entry name="clang"/><rpm:entry name="gcc-c++"/></rpm:requires></format></package>
+<package type="rpm"><name>python-six</name><arch>src</arch><format><rpm:requires>
+<rpm:entry name="python3-devel"/></rpm:requires></format></package>
+</metadata>
+'''
+
+@pytest.fixture
+def repodata(monkeypatch, tmp_path):
+    server = fixtures.RepodataServer(gzip.compress(PRIMARY.encode()))
+    monkeypatch.setattr(br_index, 'ELN_URL', server.url + '{}/')
+    monkeypatch.setattr(br_index, 'BR_INDEX_DIR', str(tmp_path))
+    yield server
+    server.shutdown()
+
+def test_parse_requires():
+    index = br_index.parse_requires(io.BytesIO(PRIMARY.encode()), REQUIRES)
+    assert index == {'gcc' : {'zlib'}, 'gcc-c++' : {'llvm'}, 'clang' : {'llvm'}}
+
+def test_get_reverse_requires(repodata):
+    assert br_index.get_reverse_requires('eln', REQUIRES) == {'zlib', 'llvm'}
+    assert br_index.get_reverse_requires('eln', ['make']) == {'zlib'}
+
+def test_index_is_cached_by_checksum(repodata, monkeypatch):
+    br_index.get_reverse_requires('eln', REQUIRES)
+    def open_compressed(f, url):
+        raise AssertionError('primary.xml read again')
+    monkeypatch.setattr(br_index, 'open_compressed', open_compressed)
+    assert br_index.get_reverse_requires('eln', REQUIRES) == {'zlib', 'llvm'}
+    # An index without every requirement asked for is built again.
+    with pytest.raises(AssertionError):
+        br_index.get_reverse_requires('eln', REQUIRES + ['make'])
+
+def test_falls_back_to_the_next_mirror(repodata, monkeypatch):
+    monkeypatch.setattr(br_index, 'get_repo_urls', lambda release : [['http://127.0.0.1:1/', repodata.url + 'BaseOS/']])
+    assert br_index.get_reverse_requires('f39', REQUIRES) == {'zlib', 'llvm'}
+
+def test_zst_without_zstandard_uses_dnf(monkeypatch, tmp_path):
+    monkeypatch.setattr(br_index, 'BR_INDEX_DIR', str(tmp_path))
+    monkeypatch.setattr(br_index, 'zstandard', None)
+    monkeypatch.setattr(br_index, 'get_primary_location',
+                        lambda baseurl : ('0123', baseurl + 'repodata/0123-primary.xml.zst'))
+    calls = []
+    def get_repo_index_dnf(baseurl, requires):
+        calls.append(baseurl)
+        return {r : {'zlib'} for r in requires}
+    monkeypatch.setattr(br_index, 'get_repo_index_dnf', get_repo_index_dnf)
+    assert br_index.get_repo_index(['https://mirror.example/'], REQUIRES) == {r : {'zlib'} for r in REQUIRES}
+    assert calls == ['https://mirror.example/']
@@ -0,0 +1,89 @@
+import gzip
+import io
+import os
+import socket
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import build_logs
+import fixtures
+
+LOG = '''Building target platforms: x86_64
+FAIL: first line of the log
+foo.c:12:3: error: call to undeclared function 'bar'; ISO C99 and later do not support implicit function declarations [-Wimplicit-function-declaration]
+foo.c:20:3: error: call to undeclared library function 'strlen'
+ld.lld: error: undefined symbol: baz
+make: *** [Makefile:10: check] Error 1
+ld: foo.o: plugin needed to handle lto object
+'''
+
+EXPECTED = {'tags' : ['implicit-function-declaration', 'lto', 'undefined-symbol', 'test-failure'],
+            'lines' : {'implicit-function-declaration' : LOG.splitlines()[2][:build_logs.MAX_LINE_LENGTH],
+                       'lto' : 'ld: foo.o: plugin needed to handle lto object',
+                       'undefined-symbol' : 'ld.lld: error: undefined symbol: baz',
+                       'test-failure' : 'FAIL: first line of the log'}}
+
+def test_scan_log():
+    assert build_logs.scan_log(io.BytesIO(LOG.encode())) == EXPECTED
+
+def test_scan_log_in_chunks():
+    # Every chunk size, so each line is cut at every point.
+    for chunk_size in range(1, len(LOG) + 2):
+        assert build_logs.scan_log(io.BytesIO(LOG.encode()), chunk_size) == EXPECTED, chunk_size
+
+def test_scan_log_without_failures():
+    assert build_logs.scan_log(io.BytesIO(b'all good\nFAILED: not a test\n')) == {'tags' : [], 'lines' : {}}
+    assert build_logs.scan_log(io.BytesIO(b'')) == {'tags' : [], 'lines' : {}}
+
+def test_open_log():
+    assert build_logs.open_log(io.BytesIO(gzip.compress(LOG.encode()))).read() == LOG.encode()
+    assert build_logs.open_log(io.BytesIO(LOG.encode())).read() == LOG.encode()
+
+def test_fetch_log():
+    server = fixtures.BuildLogServer(100)
+    try:
+        result = build_logs.fetch_log(server.url + 'builder-live.log.gz')
+    finally:
+        server.shutdown()
+    assert len(result['tags']) == 1
+
+def test_fetch_log_times_out(monkeypatch):
+    monkeypatch.setattr(build_logs, 'SOCKET_TIMEOUT', 0.2)
+    # Accepts the connection and never answers.
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        s.listen()
+        url = 'http://127.0.0.1:{}/builder-live.log.gz'.format(s.getsockname()[1])
+        with pytest.raises(OSError):
+            build_logs.fetch_log(url)
+
+def test_results_are_cached(tmp_path):
+    fetched = []
+    def fetch(url):
+        fetched.append(url)
+        if url == 'broken':
+            raise OSError('timed out')
+        return {'tags' : [url], 'lines' : {url : url}}
+    analyzer = build_logs.BuildLogAnalyzer(str(tmp_path), 2, fetch)
+    builds = [(1, 'fedora-39-x86_64', 'lto'), (2, 'fedora-39-x86_64', 'broken')]
+    try:
+        results = analyzer.analyze_all(builds)
+        assert results == [{'tags' : ['lto'], 'lines' : {'lto' : 'lto'}}, None]
+        # A log that could not be read is tried again, a read one is not.
+        assert analyzer.analyze_all(builds) == results
+        assert sorted(fetched) == ['broken', 'broken', 'lto']
+    finally:
+        analyzer.shutdown()
+
+def test_cache_is_dropped_when_the_signatures_change(tmp_path, monkeypatch):
+    analyzer = build_logs.BuildLogAnalyzer(str(tmp_path))
+    analyzer.save(1, 'fedora-39-x86_64', EXPECTED)
+    assert analyzer.load(1, 'fedora-39-x86_64') == EXPECTED
+    monkeypatch.setattr(build_logs, 'SIGNATURES_HASH', 'other')
+    assert analyzer.load(1, 'fedora-39-x86_64') is None
+    assert analyzer.load(2, 'fedora-39-x86_64') is None
@@ -0,0 +1,118 @@
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from copr_client import CoprClient, CoprClients, CoprError
+
+MONITOR = {'output' : 'ok', 'message' : '', 'packages' : [{'name' : 'zlib', 'chroots' : {}}]}
+
+# Serves MONITOR with an ETag, counting the full responses it sends, and a
+# 404 for anything else.
+class CoprServer:
+    def __init__(self):
+        self.sent = []
+        self.etag = '"1"'
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/api_3/monitor'):
+                    if self.headers.get('If-None-Match') == server.etag:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    body = json.dumps(MONITOR).encode()
+                else:
+                    body = json.dumps({'error' : 'Project does not exist'}).encode()
+                    self.send_response(404)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                server.sent.append(self.path)
+                self.send_response(200)
+                self.send_header('ETag', server.etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def server():
+    server = CoprServer()
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def client(server, tmp_path):
+    client = CoprClient(server.url, str(tmp_path))
+    yield client
+    client.close()
+
+def test_unchanged_monitor_is_not_sent_again(server, client, tmp_path):
+    assert client.monitor_proxy.monitor('@fedora-llvm-team', 'clang-built-f39') == MONITOR
+    assert client.monitor_proxy.monitor('@fedora-llvm-team', 'clang-built-f39') == MONITOR
+    assert len(server.sent) == 1
+    server.etag = '"2"'
+    with client.open_monitor('@fedora-llvm-team', 'clang-built-f39') as f:
+        assert json.load(f) == MONITOR
+    assert len(server.sent) == 2
+    # A new client finds the cached response on disk.
+    other = CoprClient(server.url, str(tmp_path))
+    other.monitor_proxy.monitor('@fedora-llvm-team', 'clang-built-f39')
+    other.close()
+    assert len(server.sent) == 2
+
+def test_requests_at_the_same_time_are_shared(client):
+    release = threading.Event()
+    fetched = []
+    def fetch(url):
+        fetched.append(url)
+        release.wait(5)
+        return url.upper()
+    results = []
+    threads = [threading.Thread(target = lambda : results.append(client.dedup('monitor', fetch))) for i in range(4)]
+    threads[0].start()
+    while not fetched:
+        time.sleep(0.01)
+    for t in threads[1:]:
+        t.start()
+    # Give the other callers time to find the request running.
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ['MONITOR'] * 4
+    assert fetched == ['monitor']
+    assert client.inflight == {}
+    # Once it is done, the next caller asks again.
+    client.dedup('monitor', fetch)
+    assert fetched == ['monitor', 'monitor']
+
+def test_errors(client):
+    with pytest.raises(CoprError, match = '404.*Project does not exist'):
+        client.project_proxy.get('@fedora-llvm-team', 'missing')
+
+def test_clients_are_shared():
+    clients = CoprClients()
+    assert clients.get('https://copr.example/') is clients.get('https://copr.example')
+    assert clients.get('https://copr.example') is not clients.get('https://other.example')
+    clients.close()
@@ -0,0 +1,75 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from copr_monitor import iter_array, iter_packages
+
+DOCUMENTS = [
+    '{"packages":[12.5,1]}',
+    '{"packages":[]}',
+    '{}',
+    '{"packages" : [ -1 , 0, 12.0,  1e5, -2.5E-3, 1E+2, 100 ] }',
+    '{"output":"ok", "packages":[{"name":"llvm","chroots":{"fedora-rawhide-x86_64":{"state":"succeeded","build_id":123456}}}],"message":"x"}',
+    '{"skip":{"a":[1,2,{"b":-3.25e1}],"c":"]}"},"packages":[true,false,null,"a\\"b\\\\c","\\u00e9\\n",[1,[2.0]]],"after":12345}',
+    '{"packages":[{"name":"pkg1","version":"1.0-1"},{"name":"pkg2","version":null}]}\n',
+]
+
+# Returns the text in the given pieces, one per read() whatever size is
+# asked for.
+class PieceReader:
+    def __init__(self, pieces):
+        self.pieces = list(pieces)
+
+    def read(self, size = -1):
+        if not self.pieces:
+            return ''
+        return self.pieces.pop(0)
+
+def expected(doc, key = 'packages'):
+    return json.loads(doc).get(key, [])
+
+@pytest.mark.parametrize('doc', DOCUMENTS)
+def test_every_chunk_size(doc):
+    for chunk_size in range(1, len(doc) + 1):
+        assert list(iter_array(io.StringIO(doc), 'packages', chunk_size)) == expected(doc)
+
+@pytest.mark.parametrize('doc', DOCUMENTS)
+def test_every_split(doc):
+    for i in range(1, len(doc)):
+        f = PieceReader([doc[:i], doc[i:]])
+        assert list(iter_array(f, 'packages')) == expected(doc)
+    for i in range(1, len(doc)):
+        for j in range(i + 1, len(doc)):
+            f = PieceReader([doc[:i], doc[i:j], doc[j:]])
+            assert list(iter_array(f, 'packages')) == expected(doc)
+
+def test_other_key():
+    doc = DOCUMENTS[5]
+    for chunk_size in range(1, len(doc) + 1):
+        assert list(iter_array(io.StringIO(doc), 'missing', chunk_size)) == []
+    doc = '{"packages":[1,2],"a":[3.5,-1e-2]}'
+    for chunk_size in range(1, len(doc) + 1):
+        assert list(iter_array(io.StringIO(doc), 'a', chunk_size)) == [3.5, -1e-2]
+
+def test_iter_packages():
+    doc = DOCUMENTS[4]
+    assert list(iter_packages(io.StringIO(doc))) == expected(doc)
+
+@pytest.mark.parametrize('doc', [
+    '{"packages":[1 2]}',
+    '{"packages":[12.5.1]}',
+    '{"packages":[1,2}',
+    '{"packages":[1,2]',
+    '{"packages":[1,2',
+    '{"packages" 1}',
+    '[1,2]',
+])
+def test_invalid(doc):
+    for chunk_size in [1, 3, len(doc)]:
+        with pytest.raises(ValueError):
+            list(iter_array(io.StringIO(doc), 'packages', chunk_size))
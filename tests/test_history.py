@@ -0,0 +1,71 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from history import HistoryStore, get_status_name
+from status_engine import STATUS_FAILED, STATUS_PASS, STATUS_REGRESSION
+
+@pytest.fixture
+def history(tmp_path):
+    history = HistoryStore(str(tmp_path / 'history.sqlite'))
+    yield history
+    history.close()
+
+def run(history, rows, comparison = 'f39', time = None):
+    return history.record(history.start_run(time), comparison, rows)
+
+def test_only_changes_are_recorded(history):
+    rows = [('zlib', STATUS_PASS, 'zlib-1.0-1', 'zlib-1.0-1', 1, 2),
+            ('bash', STATUS_FAILED, 'bash-5.0-1', 'bash-5.0-1', 3, 4)]
+    assert run(history, rows) == 2
+    assert run(history, rows) == 0
+    rows[1] = ('bash', STATUS_PASS, 'bash-5.0-1', 'bash-5.0-1', 3, 5)
+    assert run(history, rows) == 1
+    assert [r[1] for r in history.get_package_log('f39', 'bash')] == [STATUS_FAILED, STATUS_PASS]
+    assert len(history.get_package_log('f39', 'zlib')) == 1
+
+def test_removed_packages(history):
+    run(history, [('zlib', STATUS_PASS, 'zlib-1.0-1', None, 1, None)])
+    assert run(history, []) == 1
+    assert run(history, []) == 0
+    log = history.get_package_log('f39', 'zlib')
+    assert [get_status_name(r[1]) for r in log] == ['PASS', 'REMOVED']
+
+def test_comparisons_are_kept_apart(history):
+    run(history, [('zlib', STATUS_PASS, 'zlib-1.0-1', None, 1, None)], 'f39')
+    assert run(history, [('zlib', STATUS_PASS, 'zlib-1.0-1', None, 1, None)], 'f38') == 1
+    assert run(history, [], 'f38') == 1
+    assert len(history.get_package_log('f39', 'zlib')) == 1
+
+def test_failing_since(history):
+    start = datetime.datetime(2024, 1, 1)
+    statuses = [STATUS_PASS, STATUS_REGRESSION, STATUS_FAILED, STATUS_FAILED]
+    for day, status in enumerate(statuses):
+        run(history, [('zlib', status, 'zlib-1.0-{}'.format(day), None, day, None)],
+            time = start + datetime.timedelta(days = day))
+    assert history.get_failing_since('f39', 'zlib') == '2024-01-02 00:00:00'
+    run(history, [('zlib', STATUS_PASS, 'zlib-1.0-9', None, 9, None)])
+    assert history.get_failing_since('f39', 'zlib') is None
+    assert history.get_failing_since('f39', 'bash') is None
+
+def test_regressions(history):
+    now = datetime.datetime.utcnow()
+    run(history, [('zlib', STATUS_REGRESSION, 'zlib-1.0-1', 'zlib-1.0-1', 1, 2)], 'f39',
+        now - datetime.timedelta(days = 10))
+    run(history, [('bash', STATUS_REGRESSION, 'bash-5.0-1', 'bash-5.0-1', 3, 4)], 'f38', now)
+    assert [r[1:3] for r in history.get_regressions(7)] == [('f38', 'bash')]
+    assert [r[1:3] for r in history.get_regressions(30)] == [('f39', 'zlib'), ('f38', 'bash')]
+    assert [r[1:3] for r in history.get_regressions(30, 'f39')] == [('f39', 'zlib')]
+
+def test_history_is_kept_across_runs(tmp_path):
+    path = str(tmp_path / 'history.sqlite')
+    history = HistoryStore(path)
+    run(history, [('zlib', STATUS_PASS, 'zlib-1.0-1', None, 1, None)])
+    history.close()
+    history = HistoryStore(path)
+    assert run(history, [('zlib', STATUS_PASS, 'zlib-1.0-1', None, 1, None)]) == 0
+    history.close()
@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'copr-reporter'))
+
+import html_generator
+from html_generator import CHANGED, FIXED, REGRESSION, SAME
+
+X86 = 'fedora-39-x86_64'
+ARM = 'fedora-39-aarch64'
+
+def builds(**states):
+    return {'chroots' : {c : {'state' : s} for c, s in states.items()}}
+
+def package(a, b):
+    return {'builds_a' : builds(**dict(zip([X86, ARM], a))), 'builds_b' : builds(**dict(zip([X86, ARM], b)))}
+
+# The states of the x86_64 and aarch64 chroots on each side, and the change
+# expected.
+CASES = [
+    (['succeeded', 'succeeded'], ['succeeded', 'succeeded'], SAME),
+    (['succeeded', 'succeeded'], ['failed', 'succeeded'], REGRESSION),
+    (['failed', 'succeeded'], ['succeeded', 'failed'], REGRESSION),
+    (['failed', 'failed'], ['succeeded', 'failed'], FIXED),
+    (['failed', 'succeeded'], ['succeeded', 'running'], CHANGED),
+    (['succeeded', 'pending'], ['succeeded', 'running'], CHANGED),
+    # Chroots only one side has are not compared.
+    (['succeeded'], ['succeeded', 'failed'], SAME),
+    (['failed', 'failed'], ['failed'], SAME),
+    ([], ['failed', 'failed'], SAME),
+]
+
+def get_changes(packages):
+    chroots, states = html_generator.get_state_tables(packages)
+    columns_a = html_generator.get_state_matrix(packages, 'builds_a', chroots, states)
+    columns_b = html_generator.get_state_matrix(packages, 'builds_b', chroots, states)
+    return html_generator.get_state_changes(columns_a, columns_b, len(packages))
+
+def test_state_changes():
+    packages = [package(a, b) for a, b, change in CASES]
+    assert get_changes(packages) == [change for a, b, change in CASES]
+
+def test_state_changes_of_many_packages():
+    # Enough packages for the masks to span several bytes, in an order that
+    # puts each case at every offset within a byte.
+    cases = [CASES[(i * 5) % len(CASES)] for i in range(100)]
+    assert get_changes([package(a, b) for a, b, change in cases]) == [change for a, b, change in cases]
+
+def test_state_matrix():
+    packages = [package(['succeeded', 'failed'], []), package(['canceled'], ['failed'])]
+    chroots, states = html_generator.get_state_tables(packages)
+    assert list(chroots) == [ARM, X86]
+    columns = html_generator.get_state_matrix(packages, 'builds_a', chroots, states)
+    assert list(states) == ['succeeded', 'failed', 'missing', 'canceled']
+    assert [list(c) for c in columns] == [[1, html_generator.NO_BUILD], [0, 3]]
+
+def test_chroot_summary():
+    packages = [package([], ['failed', 'failed']), package([], ['failed', 'succeeded']),
+                package([], ['succeeded', 'failed']), package([], ['succeeded']), package([], [])]
+    chroots, states = html_generator.get_state_tables(packages)
+    columns = html_generator.get_state_matrix(packages, 'builds_b', chroots, states)
+    summary = html_generator.get_chroot_summary(columns, chroots, states)
+    assert summary == [
+        {'chroot' : ARM, 'arch' : 'aarch64', 'counts' : {'succeeded' : 1, 'failed' : 2},
+         'failed' : 2, 'failed_only_here' : 1},
+        {'chroot' : X86, 'arch' : 'x86_64', 'counts' : {'succeeded' : 2, 'failed' : 2},
+         'failed' : 2, 'failed_only_here' : 1},
+    ]
+
+def test_todo_data(tmp_path):
+    packages = {'zlib' : {'builds_a' : builds(**{X86 : 'succeeded'}),
+                          'builds_b' : dict(builds(**{X86 : 'failed'}), url_rebuild = 'rebuild'),
+                          'changed' : 'Regression', 'note' : 'needs a patch', 'tags' : ['lto']},
+                'bash' : {'builds_a' : builds(), 'builds_b' : builds(**{ARM : 'running'}),
+                          'changed' : 'Same results', 'note' : None}}
+    data_file = str(tmp_path / 'data.json')
+    html_generator.write_todo_data(packages, data_file)
+    with open(data_file) as f:
+        data = json.load(f)
+    assert data['chroots'] == [X86, ARM]
+    assert data['states'] == ['succeeded', 'failed', 'running']
+    assert data['packages'] == [
+        ['zlib', ['', [[0, 0, '', '']]], ['rebuild', [[0, 1, '', '']]], 'Regression', ['lto'], 'needs a patch'],
+        ['bash', ['', []], ['', [[1, 2, '', '']]], '', [], None],
+    ]
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+pytest.importorskip('koji')
+
+import fixtures
+from koji_backend import BUILD_FIELDS, KojiBackend
+
+TAGS = {t : fixtures.make_tagged(t, 50, seed) for seed, t in enumerate(['f39', 'f40'], 1)}
+
+class Fault:
+    @property
+    def result(self):
+        raise Exception('Fault: busy')
+
+# Fails the tags in multicall_faults inside a multicall only, and the tags
+# in faults every time.
+class FaultySession(fixtures.KojiSession):
+    def __init__(self, tags, multicall_faults = (), faults = ()):
+        super().__init__(tags)
+        self.multicall_faults = multicall_faults
+        self.faults = faults
+        self.calls = []
+
+    def multicall(self, strict = False):
+        assert not strict
+        session = self
+        class Multicall(fixtures.Multicall):
+            def listTagged(self, tag, **kwargs):
+                session.calls.append(('multicall', tag))
+                if tag.replace('-updates', '') in session.multicall_faults + session.faults:
+                    return Fault()
+                return fixtures.MulticallResult(session.tags[tag.replace('-updates', '')])
+        return Multicall(self)
+
+    def listTagged(self, tag, **kwargs):
+        self.calls.append(('call', tag))
+        if tag.replace('-updates', '') in self.faults:
+            raise Exception('Fault: busy')
+        return super().listTagged(tag, **kwargs)
+
+def create_backend(session):
+    backend = KojiBackend('https://koji.example/kojihub')
+    backend.session = session
+    return backend
+
+def get_expected(tag):
+    return [{f : b[f] for f in BUILD_FIELDS} for b in TAGS[tag] if b['tag_name'] == tag]
+
+def test_list_tagged():
+    session = FaultySession(TAGS)
+    results = create_backend(session).list_tagged(['f39', 'f40'])
+    assert results == {'f39' : get_expected('f39'), 'f40' : get_expected('f40')}
+    # Inherited builds are dropped.
+    assert 0 < len(results['f39']) < len(TAGS['f39'])
+    assert session.calls == [('multicall', 'f39-updates'), ('multicall', 'f40-updates')]
+
+def test_a_fault_is_asked_for_alone():
+    session = FaultySession(TAGS, multicall_faults = ('f39',))
+    results = create_backend(session).list_tagged(['f39', 'f40'])
+    assert results == {'f39' : get_expected('f39'), 'f40' : get_expected('f40')}
+    assert session.calls[-1] == ('call', 'f39-updates')
+
+def test_a_failing_tag_is_left_out(capsys):
+    session = FaultySession(TAGS, faults = ('f39',))
+    assert create_backend(session).list_tagged(['f39', 'f40']) == {'f40' : get_expected('f40')}
+    assert 'f39' in capsys.readouterr().err
+
+def test_all_tags_failing():
+    session = FaultySession(TAGS, faults = ('f39', 'f40'))
+    with pytest.raises(Exception, match = 'busy'):
+        create_backend(session).list_tagged(['f39', 'f40'])
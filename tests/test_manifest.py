@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from manifest import Manifest
+
+MANIFEST = '''
+[source:koji-f39]
+type = koji
+tag = f39
+
+[source:clang-built-f38]
+type = copr
+url = https://copr.example
+owner = @fedora-llvm-team
+project = clang-built-f38
+
+[source:clang-built-f39]
+type = copr
+url = https://copr.example
+owner = @fedora-llvm-team
+project = clang-built-f39
+
+[comparison:f39]
+baseline = koji-f39
+test = clang-built-f39
+notes = f39
+
+[comparison:clang-built-f39]
+baseline = clang-built-f38
+test = clang-built-f39
+
+[todo:f39]
+config = f39.ini
+
+[matrix:release]
+
+[matrix:copr]
+sources = clang-built-f38, clang-built-f39
+'''
+
+def write_manifest(tmp_path, text):
+    path = tmp_path / 'manifest.ini'
+    path.write_text(text)
+    return str(path)
+
+@pytest.fixture
+def manifest(tmp_path):
+    return Manifest(write_manifest(tmp_path, MANIFEST))
+
+def get_names(pages):
+    return [p.name for p in pages]
+
+def test_sections(manifest):
+    assert list(manifest.sources) == ['koji-f39', 'clang-built-f38', 'clang-built-f39']
+    assert manifest.sources['koji-f39'].tag == 'f39'
+    assert manifest.sources['clang-built-f39'].owner == '@fedora-llvm-team'
+    assert [(p.baseline, p.test, p.notes) for p in manifest.status_pages] == [
+        ('koji-f39', 'clang-built-f39', 'f39'), ('clang-built-f38', 'clang-built-f39', None)]
+    assert manifest.todo_pages[0].config == 'f39.ini'
+    # A matrix without sources shows all of them.
+    assert [p.sources for p in manifest.matrix_pages] == [list(manifest.sources),
+                                                          ['clang-built-f38', 'clang-built-f39']]
+
+def test_select(manifest):
+    status, todo, matrix = manifest.select()
+    assert (len(status), len(todo), len(matrix)) == (2, 1, 2)
+    status, todo, matrix = manifest.select(['f39'])
+    assert (get_names(status), get_names(todo), get_names(matrix)) == (['f39'], ['f39'], [])
+    status, todo, matrix = manifest.select(['f39-todo', 'copr-matrix', 'clang-built-f39-status'])
+    assert (get_names(status), get_names(todo), get_names(matrix)) == (['clang-built-f39'], ['f39'], ['copr'])
+    with pytest.raises(Exception, match = 'f40'):
+        manifest.select(['f40'])
+
+def test_get_sources(manifest):
+    status, todo, matrix = manifest.select(['clang-built-f39-status'])
+    assert [s.name for s in manifest.get_sources(status, matrix)] == ['clang-built-f38', 'clang-built-f39']
+    status, todo, matrix = manifest.select(['f39-todo'])
+    assert manifest.get_sources(status, matrix) == []
+    status, todo, matrix = manifest.select(['release'])
+    assert [s.name for s in manifest.get_sources(status, matrix)] == list(manifest.sources)
+
+@pytest.mark.parametrize('text, error', [
+    ('[source:x]\ntype = svn\n', 'unknown type'),
+    ('[page:x]\n', 'unknown section'),
+    ('[comparison:x]\nbaseline = a\ntest = b\n', 'unknown source'),
+    ('[source:a]\ntype = koji\ntag = f39\n[matrix:x]\nsources = a, b\n', 'unknown source'),
+])
+def test_errors(tmp_path, text, error):
+    with pytest.raises(Exception, match = error):
+        Manifest(write_manifest(tmp_path, text))
+
+def test_repo_manifest():
+    manifest = Manifest(os.path.join(ROOT, 'manifest.ini'))
+    status, todo, matrix = manifest.select()
+    assert manifest.get_sources(status, matrix) == list(manifest.sources.values())
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from notes import EMPTY_NOTES, NotesIndex
+
+def write_notes(directory, name, text, mtime_ns = None):
+    path = directory / (name + '.cfg')
+    path.write_text(text)
+    if mtime_ns:
+        os.utime(path, ns = (mtime_ns, mtime_ns))
+
+def test_sections(tmp_path):
+    write_notes(tmp_path, 'f39', '[willfix]\nzlib: needs a patch\nBash: fixed upstream\n[wontfix]\nzlib: gcc only\n')
+    notes = NotesIndex(str(tmp_path)).get('f39')
+    assert notes.get_section('willfix') == {'zlib' : 'needs a patch', 'Bash' : 'fixed upstream'}
+    assert notes.get_section('unknown') == {}
+    # Names keep their case, and the last section a package is in wins.
+    assert notes.get('Bash') == 'fixed upstream'
+    assert notes.get('zlib') == 'gcc only'
+    assert notes.get('llvm') is None
+    assert notes.error is None
+
+def test_missing_and_broken_files(tmp_path):
+    index = NotesIndex(str(tmp_path))
+    assert index.get('f39') is None
+    write_notes(tmp_path, 'f39', 'zlib: no section\n')
+    assert index.get('f39').error
+    assert index.get('f39').get('zlib') is None
+    assert EMPTY_NOTES.get('zlib') is None
+
+def test_notes_are_shared_until_the_file_changes(tmp_path):
+    write_notes(tmp_path, 'f39', '[willfix]\nzlib: one\n', 1000000000)
+    index = NotesIndex(str(tmp_path))
+    notes = index.get('f39')
+    assert index.get('f39') is notes
+    write_notes(tmp_path, 'f39', '[willfix]\nzlib: two\n', 2000000000)
+    assert index.get('f39') is not notes
+    assert index.get('f39').get('zlib') == 'two'
+
+def test_find(tmp_path):
+    write_notes(tmp_path, 'f38', '[willfix]\nzlib: f38\n')
+    index = NotesIndex(str(tmp_path))
+    assert index.find(['f39', 'f38']).get('zlib') == 'f38'
+    assert index.find(['f40']) is None
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from page_cache import PageHashStore
+
+def test_hash_covers_templates_and_inputs(tmp_path):
+    template = tmp_path / 'template.html'
+    template.write_text('one')
+    store = PageHashStore(str(tmp_path / 'page-hashes.json'))
+    h = store.get_hash([str(template)], {'zlib' : 1, 'bash' : 2}, ['f39'])
+    assert store.get_hash([str(template)], {'bash' : 2, 'zlib' : 1}, ['f39']) == h
+    assert store.get_hash([str(template)], {'zlib' : 1, 'bash' : 3}, ['f39']) != h
+    assert store.get_hash([str(template)], {'zlib' : 1, 'bash' : 2}, ['f38']) != h
+    template.write_text('two')
+    assert store.get_hash([str(template)], {'zlib' : 1, 'bash' : 2}, ['f39']) != h
+
+def test_hashes_are_kept_across_runs(tmp_path):
+    path = str(tmp_path / 'cache' / 'page-hashes.json')
+    store = PageHashStore(path)
+    assert not store.is_current('f39-status', 'abc')
+    store.update('f39-status', 'abc')
+    assert store.is_current('f39-status', 'abc')
+    assert not store.is_current('f39-status', 'def')
+    store.save()
+    store = PageHashStore(path)
+    assert store.is_current('f39-status', 'abc')
+    assert not store.is_current('f39-todo', 'abc')
+    # Forced renders still save the new hashes.
+    store = PageHashStore(path, force_render = True)
+    assert not store.is_current('f39-status', 'abc')
+    store.update('f39-status', 'def')
+    store.save()
+    assert PageHashStore(path).is_current('f39-status', 'def')
+
+def test_broken_file(tmp_path):
+    path = tmp_path / 'page-hashes.json'
+    path.write_text('{')
+    assert PageHashStore(str(path)).hashes == {}
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recorder import ClientProxy, Recorder
+
+class Client:
+    def __init__(self):
+        self.calls = 0
+        self.monitor_proxy = self
+
+    def monitor(self, ownername, projectname, **kwargs):
+        self.calls += 1
+        return {'packages' : [projectname], 'fields' : kwargs.get('additional_fields', [])}
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / 'bundle.json.gz')
+    recorder = Recorder()
+    recorder.record(path)
+    client = Client()
+    proxy = ClientProxy(recorder, 'copr', client)
+    responses = [proxy.monitor_proxy.monitor('@fedora-llvm-team', p, additional_fields = ['url_build_log'])
+                 for p in ['clang-built-f39', 'clang-built-f40']]
+    br_pkgs = recorder.call('buildrequires:eln', lambda : {'zlib', 'llvm'})
+    recorder.save()
+    assert client.calls == 2
+
+    recorder = Recorder()
+    recorder.replay(path)
+    proxy = ClientProxy(recorder, 'copr', None)
+    assert [proxy.monitor_proxy.monitor('@fedora-llvm-team', p, additional_fields = ['url_build_log'])
+            for p in ['clang-built-f39', 'clang-built-f40']] == responses
+    # Sets come back as sets.
+    assert recorder.call('buildrequires:eln', None) == br_pkgs
+    # Calls with other arguments were not recorded.
+    with pytest.raises(Exception, match = 'not in'):
+        proxy.monitor_proxy.monitor('@fedora-llvm-team', 'clang-built-f39')
+
+def test_calls_pass_through_when_not_recording():
+    recorder = Recorder()
+    client = Client()
+    assert ClientProxy(recorder, 'copr', client).monitor_proxy.monitor('a', 'b') == {'packages' : ['b'], 'fields' : []}
+    assert recorder.responses == {}
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scheduler import DependencyError, Scheduler, TaskTimeout
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler({'one' : 1})
+    yield scheduler
+    scheduler.shutdown(True)
+
+def test_result(scheduler):
+    task = scheduler.submit('add', 'local', lambda a, b : a + b, 1, 2)
+    assert task.result(5) == 3
+    assert scheduler.get_failures() == {}
+
+def test_dependencies_are_passed_in_order(scheduler):
+    a = scheduler.submit('a', 'local', lambda : 'a')
+    b = scheduler.submit('b', 'local', lambda : 'b')
+    c = scheduler.submit('c', 'local', lambda x, y, z : x + y + z, 'x', deps = [a, b])
+    assert c.result(5) == 'xab'
+
+def test_failed_dependency(scheduler):
+    def fail():
+        raise ValueError('broken')
+    a = scheduler.submit('a', 'local', fail)
+    b = scheduler.submit('b', 'local', lambda x : x, deps = [a])
+    with pytest.raises(DependencyError):
+        b.result(5)
+    assert sorted(scheduler.get_failures()) == ['a', 'b']
+
+def test_retries(scheduler):
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError('reset')
+        return len(calls)
+    task = scheduler.submit('flaky', 'local', flaky, retries = 2, backoff = 0)
+    assert task.result(5) == 3
+
+def test_gives_up_after_retries(scheduler):
+    calls = []
+    def fail():
+        calls.append(1)
+        raise ConnectionError('reset')
+    task = scheduler.submit('fail', 'local', fail, retries = 1, backoff = 0)
+    with pytest.raises(ConnectionError):
+        task.result(5)
+    assert len(calls) == 2
+
+def test_backend_limit(scheduler):
+    running = []
+    most = []
+    lock = threading.Lock()
+    def work():
+        with lock:
+            running.append(1)
+            most.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+    tasks = [scheduler.submit('t{}'.format(i), 'one', work) for i in range(4)]
+    for t in tasks:
+        t.result(5)
+    assert max(most) == 1
+
+def test_hung_attempt_is_retried_and_not_waited_for():
+    scheduler = Scheduler({'one' : 1})
+    hang = threading.Event()
+    calls = []
+    def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            hang.wait(10)
+        return 'done'
+    task = scheduler.submit('fetch', 'one', fetch, timeout = 0.1, retries = 1, backoff = 0)
+    # The retry only gets a slot if the hung attempt gave its own back.
+    assert task.result(5) == 'done'
+    start = time.time()
+    scheduler.shutdown(True)
+    assert time.time() - start < 1
+    hang.set()
+
+def test_timeout_without_retries(scheduler):
+    hang = threading.Event()
+    task = scheduler.submit('fetch', 'local', hang.wait, 10, timeout = 0.1)
+    with pytest.raises(TaskTimeout):
+        task.result(5)
+    hang.set()
@@ -0,0 +1,103 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fixtures
+from snapshot_cache import CoprSnapshotStore, apply_build, get_max_build_id, trim_package
+
+COPR_URL = 'https://copr.example'
+OWNER = '@fedora-llvm-team'
+PROJECT = 'clang-built-f39'
+
+def make_package(name, latest, succeeded = None):
+    return {'name' : name, 'builds' : {'latest' : latest, 'latest_succeeded' : succeeded}}
+
+# Counts the full listings and the single package lookups made.
+class CountingCopr(fixtures.CoprClient):
+    def __init__(self, projects):
+        super().__init__(projects)
+        self.lists = 0
+        self.gets = []
+
+    def get_package_list(self, ownername, projectname, **kwargs):
+        self.lists += 1
+        return super().get_package_list(ownername, projectname, **kwargs)
+
+    def get_package(self, ownername, projectname, packagename, **kwargs):
+        self.gets.append(packagename)
+        return super().get_package(ownername, projectname, packagename, **kwargs)
+
+@pytest.fixture
+def copr():
+    a = fixtures.make_copr_build(10, 'pkg-a', '1.0-1.fc39', 'succeeded')
+    b = fixtures.make_copr_build(11, 'pkg-b', '1.0-1.fc39', 'running')
+    return CountingCopr({PROJECT : {'packages' : [make_package('pkg-a', a, a), make_package('pkg-b', b)],
+                                    'builds' : [a, b]}})
+
+def get_list(store, copr):
+    return {p['name'] : p for p in store.get_list(copr, COPR_URL, OWNER, PROJECT)}
+
+def add_build(copr, name, build):
+    project = copr.projects[PROJECT]
+    project['builds'].append(build)
+    for p in project['packages']:
+        if p['name'] == name:
+            apply_build(p, build)
+            return
+    project['packages'].append(make_package(name, build, build if build['state'] == 'succeeded' else None))
+
+
+def test_trim_package():
+    build = dict(fixtures.make_copr_build(10, 'pkg-a', '1.0-1.fc39', 'succeeded'), chroots = ['fedora-39-x86_64'])
+    p = trim_package(make_package('pkg-a', build, build))
+    assert p == {'name' : 'pkg-a',
+                 'builds' : {'latest' : {'id' : 10, 'state' : 'succeeded', 'source_package' : {'version' : '1.0-1.fc39'}},
+                             'latest_succeeded' : {'id' : 10, 'state' : 'succeeded',
+                                                   'source_package' : {'version' : '1.0-1.fc39'}}}}
+    assert get_max_build_id({'pkg-a' : p}) == 10
+
+def test_apply_build():
+    p = trim_package(make_package('pkg-a', fixtures.make_copr_build(10, 'pkg-a', '1.0-1.fc39', 'succeeded'),
+                                  fixtures.make_copr_build(10, 'pkg-a', '1.0-1.fc39', 'succeeded')))
+    apply_build(p, fixtures.make_copr_build(12, 'pkg-a', '1.1-1.fc39', 'failed'))
+    assert (p['builds']['latest']['id'], p['builds']['latest_succeeded']['id']) == (12, 10)
+    # An older build that finishes late does not replace a newer one.
+    apply_build(p, fixtures.make_copr_build(11, 'pkg-a', '1.0-2.fc39', 'succeeded'))
+    assert (p['builds']['latest']['id'], p['builds']['latest_succeeded']['id']) == (12, 11)
+
+def test_refreshes_only_changed_packages(copr, tmp_path):
+    store = CoprSnapshotStore(directory = str(tmp_path))
+    assert sorted(get_list(store, copr)) == ['pkg-a', 'pkg-b']
+    assert copr.lists == 1
+
+    add_build(copr, 'pkg-c', fixtures.make_copr_build(12, 'pkg-c', '1.0-1.fc39', 'succeeded'))
+    packages = get_list(CoprSnapshotStore(directory = str(tmp_path)), copr)
+    assert copr.lists == 1
+    # pkg-b was still running, so it is asked for again too.
+    assert sorted(copr.gets) == ['pkg-b', 'pkg-c']
+    assert packages['pkg-c']['builds']['latest']['id'] == 12
+
+def test_expired_snapshot_is_fetched_again(copr, tmp_path):
+    get_list(CoprSnapshotStore(directory = str(tmp_path)), copr)
+    get_list(CoprSnapshotStore(directory = str(tmp_path), ttl = -1), copr)
+    assert copr.lists == 2
+    get_list(CoprSnapshotStore(directory = str(tmp_path), force_refresh = True), copr)
+    assert copr.lists == 3
+
+def test_build_without_a_name_falls_back_to_a_full_listing(copr, tmp_path):
+    store = CoprSnapshotStore(directory = str(tmp_path))
+    get_list(store, copr)
+    copr.projects[PROJECT]['builds'].append(fixtures.make_copr_build(12, None, None, 'importing'))
+    assert sorted(get_list(store, copr)) == ['pkg-a', 'pkg-b']
+    assert copr.lists == 2
+
+def test_snapshots_are_kept_per_project(copr, tmp_path):
+    store = CoprSnapshotStore(directory = str(tmp_path))
+    get_list(store, copr)
+    assert store.load(COPR_URL, OWNER, PROJECT)['max_build_id'] == 11
+    assert store.load(COPR_URL, OWNER, 'clang-built-f38') is None
@@ -0,0 +1,107 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from status_engine import (STATUS_FAILED, STATUS_FIXED, STATUS_MISSING, STATUS_OLD, STATUS_PASS,
+                           STATUS_REGRESSION, PackageIndex, get_status, join, join_all)
+
+class Record:
+    def __init__(self, version, build_passes = True):
+        self.version = version
+        self.build_passes = build_passes
+
+def compare_versions(baseline, test):
+    return (baseline.version > test.version) - (baseline.version < test.version)
+
+BASELINE = {'zlib' : Record(2), 'bash' : Record(2), 'curl' : Record(2, False), 'gawk' : Record(2),
+            'llvm' : Record(2), 'sed' : Record(2, False), 'tar' : Record(2)}
+TEST = {'zlib' : Record(2), 'bash' : Record(3, False), 'curl' : Record(2), 'gawk' : Record(1),
+        'sed' : Record(1, False), 'tar' : Record(3), 'extra' : Record(1)}
+
+def test_get_status():
+    assert get_status(False, True, False, False) == STATUS_MISSING
+    assert get_status(True, True, False, False) == STATUS_REGRESSION
+    assert get_status(True, False, False, False) == STATUS_FAILED
+    assert get_status(True, True, True, False) == STATUS_OLD
+    assert get_status(True, False, True, True) == STATUS_FIXED
+    assert get_status(True, True, True, True) == STATUS_PASS
+
+def test_join():
+    notes = {'sed' : 'needs gcc'}
+    comparison = join(BASELINE, TEST, compare_versions, notes.get)
+    assert comparison.names == sorted(BASELINE)
+    assert comparison.get_status_names() == {'bash' : 'REGRESSION', 'curl' : 'FIXED', 'gawk' : 'OLD',
+                                             'llvm' : 'MISSING', 'sed' : 'FAILED', 'tar' : 'PASS',
+                                             'zlib' : 'PASS'}
+    assert comparison.notes == [None, None, None, None, 'needs gcc', None, None]
+
+def test_stats():
+    stats = join(BASELINE, TEST, compare_versions, {'sed' : 'needs gcc'}.get).get_stats()
+    assert stats.num_fedora_pkgs == 7
+    assert stats.num_missing == 1
+    assert stats.num_clang_pkgs == 4
+    assert stats.num_up_to_date_pkgs == 3
+    # The test builds that pass, and the failing ones with a note.
+    assert stats.num_pass_or_note == 5
+    assert stats.num_regressions == 1
+    assert stats.num_fixed == 1
+
+def test_versions_are_only_compared_for_passing_builds():
+    compared = []
+    def compare(baseline, test):
+        compared.append(test)
+        return compare_versions(baseline, test)
+    join(BASELINE, TEST, compare)
+    assert all(t.build_passes for t in compared)
+    assert len(compared) == 4
+
+def test_set():
+    comparison = join(BASELINE, TEST, compare_versions)
+    i = comparison.names.index('bash')
+    comparison.set(i, BASELINE['bash'], Record(3), compare_versions)
+    assert comparison.statuses[i] == STATUS_PASS
+    i = comparison.names.index('tar')
+    comparison.set(i, BASELINE['tar'], None, compare_versions)
+    assert comparison.statuses[i] == STATUS_MISSING
+    assert comparison.get_stats().num_regressions == 0
+
+def get_columns(comparison):
+    return (comparison.names, comparison.present, comparison.baseline_passes, comparison.test_passes,
+            comparison.up_to_date, comparison.notes, comparison.statuses)
+
+def test_package_index():
+    index = PackageIndex({'baseline' : BASELINE, 'test' : TEST}, ['llvm'])
+    assert index.names == tuple(sorted((set(BASELINE) | set(TEST)) - {'llvm'}))
+    assert 'llvm' not in index.packages['baseline']
+    assert index.columns['test'][index.names.index('extra')] is TEST['extra']
+    assert index.columns['baseline'][index.names.index('extra')] is None
+
+def test_join_all_is_join():
+    sources = {'baseline' : BASELINE, 'test' : TEST, 'other' : {'zlib' : Record(1), 'llvm' : Record(5)}}
+    index = PackageIndex(sources, ['tar'])
+    pairs = [('baseline', 'test'), ('test', 'other'), ('other', 'baseline')]
+    notes = [{'sed' : 'needs gcc'}.get, None, None]
+    comparisons = join_all(index, pairs, compare_versions, notes)
+    for (b, t), get_note, comparison in zip(pairs, notes, comparisons):
+        expected = join(index.packages[b], index.packages[t], compare_versions, get_note)
+        assert get_columns(comparison) == get_columns(expected)
+
+def test_replace():
+    index = PackageIndex({'baseline' : BASELINE, 'test' : TEST}, ['llvm'])
+    zlib = Record(3, False)
+    updated = index.replace('test', {'zlib' : zlib, 'llvm' : Record(3)})
+    assert updated.packages['test']['zlib'] is zlib
+    assert 'llvm' not in updated.packages['test']
+    assert updated.packages['baseline'] is index.packages['baseline']
+    # The index it was made from is left alone.
+    assert index.packages['test']['zlib'] is TEST['zlib']
+    status = join_all(updated, [('baseline', 'test')], compare_versions, [None])[0].get_status_names()
+    assert status['zlib'] == 'REGRESSION'
+
+def test_replace_with_a_new_name():
+    index = PackageIndex({'baseline' : BASELINE, 'test' : TEST})
+    updated = index.replace('baseline', {'new' : Record(1)})
+    assert 'new' in updated.names
+    assert updated.columns['test'][updated.names.index('new')] is None
+    assert 'new' not in index.names
@@ -0,0 +1,74 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fixtures
+import todo_generator
+from notes import NotesIndex
+
+X86 = 'fedora-39-x86_64'
+ARM = 'fedora-39-aarch64'
+
+CONFIG = '''[current]
+url = https://copr.example
+owner = @fedora-llvm-team
+project = clang-built-f39
+
+[next]
+url = https://copr.example
+owner = @fedora-llvm-team
+project = clang-built-f40
+'''
+
+def monitor(packages):
+    return {'output' : 'ok', 'message' : '',
+            'packages' : [{'name' : name, 'chroots' : {c : {'state' : s, 'build_id' : i, 'status' : 0}
+                                                       for c, s in chroots.items()}}
+                          for i, (name, chroots) in enumerate(packages)]}
+
+def project(name):
+    return {'full_name' : '@fedora-llvm-team/' + name,
+            'chroot_repos' : {c : 'https://download.copr.example/{}/{}/'.format(name, c) for c in [X86, ARM]}}
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    (tmp_path / 'f40.cfg').write_text('[willfix]\nbash: needs a patch\n[wontfix]\ngawk: gcc only\n')
+    monkeypatch.setattr(todo_generator, 'notes_index', NotesIndex(str(tmp_path)))
+    current = monitor([('zlib', {X86 : 'succeeded', ARM : 'succeeded'}), ('bash', {X86 : 'failed'}),
+                       ('gawk', {X86 : 'succeeded'})])
+    next = monitor([('zlib', {X86 : 'failed', ARM : 'succeeded'}), ('bash', {X86 : 'failed', ARM : 'failed'}),
+                    ('gawk', {X86 : 'failed'}), ('sed', {X86 : 'succeeded'}), ('tar', {ARM : 'failed'})])
+    return fixtures.CoprClient({'clang-built-f39' : {'monitor' : current, 'project' : project('clang-built-f39')},
+                                'clang-built-f40' : {'monitor' : next, 'project' : project('clang-built-f40')}})
+
+def test_get_packages_named():
+    f = io.StringIO(json.dumps(monitor([('zlib', {X86 : 'failed'}), ('bash', {}), ('zlib', {})])))
+    packages = todo_generator.get_packages_named(f, {'zlib', 'sed'})
+    assert list(packages) == ['zlib']
+    # The first of the packages with a name is kept.
+    assert packages['zlib']['chroots'][X86]['state'] == 'failed'
+
+def test_get_todo_packages(client, tmp_path):
+    config_file = tmp_path / 'f40.ini'
+    config_file.write_text(CONFIG)
+    results = todo_generator.get_todo_packages(str(config_file), lambda **kwargs : client,
+                                               client.open_monitor, None)
+    # Only the failures of the next project that are not wontfix.
+    assert list(results) == ['zlib', 'bash', 'tar']
+    zlib = results['zlib']
+    assert zlib['builds_a']['chroots'][X86]['state'] == 'succeeded'
+    assert zlib['builds_b']['chroots'][X86]['state'] == 'failed'
+    assert zlib['builds_b']['chroots'][X86]['url_build_log'].endswith('/clang-built-f40/fedora-39-x86_64/00-zlib/builder-live.log.gz')
+    # Chroots of the current project a package was not built in are missing.
+    assert results['bash']['builds_a']['chroots'][ARM] == {'state' : 'missing', 'url_build_log' : ''}
+    assert results['tar']['builds_a']['chroots'] == {X86 : {'state' : 'missing', 'url_build_log' : ''},
+                                                     ARM : {'state' : 'missing', 'url_build_log' : ''}}
+    assert [r['note'] for r in results.values()] == ['', 'needs a patch', '']
+    assert {r['os_version'] for r in results.values()} == {'fedora-39'}
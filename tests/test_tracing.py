@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tracing import NULL_SPAN, Tracer
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span('monitor', 'copr') as span:
+        span.set(items = 1)
+    assert span is NULL_SPAN
+    assert tracer.take_events() == []
+
+def test_spans(tmp_path):
+    tracer = Tracer()
+    tracer.enable()
+    with tracer.span('monitor', 'copr', project = 'clang-built-f39') as span:
+        span.set(items = 3, bytes = 100)
+    with pytest.raises(ValueError):
+        with tracer.span('monitor', 'copr'):
+            raise ValueError('bad response')
+    def render():
+        with tracer.span('render', 'page'):
+            pass
+    thread = threading.Thread(target = render, name = 'render-0')
+    thread.start()
+    thread.join()
+
+    spans = [e for e in tracer.events if e['ph'] == 'X']
+    assert [(e['cat'], e['name']) for e in spans] == [('copr', 'monitor'), ('copr', 'monitor'), ('page', 'render')]
+    assert spans[0]['args'] == {'project' : 'clang-built-f39', 'items' : 3, 'bytes' : 100}
+    assert spans[1]['args'] == {'error' : 'bad response'}
+    # Each thread is named once.
+    assert [e['args']['name'] for e in tracer.events if e['ph'] == 'M'] == [threading.current_thread().name,
+                                                                           'render-0']
+
+    lines = tracer.get_summary().splitlines()
+    assert lines[0].split() == ['category', 'span', 'count', 'total', 's', 'max', 's', 'items', 'bytes']
+    monitor = [l.split() for l in lines if l.startswith('copr')][0]
+    assert monitor[:3] == ['copr', 'monitor', '2'] and monitor[-2:] == ['3', '100']
+
+    path = str(tmp_path / 'trace.json')
+    tracer.export(path)
+    with open(path) as f:
+        assert json.load(f)['traceEvents'] == tracer.events
+
+def test_take_events():
+    tracer = Tracer()
+    tracer.enable()
+    with tracer.span('monitor'):
+        pass
+    events = tracer.take_events()
+    assert len(events) == 2
+    assert tracer.events == []
+    # Events taken from a worker process are added back as they are.
+    tracer.add_events(events)
+    assert tracer.events == events
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+for module in ['rpm', 'dnf', 'hawkey', 'koji']:
+    pytest.importorskip(module)
+
+import fixtures
+import update
+from bench_pkgcompare import OriginalPkgCompare, make_pkgs
+from update import PkgCompare
+
+ROW_FIELDS = ['row_style', 'fedora_build_url', 'nvr', 'rebuild_link', 'clang_build_latest_url',
+              'clang_build_url', 'history']
+
+def get_row(compare_class, pkg, other_pkg):
+    c = compare_class(pkg)
+    c.package_base_link = 'https://copr.example/package/'
+    if other_pkg:
+        c.add_other_pkg(other_pkg)
+    c.html_row(0, {})
+    return c.is_up_to_date(), [getattr(c, f) for f in ROW_FIELDS]
+
+def test_rows_are_the_same_as_before():
+    baseline, test = make_pkgs(200)
+    for pkg, other_pkg in list(zip(baseline, test)) + [(baseline[0], None)]:
+        assert get_row(PkgCompare, pkg, other_pkg) == get_row(OriginalPkgCompare, pkg, other_pkg), pkg.nvr
+
+def test_nvrs_are_parsed_once(monkeypatch):
+    update.get_version_key.cache_clear()
+    parsed = []
+    Subject = update.Subject
+    def counting_subject(nvr):
+        parsed.append(nvr)
+        return Subject(nvr)
+    monkeypatch.setattr(update, 'Subject', counting_subject)
+    baseline, test = make_pkgs(50)
+    for pkg, other_pkg in zip(baseline, test):
+        c = PkgCompare(pkg)
+        c.package_base_link = 'https://copr.example/package/'
+        c.add_other_pkg(other_pkg)
+        for i in range(3):
+            c.is_up_to_date()
+            c.get_other_pkg_status()
+            c.html_row(i, {})
+    assert len(parsed) == len(set(parsed))
+    assert len(parsed) <= 2 * len(baseline)
+    update.get_version_key.cache_clear()
+
+def test_dist_tag_is_only_dropped_from_koji_builds():
+    baseline, test = make_pkgs(1)
+    assert baseline[0].get_nvr_without_dist() == 'pkg0-1.0.0-1'
+    assert test[0].get_nvr_without_dist() == 'pkg0-1.0.0-0.fc39'
+
+@pytest.fixture
+def scheduler(monkeypatch, tmp_path):
+    scheduler = update.Scheduler(update.backend_limits)
+    monkeypatch.setattr(update, 'scheduler', scheduler, raising = False)
+    monkeypatch.setattr(update, 'copr_snapshots', update.CoprSnapshotStore(directory = str(tmp_path)),
+                        raising = False)
+    yield scheduler
+    scheduler.shutdown()
+
+def test_copr_packages_keep_only_what_is_used(scheduler):
+    succeeded = fixtures.make_copr_build(2, 'zlib', '1.3-1', 'succeeded')
+    packages = [{'name' : 'zlib', 'builds' : {'latest' : fixtures.make_copr_build(3, 'zlib', '1.4-1', 'failed'),
+                                              'latest_succeeded' : succeeded}},
+                {'name' : 'bash', 'builds' : {'latest' : fixtures.make_copr_build(4, 'bash', '5.2-1', 'failed'),
+                                              'latest_succeeded' : None}},
+                {'name' : 'sed', 'builds' : {'latest' : None, 'latest_succeeded' : None}}]
+    client = fixtures.CoprClient({'clang-built-f39' : {'packages' : packages}})
+    results = update.CoprResults('https://copr.example', '@fedora-llvm-team', 'clang-built-f39', client)
+    pkgs = results.packages.result()
+    assert sorted(pkgs) == ['bash', 'zlib']
+    assert [(p.nvr, p.build_id, p.build_passes) for p in [pkgs['zlib'], pkgs['bash']]] == [
+        ('zlib-1.3-1', 2, True), ('bash-5.2-1', 4, False)]
+    # The records are slotted, and refer to nothing of the API response.
+    assert not hasattr(pkgs['zlib'], '__dict__')
+    assert pkgs['zlib'].copr_results is results
+    assert pkgs['zlib'].get_page_fields() == ['zlib', 'zlib-1.3-1', True, 2]
+
+def test_koji_packages_keep_only_what_is_used(scheduler):
+    tagged = fixtures.make_tagged('f39', 20, 1)
+    used = {b['name'] for b in tagged[::2]}
+    tagged_builds = scheduler.submit('koji', 'local', lambda : {'f39' : tagged})
+    br_pkgs = scheduler.submit('eln-buildrequires', 'local', lambda : used)
+    pkgs = update.KojiResults('f39', tagged_builds, br_pkgs).packages.result()
+    assert set(pkgs) == used
+    for b in tagged[::2]:
+        assert (pkgs[b['name']].nvr, pkgs[b['name']].build_id) == (b['nvr'], b['build_id'])
+        assert not hasattr(pkgs[b['name']], '__dict__')
@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fixtures
+from copr_client import copr_clients
+from manifest import Source
+from snapshot_cache import CoprSnapshotStore, trim_package
+from watch import BuildEvent, CoprPollSource, QueueEventSource, watch
+
+COPR_URL = 'https://copr.example'
+OWNER = '@fedora-llvm-team'
+PROJECT = 'clang-built-f39'
+
+def make_package(name, build):
+    succeeded = build if build['state'] == 'succeeded' else None
+    return trim_package({'name' : name, 'builds' : {'latest' : build, 'latest_succeeded' : succeeded}})
+
+@pytest.fixture
+def copr(monkeypatch):
+    client = fixtures.CoprClient({PROJECT : {'builds' : []}})
+    monkeypatch.setitem(copr_clients.clients, COPR_URL, client)
+    return client
+
+# A poll source for PROJECT whose snapshot has the finished build 10 of
+# pkg-a and the running build 11 of pkg-b.
+@pytest.fixture
+def poll_source(copr, tmp_path):
+    source = Source(PROJECT, {'type' : 'copr', 'url' : COPR_URL, 'owner' : OWNER, 'project' : PROJECT})
+    packages = {'pkg-a' : make_package('pkg-a', fixtures.make_copr_build(10, 'pkg-a', '1.0-1.fc39', 'succeeded')),
+                'pkg-b' : make_package('pkg-b', fixtures.make_copr_build(11, 'pkg-b', '1.0-1.fc39', 'running'))}
+    store = CoprSnapshotStore(directory = str(tmp_path))
+    return CoprPollSource([source], {PROJECT : {'packages' : packages}}, store, interval = 0)
+
+def set_builds(copr, *builds):
+    copr.projects[PROJECT]['builds'] = list(builds)
+
+def get_events(poll_source):
+    return [(e.package, e.build['id'], e.build['state']) for e in poll_source.poll()]
+
+
+def test_queue_delivers_events_in_order():
+    source = QueueEventSource()
+    delivered = []
+    done = threading.Event()
+    def handle(events):
+        delivered.extend(events)
+        if len(delivered) == 3:
+            done.set()
+
+    stop = threading.Event()
+    thread = threading.Thread(target = watch, args = (source, handle, stop, 0.01))
+    thread.start()
+    try:
+        for i in range(3):
+            source.put(BuildEvent(PROJECT, 'pkg-{}'.format(i), {'id' : i}))
+        assert done.wait(5)
+    finally:
+        stop.set()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert [e.package for e in delivered] == ['pkg-0', 'pkg-1', 'pkg-2']
+    assert all(e.time is not None for e in delivered)
+
+def test_queue_poll_times_out():
+    assert QueueEventSource().poll(0.01) == []
+
+def test_new_build(copr, poll_source):
+    set_builds(copr, fixtures.make_copr_build(12, 'pkg-a', '1.1-1.fc39', 'succeeded'))
+    assert get_events(poll_source) == [('pkg-a', 12, 'succeeded')]
+    assert get_events(poll_source) == []
+
+def test_unfinished_build_is_reported_when_it_finishes(copr, poll_source):
+    set_builds(copr, fixtures.make_copr_build(11, 'pkg-b', '1.0-1.fc39', 'running'))
+    assert get_events(poll_source) == []
+    set_builds(copr, fixtures.make_copr_build(11, 'pkg-b', '1.0-1.fc39', 'failed'))
+    assert get_events(poll_source) == [('pkg-b', 11, 'failed')]
+    assert get_events(poll_source) == []
+
+def test_build_without_a_name(copr, poll_source):
+    build = fixtures.make_copr_build(13, None, None, 'importing')
+    set_builds(copr, fixtures.make_copr_build(11, 'pkg-b', '1.0-1.fc39', 'running'), build)
+    assert get_events(poll_source) == []
+    # Copr can list a build as finished before its package name is known.
+    build['state'] = 'succeeded'
+    assert get_events(poll_source) == []
+    build['source_package'] = {'name' : 'pkg-c', 'version' : '1.0-1.fc39'}
+    assert get_events(poll_source) == [('pkg-c', 13, 'succeeded')]
+
+def test_resumes_after_failed_poll(copr, poll_source):
+    get_list = copr.build_proxy.get_list
+    def fail(*args, **kwargs):
+        raise ConnectionError('connection reset')
+    copr.build_proxy.get_list = fail
+    set_builds(copr, fixtures.make_copr_build(11, 'pkg-b', '1.0-1.fc39', 'succeeded'),
+               fixtures.make_copr_build(12, 'pkg-a', '1.1-1.fc39', 'succeeded'))
+    assert get_events(poll_source) == []
+
+    copr.build_proxy.get_list = get_list
+    assert get_events(poll_source) == [('pkg-b', 11, 'succeeded'), ('pkg-a', 12, 'succeeded')]
+
+def test_resumes_after_poll_fails_part_way(copr, poll_source, monkeypatch):
+    monkeypatch.setattr('snapshot_cache.BUILD_PAGE_SIZE', 2)
+    get_list = copr.build_proxy.get_list
+    def fail_second_page(*args, pagination, **kwargs):
+        if pagination['offset']:
+            raise ConnectionError('connection reset')
+        return get_list(*args, pagination = pagination, **kwargs)
+    copr.build_proxy.get_list = fail_second_page
+    set_builds(copr, *[fixtures.make_copr_build(i, 'pkg-a', '1.1-1.fc39', 'succeeded') for i in range(12, 16)])
+    assert get_events(poll_source) == []
+
+    copr.build_proxy.get_list = get_list
+    assert [e[1] for e in get_events(poll_source)] == [12, 13, 14, 15]
+
+def test_several_builds_in_one_poll(copr, poll_source):
+    set_builds(copr, *[fixtures.make_copr_build(i, 'pkg-a', '1.1-1.fc39', 'succeeded') for i in range(12, 15)])
+    assert [e[1] for e in get_events(poll_source)] == [12, 13, 14]
+    assert poll_source.max_build_id[PROJECT] == 14
+
+def test_deleted_build_does_not_hold_back_the_cursor(copr, poll_source):
+    since = []
+    get_new_builds = poll_source.snapshot_store.get_new_builds
+    def list_builds(client, owner, project, since_id):
+        since.append(since_id)
+        return get_new_builds(client, owner, project, since_id)
+    poll_source.snapshot_store.get_new_builds = list_builds
+
+    # Build 11 was deleted before it finished.
+    set_builds(copr, fixtures.make_copr_build(12, 'pkg-a', '1.1-1.fc39', 'succeeded'))
+    assert get_events(poll_source) == [('pkg-a', 12, 'succeeded')]
+    assert poll_source.unfinished[PROJECT] == set()
+    assert get_events(poll_source) == []
+    assert since == [10, 12]
+
+def test_watch_polls_copr(copr, poll_source):
+    set_builds(copr, fixtures.make_copr_build(12, 'pkg-a', '1.1-1.fc39', 'succeeded'))
+    delivered = []
+    stop = threading.Event()
+    def handle(events):
+        delivered.extend(events)
+        stop.set()
+    watch(poll_source, handle, stop, 0.01)
+    assert [(e.source, e.package, e.build['id']) for e in delivered] == [(PROJECT, 'pkg-a', 12)]
@@ -1,10 +1,13 @@
 import configparser
 import json
-from copr.v3 import Client
 import os
 import sys
 import io
 import urllib
+from notes import notes_index, EMPTY_NOTES
+import copr_monitor
+from copr_client import copr_clients
+from build_logs import log_analyzer, DESCRIPTIONS
 
 def load_config(file):
     c = configparser.ConfigParser()
@@ -12,18 +15,16 @@ def load_config(file):
     return c
 
 def create_copr_client(configfile = None, copr_url = None):
-    if copr_url:
-        config = {'copr_url' : copr_url }
-        return Client(config)
+    return copr_clients.get(copr_url, configfile)
 
-    return Client.create_from_config_file(configfile)
-
-def get_package(name, pkg_list):
-    for p in pkg_list:
-        if p['name'] == name:
-            return p
-
-    return None
+# Returns the packages of the monitor response read from f whose name is in
+# names, by name.  The rest are dropped as they are parsed.
+def get_packages_named(f, names):
+    packages = {}
+    for p in copr_monitor.iter_packages(f):
+        if p['name'] in names:
+            packages.setdefault(p['name'], p)
+    return packages
 
 def get_combined_build_state(chroots):
     state = 'succeeded'
@@ -34,19 +35,6 @@ def get_combined_build_state(chroots):
             break
     return state
 
-def handle_missing_builds(builds_a, builds_b):
-    arches = set([])
-    for builds in [builds_a, builds_b]:
-        for build in builds:
-            arch = build.name.split('-')[-1]
-            if arch not in arches:
-                arches.add(arch)
-
-    for arch in arches:
-        for builds in [builds_a, builds_b]:
-            if not has_arch(builds, arch):
-                builds.append(create_missing_build(arch))
-
 def add_url_build_log_field(project, packages):
     for p in packages:
         for c in p['chroots']:
@@ -59,80 +47,134 @@ def add_url_rebuild_field(project, packages):
     for p in packages:
         p['url_rebuild'] = "https://copr.fedorainfracloud.org/coprs/g/{}/package/{}/rebuild".format(project['full_name'][1:], p['name'])
 
-config_file = './config.ini'
-if len(sys.argv) == 2:
-    config_file = sys.argv[1]
-config = load_config(file=config_file)
-client_next = create_copr_client(copr_url = config.get('next', 'url', fallback = None),
-                                 configfile = config.get('next', 'config', fallback = None))
-client_current = create_copr_client(copr_url = config.get('current', 'url', fallback = None),
-                                    configfile = config.get('current', 'config', fallback = None))
-
-missing = []
-failed = []
-
-project_current = client_current.project_proxy.get(config['current']['owner'], config['current']['project'])
-project_next = client_current.project_proxy.get(config['next']['owner'], config['next']['project'])
-
-response = client_next.monitor_proxy.monitor(config['next']['owner'], config['next']['project'])
-packages_next = response['packages']
-response = client_current.monitor_proxy.monitor(config['current']['owner'], config['current']['project'])
-packages_current = response['packages']
-
-add_url_build_log_field(project_current, packages_current)
-add_url_build_log_field(project_next, packages_next)
-add_url_rebuild_field(project_current, packages_current)
-add_url_rebuild_field(project_next, packages_next)
-#print(json.dumps(packages_next))
-
-results = {}
-
-next_chroot = list(project_next['chroot_repos'].keys())[0]
-next_os_version = "-".join(next_chroot.split('-')[0:2])
-try:
-    filename = f'status/{next_os_version}.cfg'
-    notes_file = open(filename)
-    notes_cfg = configparser.ConfigParser()
-    notes_cfg.optionxform = str
-    notes_cfg.read_file(notes_file)
-except Exception as e:
-    try:
-        notes_file=open('status/' + os.path.basename(config_file)[:-4] + ".cfg")
-        notes_cfg = configparser.ConfigParser()
-        notes_cfg.optionxform = str
-        notes_cfg.read_file(notes_file)
-    except Exception as e:
-        print(e, f"Failed to load notes file: {filename}")
-        notes_cfg = {'willfix' : {}, 'wontfix' : {}}
-
-for p in packages_next:
-    state = get_combined_build_state(p['chroots'])
-    if state == 'succeeded':
-        continue
-
-    if p['name'] in notes_cfg['wontfix']:
-        continue
-
-    failed.append(p)
-
-for p_next in failed:
-    p_current = get_package(p_next['name'], packages_current)
-    if not p_current:
-        p_current = {'name' : p_next['name'], 'chroots' : {} }
-    for c in project_current['chroot_repos']:
-        if c in p_current['chroots']:
+# Tags every failed chroot of packages with the failures found in its build
+# log, and each package with the tags of all of its chroots.
+def add_failure_tags(packages, analyze_log = None):
+    builds = [(p, c) for p in packages for c in sorted(p['chroots']) if p['chroots'][c]['state'] == 'failed']
+    results = log_analyzer.analyze_all([(p['chroots'][c]['build_id'], c, p['chroots'][c]['url_build_log'])
+                                        for p, c in builds], analyze_log)
+    for p in packages:
+        p['tags'] = []
+    for (p, c), result in zip(builds, results):
+        result = result or {'tags' : [], 'lines' : {}}
+        p['chroots'][c]['tags'] = result['tags']
+        p['chroots'][c]['tag_lines'] = result['lines']
+        p['tags'] += [t for t in result['tags'] if t not in p['tags']]
+
+# Returns a note for every package of results that has failure tags but no
+# note yet: the log line of its first tag, or the description of the tag.
+def get_proposed_notes(results):
+    notes = {}
+    for name, result in sorted(results.items()):
+        if result['note'] or not result['tags']:
             continue
-        p_current['chroots'][c] = { 'state' : 'missing', 'url_build_log' : '' } 
-    result = {}
-    result['name'] = p_next['name']
-    result['os_version'] = next_os_version
-    result['builds_a'] = p_current
-    result['builds_b'] = p_next
-    result['note'] = ''
-    if p_next['name'] in notes_cfg['willfix']:
-        result['note'] = notes_cfg['willfix'][p_next['name']]
-
-    results[p_next['name']] = result
-
-with open("packages.json", "w") as out:
-    json.dump(results, out, indent=2)
+        tag = result['tags'][0]
+        lines = [b['tag_lines'][tag] for c, b in sorted(result['builds_b']['chroots'].items())
+                 if tag in b.get('tag_lines', {})]
+        notes[name] = lines[0] if lines else DESCRIPTIONS[tag]
+    return notes
+
+# Writes notes in the format of the status/*.cfg files, to be reviewed and
+# copied into the willfix section of one.
+def write_proposed_notes(notes, output):
+    with open(output, 'w') as f:
+        f.write('[willfix]\n')
+        for name, note in notes.items():
+            f.write('{}: {}\n'.format(name, note.replace('%', '%%')))
+
+def get_notes(config_file, next_os_version):
+    notes = notes_index.find([next_os_version, os.path.basename(config_file)[:-4]])
+    if notes is None:
+        print(f"Failed to load notes file: status/{next_os_version}.cfg")
+        return EMPTY_NOTES
+    if notes.error:
+        print(f"Failed to load notes for {next_os_version}:", notes.error)
+    return notes
+
+def get_copr_url(config, section, client):
+    return config.get(section, 'url', fallback = None) or client.config['copr_url']
+
+def get_todo_packages(config_file, create_client = create_copr_client, open_monitor = copr_monitor.open_monitor,
+                      analyze_log = log_analyzer.analyze):
+    config = load_config(file=config_file)
+    client_next = create_client(copr_url = config.get('next', 'url', fallback = None),
+                                     configfile = config.get('next', 'config', fallback = None))
+    client_current = create_client(copr_url = config.get('current', 'url', fallback = None),
+                                        configfile = config.get('current', 'config', fallback = None))
+
+    project_current = client_current.project_proxy.get(config['current']['owner'], config['current']['project'])
+    project_next = client_next.project_proxy.get(config['next']['owner'], config['next']['project'])
+
+    next_chroot = list(project_next['chroot_repos'].keys())[0]
+    next_os_version = "-".join(next_chroot.split('-')[0:2])
+    notes = get_notes(config_file, next_os_version)
+    wontfix = notes.get_section('wontfix')
+    willfix = notes.get_section('willfix')
+
+    # The monitor responses cover every package of the project, so they are
+    # filtered while they are parsed: only the packages that failed, and
+    # are not wontfix, are kept from the next project, and only those same
+    # packages from the current one.
+    failed = []
+    with open_monitor(get_copr_url(config, 'next', client_next), config['next']['owner'],
+                      config['next']['project']) as f:
+        for p in copr_monitor.iter_packages(f):
+            if get_combined_build_state(p['chroots']) == 'succeeded':
+                continue
+            if p['name'] in wontfix:
+                continue
+            failed.append(p)
+
+    failed_names = set([p['name'] for p in failed])
+    with open_monitor(get_copr_url(config, 'current', client_current), config['current']['owner'],
+                      config['current']['project']) as f:
+        packages_current = get_packages_named(f, failed_names)
+
+    add_url_build_log_field(project_current, packages_current.values())
+    add_url_build_log_field(project_next, failed)
+    add_url_rebuild_field(project_current, packages_current.values())
+    add_url_rebuild_field(project_next, failed)
+    if analyze_log:
+        add_failure_tags(failed, analyze_log)
+
+    results = {}
+    for p_next in failed:
+        p_current = packages_current.get(p_next['name'])
+        if not p_current:
+            p_current = {'name' : p_next['name'], 'chroots' : {} }
+        for c in project_current['chroot_repos']:
+            if c in p_current['chroots']:
+                continue
+            p_current['chroots'][c] = { 'state' : 'missing', 'url_build_log' : '' }
+        result = {}
+        result['name'] = p_next['name']
+        result['os_version'] = next_os_version
+        result['builds_a'] = p_current
+        result['builds_b'] = p_next
+        result['tags'] = p_next.get('tags', [])
+        result['note'] = ''
+        if p_next['name'] in willfix:
+            result['note'] = willfix[p_next['name']]
+
+        results[p_next['name']] = result
+
+    return results
+
+def write_packages_json(results, output):
+    with open(output, "w") as out:
+        # json.dump() writes the encoded document out chunk by chunk.
+        json.dump(results, out, separators=(',', ':'))
+
+def generate_todo(config_file, output = None, create_client = create_copr_client,
+                  open_monitor = copr_monitor.open_monitor, analyze_log = log_analyzer.analyze):
+    results = get_todo_packages(config_file, create_client, open_monitor, analyze_log)
+    if output:
+        write_packages_json(results, output)
+    return results
+
+
+if __name__ == '__main__':
+    config_file = './config.ini'
+    if len(sys.argv) == 2:
+        config_file = sys.argv[1]
+    generate_todo(config_file, 'packages.json')
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+
+# Records spans of the work done by a run and writes them out in the Chrome
+# trace event format, which chrome://tracing and ui.perfetto.dev can load.
+# When tracing is off, span() hands out a shared span that does nothing.
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    # Extra keyword arguments, and the ones given to Span.set(), are kept
+    # with the span; 'items' and 'bytes' are added up in the summary.
+    def span(self, name, category = 'run', **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    def add(self, event):
+        thread = threading.current_thread()
+        with self.lock:
+            if (event['pid'], event['tid']) not in self.threads:
+                self.threads.add((event['pid'], event['tid']))
+                self.events.append({'name' : 'thread_name', 'ph' : 'M', 'pid' : event['pid'],
+                                    'tid' : event['tid'], 'args' : {'name' : thread.name}})
+            self.events.append(event)
+
+    def add_events(self, events):
+        with self.lock:
+            self.events += events
+
+    def take_events(self):
+        with self.lock:
+            events = self.events
+            self.events = []
+            self.threads = set()
+        return events
+
+    def export(self, path):
+        with self.lock:
+            with open(path, 'w') as f:
+                json.dump({'traceEvents' : self.events, 'displayTimeUnit' : 'ms'}, f)
+
+    def get_summary(self):
+        totals = {}
+        with self.lock:
+            for e in self.events:
+                if e['ph'] != 'X':
+                    continue
+                t = totals.setdefault((e['cat'], e['name']), {'count' : 0, 'total' : 0, 'max' : 0,
+                                                              'items' : None, 'bytes' : None})
+                t['count'] += 1
+                t['total'] += e['dur']
+                t['max'] = max(t['max'], e['dur'])
+                for k in ['items', 'bytes']:
+                    if e['args'].get(k) is not None:
+                        t[k] = (t[k] or 0) + e['args'][k]
+
+        lines = ['{:<10} {:<40} {:>6} {:>10} {:>10} {:>10} {:>12}'.format(
+                 'category', 'span', 'count', 'total s', 'max s', 'items', 'bytes')]
+        for (cat, name), t in sorted(totals.items(), key = lambda i : -i[1]['total']):
+            lines.append('{:<10} {:<40} {:>6} {:>10.3f} {:>10.3f} {:>10} {:>12}'.format(
+                         cat, name[:40], t['count'], t['total'] / 1e6, t['max'] / 1e6,
+                         '' if t['items'] is None else t['items'],
+                         '' if t['bytes'] is None else t['bytes']))
+        return '\n'.join(lines)
+
+
+class Span:
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.ts = time.time_ns() // 1000
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = (time.perf_counter_ns() - self.start) // 1000
+        if exc_type:
+            self.args['error'] = str(exc)
+        self.tracer.add({'name' : self.name, 'cat' : self.category, 'ph' : 'X', 'ts' : self.ts, 'dur' : dur,
+                         'pid' : os.getpid(), 'tid' : threading.get_ident(), 'args' : self.args})
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+NULL_SPAN = NullSpan()
+
+tracer = Tracer()
+
+# Runs fn in a worker process and returns its result together with the spans
+# it recorded, for the parent to add to its own trace.
+def call_traced(enabled, fn, *args):
+    if not enabled:
+        return fn(*args), []
+    tracer.enable()
+    tracer.take_events()
+    result = fn(*args)
+    return result, tracer.take_events()
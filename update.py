@@ -1,37 +1,50 @@
 #!/usr/bin/python3
 
-import dnf
 import rpm
-import koji
 import re
 import datetime
 import concurrent.futures
+import multiprocessing
 import configparser
+import json
 import urllib.request
 import io
 from dnf.subject import Subject
 import hawkey
-from copr.v3 import Client
 import threading
 import time
 import os
 import sys
-import subprocess
-import jinja2
+import argparse
+import functools
+from snapshot_cache import CoprSnapshotStore, apply_build
+from br_index import get_reverse_requires
+from scheduler import Scheduler
+from koji_backend import KojiBackend
+from recorder import bundle, make_key, ClientProxy
+from page_cache import PageHashStore
+from history import HistoryStore
+from tracing import tracer, call_traced
+from notes import notes_index, EMPTY_NOTES
+import status_engine
+from manifest import Manifest
+import todo_generator
+import copr_monitor
+from copr_client import copr_clients
+from build_logs import log_analyzer
+from watch import CoprPollSource, POLL_INTERVAL, watch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'copr-reporter'))
+import html_generator
 
 class CoprResults:
-    def __init__(self, url, owner, project):
+    def __init__(self, url, owner, project, client = None):
         self.url = url
-        config = {'copr_url': url  }
-        self.client = Client(config)
+        self.client = client or copr_clients.get(url)
         self.owner = owner
         self.project = project
-        try:
-            self.client.base_proxy.home()
-            self.packages = executor.submit(self.get_packages, clang_gcc_br_pkgs_fedora)
-        except Exception as e:
-            print(project, str(e), file = sys.stderr)
-            self.packages = executor.submit(lambda : {})
+        self.packages = scheduler.submit(project, 'copr', self.get_packages,
+                                         timeout = COPR_TIMEOUT, retries = FETCH_RETRIES)
 
     def get_build_link(self, pkg_id):
         return '{}/coprs/{}/{}/build/{}/'.format(self.url, self.owner.replace('@','g/'), self.project, pkg_id)
@@ -42,73 +55,70 @@ class CoprResults:
     def get_package_link(self, pkg):
         return '{}{}'.format(self.get_package_base_link(), pkg.name)
 
-    def get_packages(self, clang_gcc_br_pkgs_fedora):
-        pkgs = {}
-        for p in self.client.package_proxy.get_list(self.owner, self.project, with_latest_succeeded_build=True, with_latest_build=True):
-            build_passes = True
-            pkg =  p['builds']['latest_succeeded']
+    # Returns the CoprPkg of a trimmed package listing, or None if the
+    # package has no builds.
+    def get_pkg(self, p):
+        build_passes = True
+        pkg =  p['builds']['latest_succeeded']
+        if not pkg:
+            pkg =  p['builds']['latest']
             if not pkg:
-                pkg =  p['builds']['latest']
-                if not pkg:
-                    continue
-                build_passes = False
-            pkg['copr'] = self
-            src_version = pkg['source_package']['version']
-            pkg['nvr'] = "{}-{}".format(p['name'], src_version)
-            pkg['name'] = p['name']
-            pkgs[p['name']] = CoprPkg(pkg, self, build_passes)
-        return pkgs
+                return None
+            build_passes = False
+        src_version = pkg['source_package']['version']
+        nvr = "{}-{}".format(p['name'], src_version)
+        return CoprPkg(p['name'], nvr, pkg['id'], self, build_passes)
 
-    def get_file_prefix(self, is_baseline):
-        if is_baseline:
-            return None
-        return self.project
+    def get_packages(self):
+        pkgs = {}
+        key = make_key('copr-packages', self.url, self.owner, self.project)
+        for p in bundle.call(key, copr_snapshots.get_list, self.client, self.url, self.owner, self.project):
+            pkg = self.get_pkg(p)
+            if pkg:
+                pkgs[p['name']] = pkg
+        return pkgs
 
+# The builds are listed while the BuildRequires are fetched, and only
+# narrowed down to the packages that use gcc or clang once both are done.
 class KojiResults:
-    def __init__(self, tag, koji_url = 'https://koji.fedoraproject.org/kojihub'):
+    def __init__(self, tag, tagged_builds, clang_gcc_br_pkgs):
         self.tag = tag
-        self.session = koji.ClientSession(koji_url)
-        try:
-            self.session.hello()
-            self.packages = executor.submit(self.get_packages, clang_gcc_br_pkgs_fedora)
-        except Exception as e:
-            print(tag, str(e), file = sys.stderr)
-            self.packages = executor.submit(lambda : {})
-
+        self.packages = scheduler.submit(tag, 'local', self.get_packages, deps = [tagged_builds, clang_gcc_br_pkgs])
 
     def get_package_base_link(self):
         return "'https://koji.fedoraproject.org/koji/search?type=package&match=glob&terms="
 
-    def get_packages(self, clang_gcc_br_pkgs_fedora):
-        clang_gcc_br_pkgs = clang_gcc_br_pkgs_fedora
-        tag = "{}-updates".format(self.tag)
+    def get_packages(self, tagged_builds, clang_gcc_br_pkgs):
+        if self.tag not in tagged_builds:
+            raise Exception('Failed to list the builds tagged {}'.format(self.tag))
         pkgs = {}
-        for p in self.session.listTagged(tag = tag, inherit = True, latest = True):
-            if not p['tag_name'].startswith(self.tag):
-                continue
-            if p['name'] not in clang_gcc_br_pkgs.result():
+        for p in tagged_builds[self.tag]:
+            if p['name'] not in clang_gcc_br_pkgs:
                 continue
-
-            pkgs[p['name']] = KojiPkg(p, 'https://koji.fedoraproject.org/koji/')
+            pkgs[p['name']] = KojiPkg(p['name'], p['nvr'], p['build_id'], 'https://koji.fedoraproject.org/koji/')
         return pkgs
 
-    def get_file_prefix(self, is_baseline):
-        if not is_baseline:
-            return None
-        return self.tag
-
-def remove_dist_tag(pkg):
-    return pkg.get_nvr_without_dist()
+# Enough for every package of every project we load, with room to spare.
+NEVR_CACHE_SIZE = 1 << 17
 
-def remove_epoch(pkg):
-    subject = Subject(pkg)
+@functools.lru_cache(maxsize = NEVR_CACHE_SIZE)
+def get_version_key(nvr):
+    subject = Subject(nvr)
     possible_nevr = subject.get_nevra_possibilities(forms=hawkey.FORM_NEVR)
     if not len(possible_nevr):
-        print("Cannot remove epoch for ", pkg, sys.stderr)
-        return pkg
+        print("Cannot parse NEVR for ", nvr, file = sys.stderr)
+        return None
 
+    # The epoch is ignored when comparing packages.
     nevr = possible_nevr[0]
-    return "{}-{}-{}".format(nevr.name, nevr.version, nevr.release)
+    return ("", nevr.version, nevr.release)
+
+def compare_version_keys(a, b):
+    if not a:
+        return 1
+    if not b:
+        return -1
+    return rpm.labelCompare(a, b)
 
 def get_package_link(koji_url, pkg):
     return "{}/search?type=package&match=glob&terms={}".format(
@@ -117,40 +127,34 @@ def get_package_link(koji_url, pkg):
 def get_build_link(koji_url, pkg, search_str = None):
     return pkg.get_build_link(search_str)
 
-def get_base_tag(tag):
-    return tag.split('-')[0]
-
-def tag_to_dist_prefix(tag):
-    basetag = get_base_tag(tag)
-    if basetag.startswith('f'):
-        return "fc{}".format(basetag[1:])
-
-    # eln
-    return basetag
-
-def get_build_link_with_different_dist(koji_url, pkg):
-    if 'copr' in pkg:
-        return pkg['copr'].get_build_link(pkg)
-    tag = pkg['tag_name']
-    nvr = pkg['nvr']
-    #Remove everything after the dist-tag
-    dist_prefix = tag_to_dist_prefix(tag)
-    dist_start = nvr.find(dist_prefix)
-    dist_prefix_end = dist_start + len(dist_prefix)
-    search_str = nvr[0:dist_prefix_end]
-    return get_build_link(koji_url, pkg, search_str)
-
+# Only what the comparisons and the links need is kept, the API responses
+# the packages were made from can be freed once they are parsed.
 class Pkg:
-    def __init__(self, name, nvr, build_passes = True):
+    __slots__ = ['name', 'nvr', 'build_id', 'build_passes', 'version_key', 'version_key_parsed']
+
+    def __init__(self, name, nvr, build_id, build_passes = True):
         self.name = name
         self.nvr = nvr
+        self.build_id = build_id
         self.build_passes = build_passes
+        self.version_key = None
+        self.version_key_parsed = False
+
+    def get_version_key(self):
+        if not self.version_key_parsed:
+            self.version_key = get_version_key(self.get_nvr_without_dist())
+            self.version_key_parsed = True
+        return self.version_key
+
+    def get_page_fields(self):
+        return [self.name, self.nvr, self.build_passes, self.build_id]
 
 
 class KojiPkg(Pkg):
-    def __init__(self, pkg, koji_weburl):
-        super(KojiPkg, self).__init__(pkg['name'], pkg['nvr'])
-        self.pkg = pkg
+    __slots__ = ['koji_weburl']
+
+    def __init__(self, name, nvr, build_id, koji_weburl):
+        super(KojiPkg, self).__init__(name, nvr, build_id)
         self.koji_weburl = koji_weburl
 
     def get_nvr_without_dist(self):
@@ -158,8 +162,7 @@ class KojiPkg(Pkg):
 
     def get_build_link(self, search_str = None):
         if not search_str:
-            build = self.pkg['build_id']
-            return "{}/buildinfo?buildID={}".format(self.koji_weburl, build)
+            return "{}/buildinfo?buildID={}".format(self.koji_weburl, self.build_id)
         return "{}/search?type=build&match=regexp&terms={}".format(
                 self.koji_weburl, search_str)
     
@@ -172,10 +175,11 @@ class KojiPkg(Pkg):
 
 
 class CoprPkg(Pkg):
-    def __init__(self, pkg, copr_results, build_passes):
-        super(CoprPkg, self).__init__(pkg['name'], pkg['nvr'], build_passes)
-        self.pkg = pkg
-        self. copr_results = copr_results
+    __slots__ = ['copr_results']
+
+    def __init__(self, name, nvr, build_id, copr_results, build_passes):
+        super(CoprPkg, self).__init__(name, nvr, build_id, build_passes)
+        self.copr_results = copr_results
     
     def get_nvr_without_dist(self):
         return self.nvr
@@ -184,7 +188,7 @@ class CoprPkg(Pkg):
         return self.copr_results.get_package_base_link()
     
     def get_build_link(self, koji_url, search_str = None):
-        return self.copr_results.get_build_link(self.pkg['id'])
+        return self.copr_results.get_build_link(self.build_id)
 
     def get_package_link(self):
         self.copr_results.get_package_link(self)
@@ -193,46 +197,40 @@ class CoprPkg(Pkg):
 # https://koji.fedoraproject.org/koji/
 class PkgCompare:
 
-    STATUS_REGRESSION = 0
-    STATUS_MISSING = 1
-    STATUS_OLD = 2
-    STATUS_FIXED = 3
-    STATUS_FAILED = 4
-    STATUS_PASS = 5
+    STATUS_REGRESSION = status_engine.STATUS_REGRESSION
+    STATUS_MISSING = status_engine.STATUS_MISSING
+    STATUS_OLD = status_engine.STATUS_OLD
+    STATUS_FIXED = status_engine.STATUS_FIXED
+    STATUS_FAILED = status_engine.STATUS_FAILED
+    STATUS_PASS = status_engine.STATUS_PASS
 
     def __init__(self, pkg):
         self.pkg = pkg
         self.other_pkg = None
         self.note = None
+        self.up_to_date = None
+        self.status = None
 
     def add_other_pkg(self, pkg):
         self.other_pkg = pkg
+        self.up_to_date = None
+        self.status = None
 
     def add_note(self, note):
         self.note = note
 
-    def compare_nvr(self, a_nvr, b_nvr):
-        subject_a = Subject(a_nvr)
-        subject_b = Subject(b_nvr)
-        possible_nevra_a = subject_a.get_nevra_possibilities(forms=hawkey.FORM_NEVR)
-        if not len(possible_nevra_a):
-            return 1
-        possible_nevra_b = subject_b.get_nevra_possibilities(forms=hawkey.FORM_NEVR)
-        if not len(possible_nevra_b):
-            return -1
-        nevra_a = possible_nevra_a[0]
-        nevra_b = possible_nevra_b[0]
-        return rpm.labelCompare(("", nevra_a.version, nevra_a.release), ("", nevra_b.version, nevra_b.release))
-
     def is_up_to_date(self):
+        if self.up_to_date is None:
+            self.up_to_date = self.compute_up_to_date()
+        return self.up_to_date
+
+    def compute_up_to_date(self):
         if not self.other_pkg:
             return False
         if not self.other_pkg.build_passes:
             return False
-        pkg_nvr = remove_epoch(remove_dist_tag(self.pkg))
-        other_nvr = remove_epoch(remove_dist_tag(self.other_pkg))
 
-        return self.compare_nvr(pkg_nvr, other_nvr) <= 0
+        return compare_version_keys(self.pkg.get_version_key(), self.other_pkg.get_version_key()) <= 0
 
     def get_pkg_status(self):
         if not self.pkg.build_passes:
@@ -241,23 +239,14 @@ class PkgCompare:
             return self.STATUS_PASS
 
     def get_other_pkg_status(self):
-        if not self.other_pkg:
-            return self.STATUS_MISSING
-
-        if not self.other_pkg.build_passes:
-            if self.get_pkg_status() == self.STATUS_PASS:
-                return self.STATUS_REGRESSION
-            return self.STATUS_FAILED
-
-        # other_pkg build passes
-        if not self.is_up_to_date():
-            return self.STATUS_OLD
+        if self.status is None:
+            self.status = self.compute_other_pkg_status()
+        return self.status
 
-        # other pkg is up-to-date.
-        if self.get_pkg_status() == self.STATUS_FAILED:
-            return self.STATUS_FIXED
-
-        return self.STATUS_PASS
+    def compute_other_pkg_status(self):
+        other_pkg = self.other_pkg
+        return status_engine.get_status(other_pkg is not None, self.pkg.build_passes,
+                                        other_pkg is not None and other_pkg.build_passes, self.is_up_to_date())
 
 
     def html_row(self, index, pkg_notes):
@@ -329,60 +318,352 @@ class PkgCompare:
         self.note = note
         self.short_note = short_note
 
-class Stats:
-    def __init__(self):
-        self.num_fedora_pkgs = 0
-        self.num_clang_pkgs = 0
-        self.num_up_to_date_pkgs = 0
-        self.num_pass_or_note = 0
-
-        self.num_regressions = 0
-        self.num_fixed = 0
-        self.num_missing = 0
-
-    def html_color_for_percent(percent):
-        return 'black'
-        if percent < 33.3:
-            return 'red'
-        if percent < 66.7:
-            return '#CC9900'
-        return 'green'
-
-
-def get_gcc_clang_users_fedora():
-    # Repo setup
-    base = dnf.Base()
-    conf = base.conf
-    for compose in ['BaseOS', 'AppStream', 'CRB', 'Extras']:
-        base.repos.add_new_repo(f'eln-{compose}-source', conf, baseurl=[f'https://odcs.fedoraproject.org/composes/production/latest-Fedora-ELN/compose/{compose}/source/tree/'])
-    repos = base.repos.get_matching('*')
-    repos.disable()
-    repos = base.repos.get_matching('eln-*-source')
-    repos.enable()
-
-    # Find all the relevant packages
-    base.fill_sack()
-    q = base.sack.query()
-    q = q.available()
-    q = q.filter(requires=['gcc', 'gcc-c++', 'clang'])
-    return set([p.name for p in list(q)])
-
-def get_package_notes(fedora_version):
-    try:
-        notes_cfg = open(f'status/fedora-{fedora_version}.cfg')
-    except:
-        return {}
-    config = configparser.ConfigParser()
-    config.optionxform = str
-    config.read_file(notes_cfg)
-    notes = {}
-    for s in config.sections():
-        notes.update(config[s])
-    return notes
-
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=3)
-
-clang_gcc_br_pkgs_fedora = executor.submit(get_gcc_clang_users_fedora)
+def get_gcc_clang_users_fedora(release = 'eln'):
+    return get_reverse_requires(release, ['gcc', 'gcc-c++', 'clang'])
+
+# The TODO pages talk to Copr through a proxy that records the responses, or
+# answers from the bundle when replaying.
+def create_todo_client(configfile = None, copr_url = None):
+    client = None
+    if bundle.mode != 'replay':
+        client = todo_generator.create_copr_client(configfile, copr_url)
+    return ClientProxy(bundle, 'copr:{}'.format(copr_url or configfile), client)
+
+# The raw monitor responses are recorded, so that a replay filters them with
+# the notes as they are then.
+def open_todo_monitor(copr_url, owner, project):
+    if bundle.mode is None:
+        return copr_monitor.open_monitor(copr_url, owner, project)
+    key = make_key('copr-monitor', copr_url, owner, project)
+    return io.StringIO(bundle.call(key, copr_monitor.read_monitor, copr_url, owner, project))
+
+# Only the tags found in the build logs are recorded, not the logs.
+def analyze_todo_log(build_id, chroot, url):
+    return bundle.call(make_key('build-log', build_id, chroot), log_analyzer.analyze, build_id, chroot, url)
+
+def generate_todo_page(page, config_file, export_json = False, data_pages = False, analyze_logs = True,
+                       propose_notes = False):
+    json_file = f'{page}-packages.json' if export_json else None
+    data_file = f'{page}-todo-data.json' if data_pages else None
+    with tracer.span(f'collect {page}-todo', 'todo') as span:
+        packages = todo_generator.generate_todo(config_file, json_file, create_todo_client, open_todo_monitor,
+                                                analyze_todo_log if analyze_logs else None)
+        span.set(items = len(packages))
+    if propose_notes:
+        todo_generator.write_proposed_notes(todo_generator.get_proposed_notes(packages),
+                                            f'{page}-proposed-notes.cfg')
+    page_hash = page_hashes.get_hash(['template.html'], packages, data_pages)
+    if page_hashes.is_current(f'{page}-todo', page_hash):
+        print(f'{page}-todo is up to date')
+        return
+    with tracer.span(f'render {page}-todo', 'render', items = len(packages)):
+        html_generator.generate_todo_report(packages, f'{page}-todo.html', 'template.html', data_file)
+    page_hashes.update(f'{page}-todo', page_hash)
+
+def get_status_page_hash(file_prefix, baseline_pkgs, test_pkgs, package_notes, package_base_link, data_pages):
+    return page_hashes.get_hash(['status-template.html'], file_prefix,
+                                [baseline_pkgs[p].get_page_fields() for p in sorted(baseline_pkgs)],
+                                [test_pkgs[p].get_page_fields() for p in sorted(test_pkgs)],
+                                package_notes.sections, package_notes.error, package_base_link, use_copr, data_pages)
+
+def compare_pkg_versions(baseline_pkg, test_pkg):
+    return compare_version_keys(baseline_pkg.get_version_key(), test_pkg.get_version_key())
+
+def get_note(package_notes, name):
+    note = package_notes.get(name)
+    if note is None and package_notes.error:
+        return 'Failed to load notes: {}'.format(package_notes.error)
+    return note
+
+def get_comparison(baseline_pkgs, test_pkgs, package_notes):
+    return status_engine.join(baseline_pkgs, test_pkgs, compare_pkg_versions,
+                              lambda name : get_note(package_notes, name))
+
+# Compares the (baseline, test, package_notes) source pairs of pairs in one
+# pass over index.
+def get_comparisons(index, pairs):
+    return status_engine.join_all(index, [(b, t) for b, t, n in pairs], compare_pkg_versions,
+                                  [functools.partial(get_note, n) for b, t, n in pairs])
+
+def compare_package(baseline_pkgs, test_pkgs, comparison, i, package_base_link):
+    name = comparison.names[i]
+    c = PkgCompare(baseline_pkgs[name])
+    c.package_base_link = package_base_link
+    if comparison.notes[i] is not None:
+        c.add_note(comparison.notes[i])
+    c.other_pkg = test_pkgs.get(name)
+    c.up_to_date = comparison.up_to_date[i]
+    c.status = comparison.statuses[i]
+    return c
+
+# Makes the PkgCompare objects that render the rows of a status page, with
+# the statuses already worked out by comparison.
+def compare_packages(baseline_pkgs, test_pkgs, comparison, package_base_link):
+    return [compare_package(baseline_pkgs, test_pkgs, comparison, i, package_base_link)
+            for i in range(len(comparison.names))]
+
+# The fields of a PkgCompare that status-template.html uses.
+STATUS_ROW_FIELDS = ['row_style', 'fedora_build_url', 'nvr', 'rebuild_link', 'clang_build_latest_url',
+                     'clang_build_url', 'history', 'note', 'short_note']
+
+def get_row_class(row_style):
+    if 'todo_row' in row_style:
+        return 'todo_row'
+    return ''
+
+def write_status_data(rows, data_file):
+    with open(data_file, 'w') as f:
+        json.dump({'rows' : [[get_row_class(r['row_style']), r['fedora_build_url'], r['nvr'], r['rebuild_link'],
+                              r['clang_build_latest_url'], r['clang_build_url'], r['history'], r['note']]
+                             for r in rows]},
+                  f, separators=(',', ':'))
+
+def get_history_rows(baseline_pkgs, test_pkgs, comparison):
+    rows = []
+    for name, status in zip(comparison.names, comparison.statuses):
+        pkg = baseline_pkgs[name]
+        other = test_pkgs.get(name)
+        rows.append((name, status, pkg.nvr, other.nvr if other else None,
+                     pkg.build_id, other.build_id if other else None))
+    return rows
+
+def get_status_row(c, index, package_notes):
+    c.html_row(index, package_notes)
+    return {f : getattr(c, f) for f in STATUS_ROW_FIELDS}
+
+def get_status_rows(pkg_compare_list, package_notes):
+    return [get_status_row(c, index, package_notes) for index, c in enumerate(pkg_compare_list)]
+
+# The comparison and rows of one status page.  They are kept by --watch,
+# which updates the rows of the packages whose builds finish.
+class StatusPage:
+    def __init__(self, name, baseline_pkgs, test_pkgs, package_notes, package_base_link, comparison = None):
+        self.name = name
+        self.baseline_pkgs = baseline_pkgs
+        self.test_pkgs = test_pkgs
+        self.package_notes = package_notes
+        self.package_base_link = package_base_link
+        with tracer.span('compare ' + name, 'compare', items = len(baseline_pkgs)):
+            if comparison is None:
+                comparison = get_comparison(baseline_pkgs, test_pkgs, package_notes)
+            self.comparison = comparison
+            self.pkg_compare_list = compare_packages(baseline_pkgs, test_pkgs, self.comparison, package_base_link)
+        with tracer.span('rows ' + name, 'compare'):
+            self.rows = get_status_rows(self.pkg_compare_list, package_notes)
+        self.index = None
+
+    def get_stats(self):
+        return self.comparison.get_stats()
+
+    # Updates the rows of names, after their packages changed in
+    # baseline_pkgs or test_pkgs, which replace the ones of the page.
+    # Returns False if one of them is new in baseline_pkgs, which adds a row
+    # and moves the ones after it, so the page has to be made again.
+    def update(self, names, baseline_pkgs, test_pkgs):
+        self.baseline_pkgs = baseline_pkgs
+        self.test_pkgs = test_pkgs
+        if self.index is None:
+            self.index = {n : i for i, n in enumerate(self.comparison.names)}
+        for name in names:
+            i = self.index.get(name)
+            if i is None:
+                if name in self.baseline_pkgs:
+                    return False
+                continue
+            self.comparison.set(i, self.baseline_pkgs[name], self.test_pkgs.get(name), compare_pkg_versions)
+            c = compare_package(self.baseline_pkgs, self.test_pkgs, self.comparison, i, self.package_base_link)
+            self.pkg_compare_list[i] = c
+            self.rows[i] = get_status_row(c, i, self.package_notes)
+        return True
+
+def render_status_page(file_prefix, stats, rows, date, data_pages = False):
+    data_file = None
+    with tracer.span('render {}-status'.format(file_prefix), 'render', items = len(rows)):
+        if data_pages:
+            data_file = '{}-status-data.json'.format(file_prefix)
+            write_status_data(rows, data_file)
+            rows = []
+        html_generator.render_to_file('status-template.html', '{}-status.html'.format(file_prefix),
+                                      stats = stats, date = date, pkg_compare_list = rows, data_file = data_file)
+
+# A cell of the matrix page is the [version, build link, build passes] of a
+# package in one source, or None if the source does not have it.
+def get_matrix_cell(pkg):
+    if pkg is None:
+        return None
+    return [pkg.nvr[len(pkg.name) + 1:], get_build_link(None, pkg), pkg.build_passes]
+
+# Returns a [name, cell, ...] row for every package of index, with the
+# cells of sources in that order.
+def get_matrix_rows(index, sources):
+    columns = [index.columns[s] for s in sources]
+    return [[name] + [get_matrix_cell(p) for p in pkgs] for name, pkgs in zip(index.names, zip(*columns))
+            if any(pkgs)]
+
+def get_matrix_page_hash(name, sources, rows, data_pages):
+    return page_hashes.get_hash(['matrix-template.html'], name, sources, rows, data_pages)
+
+def get_matrix_stats(sources, rows):
+    stats = []
+    for i, source in enumerate(sources, 1):
+        cells = [r[i] for r in rows if r[i]]
+        stats.append({'source' : source, 'packages' : len(cells), 'passing' : sum([c[2] for c in cells])})
+    return stats
+
+def render_matrix_page(name, sources, rows, date, data_pages = False):
+    data_file = None
+    with tracer.span('render {}-matrix'.format(name), 'render', items = len(rows)):
+        stats = get_matrix_stats(sources, rows)
+        if data_pages:
+            data_file = '{}-matrix-data.json'.format(name)
+            with open(data_file, 'w') as f:
+                json.dump({'rows' : rows}, f, separators=(',', ':'))
+            rows = []
+        html_generator.render_to_file('matrix-template.html', '{}-matrix.html'.format(name), sources = sources,
+                                      stats = stats, rows = rows, date = date, data_file = data_file)
+
+def write_last_updated():
+    with open('last-updated.json', 'w') as f:
+        json.dump({'date' : datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')}, f)
+
+# Applies the builds that finish after the pages are generated, for --watch.
+# Only the rows of the packages that were built are compared again, and
+# only the pages of their projects are rendered again.  The Koji sources
+# are not watched, their pages follow the Copr side.
+class Watcher:
+    def __init__(self, status_page_specs, todo_page_specs, matrix_page_specs, sources, index, pages, data_pages,
+                 analyze_logs):
+        # The sources that failed to load are not in the index, they are not
+        # watched and neither are their pages.
+        self.status_page_specs = [spec for spec in status_page_specs
+                                  if spec.baseline in index.packages and spec.test in index.packages]
+        self.matrix_page_specs = [spec for spec in matrix_page_specs
+                                  if all([s in index.packages for s in spec.sources])]
+        self.sources = sources
+        self.index = index
+        self.pages = pages
+        self.data_pages = data_pages
+        self.analyze_logs = analyze_logs
+        self.todo_pool = concurrent.futures.ThreadPoolExecutor(max_workers = backend_limits['todo'],
+                                                               thread_name_prefix = 'todo')
+        self.snapshots = {}
+        for name, results in sources.items():
+            if not isinstance(results, CoprResults) or name not in index.packages:
+                continue
+            snapshot = copr_snapshots.load(results.url, results.owner, results.project)
+            if snapshot is None:
+                print('No package listing of {}, it is not watched'.format(results.project), file = sys.stderr)
+                continue
+            self.snapshots[name] = snapshot
+        # The TODO pages are regenerated when a build finishes in one of the
+        # projects they compare.
+        self.todo_pages = {}
+        for spec in todo_page_specs:
+            config = configparser.ConfigParser()
+            config.read(spec.config)
+            for section in config.sections():
+                key = (config[section].get('owner'), config[section].get('project'))
+                self.todo_pages.setdefault(key, []).append(spec)
+
+    # Returns the package of the build of event, or None if it has none.
+    def apply(self, event):
+        packages = self.snapshots[event.source]['packages']
+        p = packages.get(event.package)
+        if p is None:
+            p = packages[event.package] = {'name' : event.package,
+                                           'builds' : {'latest' : None, 'latest_succeeded' : None}}
+        apply_build(p, event.build)
+        return self.sources[event.source].get_pkg(p)
+
+    def update_status_page(self, spec, names, history_run):
+        results = (self.sources[spec.baseline], self.sources[spec.test])
+        baseline_pkgs = self.index.packages[spec.baseline]
+        test_pkgs = self.index.packages[spec.test]
+        package_notes = get_package_notes(spec.notes)
+        page = self.pages.get(spec.name)
+        if page is None or not page.update(names, baseline_pkgs, test_pkgs):
+            page = self.pages[spec.name] = StatusPage(spec.name, baseline_pkgs, test_pkgs, package_notes,
+                                                      results[1].get_package_base_link())
+        if history:
+            history.record(history_run, spec.name, get_history_rows(baseline_pkgs, test_pkgs, page.comparison))
+        render_status_page(spec.name, page.get_stats(), page.rows, datetime.datetime.utcnow(), self.data_pages)
+        page_hashes.update(f'{spec.name}-status',
+                           get_status_page_hash(spec.name, baseline_pkgs, test_pkgs, package_notes,
+                                                results[1].get_package_base_link(), self.data_pages))
+
+    def handle(self, events):
+        changed = {}
+        for e in events:
+            if e.package in package_exclude_list:
+                continue
+            pkg = self.apply(e)
+            if pkg:
+                changed.setdefault(e.source, {})[e.package] = pkg
+        for name, pkgs in changed.items():
+            copr_snapshots.save(self.snapshots[name])
+            self.index = self.index.replace(name, pkgs)
+
+        history_run = history.start_run() if history else None
+        updated = []
+        for spec in self.status_page_specs:
+            names = set(changed.get(spec.baseline, {})) | set(changed.get(spec.test, {}))
+            if not names:
+                continue
+            try:
+                self.update_status_page(spec, names, history_run)
+                updated.append(f'{spec.name}-status')
+            except Exception as e:
+                print(spec.name, str(e), file = sys.stderr)
+
+        for spec in self.matrix_page_specs:
+            if changed.keys() & set(spec.sources):
+                rows = get_matrix_rows(self.index, spec.sources)
+                render_matrix_page(spec.name, spec.sources, rows, datetime.datetime.utcnow(), self.data_pages)
+                page_hashes.update(f'{spec.name}-matrix',
+                                   get_matrix_page_hash(spec.name, spec.sources, rows, self.data_pages))
+                updated.append(f'{spec.name}-matrix')
+
+        todo_specs = {}
+        for name in changed:
+            results = self.sources[name]
+            for spec in self.todo_pages.get((results.owner, results.project), []):
+                todo_specs[spec.name] = spec
+        futures = [(spec.name, self.todo_pool.submit(generate_todo_page, spec.name, spec.config, False,
+                                                     self.data_pages, self.analyze_logs))
+                   for spec in todo_specs.values()]
+        for name, f in futures:
+            try:
+                f.result()
+                updated.append(f'{name}-todo')
+            except Exception as e:
+                print(f'{name}-todo', str(e), file = sys.stderr)
+
+        page_hashes.save()
+        write_last_updated()
+        latency = time.time() - min([e.time for e in events])
+        print('{} builds finished, updated {} in {:.1f}s'.format(len(events), ' '.join(updated) or 'nothing',
+                                                                 latency))
+
+def get_package_notes(name):
+    if not name:
+        return EMPTY_NOTES
+    return notes_index.get(name) or EMPTY_NOTES
+
+# The Koji results are recorded per tag, so that a replay can ask for any
+# subset of the tags.
+def list_tagged(koji_backend, tags):
+    if bundle.mode == 'replay':
+        results = {}
+        for t in tags:
+            try:
+                results[t] = bundle.call(make_key('koji-tagged', t), None)
+            except Exception as e:
+                print(str(e), file = sys.stderr)
+        return results
+    results = koji_backend.list_tagged(tags)
+    for t in results:
+        bundle.call(make_key('koji-tagged', t), lambda : results[t])
+    return results
 
 # Exclude clang and llvm packages.
 package_exclude_list = [
@@ -394,127 +675,270 @@ package_exclude_list = [
     'llvm'
 ]
 
-tags = ['f36', 'f37', 'f38', 'f39', 'clang-built-f36', 'clang-built-f37', 'clang-built-f38', 'fedora-37-clang-16']
-
 use_copr = True
 
-f35 = CoprResults(u'https://copr.fedorainfracloud.org', '@fedora-llvm-team', 'clang-built-f35')
-f36 = CoprResults(u'https://copr.fedorainfracloud.org', '@fedora-llvm-team', 'clang-built-f36')
-f37 = CoprResults(u'https://copr.fedorainfracloud.org', '@fedora-llvm-team', 'clang-built-f37')
-f37_clang16 = CoprResults(u'https://copr.fedorainfracloud.org', 'tstellar', 'fedora-37-clang-16')
-f38 = CoprResults(u'https://copr.fedorainfracloud.org', '@fedora-llvm-team', 'clang-built-f38')
-f39 = CoprResults(u'https://copr.fedorainfracloud.org', '@fedora-llvm-team', 'clang-built-f39')
-
-comparisons = [
-(KojiResults('f36'), f36),
-(KojiResults('f37'), f37),
-(KojiResults('f38'), f38),
-(KojiResults('f39'), f39),
-(f35, f36),
-(f36, f37),
-(f37, f38),
-(f37, f37_clang16),
-(f38, f39)
-]
-
-# Assume copr-reporter is in the current directory
-
-if len(tags) !=1 and os.path.isdir('./copr-reporter'):
-
-    pages = ['f37', 'f38', 'f39-llvm19-20240211', 'f39']
-
-    print("COPR REPORTER", pages)
-    old_cwd = os.getcwd()
-    os.chdir('./copr-reporter')
-
-    os.chdir(old_cwd)
-    for p in pages:
-        print('TODO', p)
-        subprocess.call(f'python3 ./todo_generator.py ./copr-reporter/{p}.ini', shell = True)
-        subprocess.call('python3 ./copr-reporter/html_generator.py', shell = True)
-        subprocess.call(f'cp report.html {p}-todo.html', shell = True)
-
-for results in comparisons:
-
+# Number of concurrent requests we send to each backend.
+backend_limits = {
+    'repodata' : 1,
+    'koji' : 1,
+    'copr' : 6,
+    'todo' : 4,
+}
+
+REPODATA_TIMEOUT = 30 * 60
+KOJI_TIMEOUT = 15 * 60
+COPR_TIMEOUT = 15 * 60
+FETCH_RETRIES = 2
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore the cached Copr package listings and fetch them again')
+    parser.add_argument('--export-todo-json', action='store_true',
+                        help='Also write the data of every TODO page to <page>-packages.json')
+    parser.add_argument('--skip-build-logs', action='store_true',
+                        help='Do not tag the failures of the TODO pages from their build logs')
+    parser.add_argument('--propose-notes', action='store_true',
+                        help='Write notes proposed from the build logs of every TODO page to <page>-proposed-notes.cfg')
+    parser.add_argument('--data-pages', action='store_true',
+                        help='Write the table rows of every page to a JSON file that the page renders in the browser')
+    parser.add_argument('--record', metavar='BUNDLE',
+                        help='Save every Copr, Koji and repodata response of this run to BUNDLE')
+    parser.add_argument('--replay', metavar='BUNDLE',
+                        help='Regenerate the pages from the responses saved in BUNDLE, without network access')
+    parser.add_argument('--force-render', action='store_true',
+                        help='Render every page, even the ones whose contents have not changed since the last run')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='Write a Chrome trace of the run to FILE and print a summary of where the time went')
+    parser.add_argument('--manifest', default='manifest.ini',
+                        help='The file listing the sources, comparisons and TODO pages')
+    parser.add_argument('--only', action='append', metavar='PAGES',
+                        help='Comma separated pages to generate, e.g. f39 or f39-status,f38-todo; '
+                             'only the sources those pages use are fetched')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running after the pages are generated, and update them as the builds of the '
+                             'Copr sources finish')
+    parser.add_argument('--poll-interval', type=int, default=POLL_INTERVAL, metavar='SECONDS',
+                        help='How often --watch asks Copr for finished builds')
+    args = parser.parse_args()
+
+    manifest = Manifest(args.manifest)
+    targets = None
+    if args.only:
+        targets = [t for o in args.only for t in o.split(',') if t]
     try:
-        # Get list of package notes
-        fedora_version = results[1].project[-2:]
-        print("Compare: ", fedora_version)
-        package_notes = executor.submit(get_package_notes, fedora_version)
-
-        stats = Stats()
+        status_page_specs, todo_page_specs, matrix_page_specs = manifest.select(targets)
+    except Exception as e:
+        parser.error(str(e))
+
+    if args.trace:
+        tracer.enable()
+
+    if args.record and args.replay:
+        parser.error('--record and --replay cannot be used together')
+    if args.watch and (args.record or args.replay):
+        parser.error('--watch cannot be used with --record or --replay')
+    if args.record:
+        bundle.record(args.record)
+    if args.replay:
+        bundle.replay(args.replay)
+
+    copr_snapshots = CoprSnapshotStore(force_refresh = args.refresh)
+    # Replays are for looking at the pages, so all of them are written.
+    page_hashes = PageHashStore(force_render = args.force_render or args.replay is not None)
+    # Replayed data is not news, so it is kept out of the history.
+    history = None
+    if not args.replay:
+        history = HistoryStore()
+        history_run = history.start_run()
+
+    scheduler = Scheduler(backend_limits)
+
+    # Only start the fetches that the selected pages need.
+    sources = {}
+    needed_sources = manifest.get_sources(status_page_specs, matrix_page_specs)
+    koji_tags = [source.tag for source in needed_sources if source.type == 'koji']
+    if koji_tags:
+        clang_gcc_br_pkgs_fedora = scheduler.submit('eln-buildrequires', 'repodata',
+                                                    bundle.wrap('eln-buildrequires', get_gcc_clang_users_fedora),
+                                                    timeout = REPODATA_TIMEOUT, retries = FETCH_RETRIES)
+        koji_tagged_builds = scheduler.submit('koji', 'koji', list_tagged, KojiBackend(), koji_tags,
+                                              timeout = KOJI_TIMEOUT, retries = FETCH_RETRIES)
+    for source in needed_sources:
+        if source.type == 'koji':
+            sources[source.name] = KojiResults(source.tag, koji_tagged_builds, clang_gcc_br_pkgs_fedora)
+        else:
+            sources[source.name] = CoprResults(source.url, source.owner, source.project)
+
+    todo_pages = {}
+    if todo_page_specs:
+        print("COPR REPORTER", [p.name for p in todo_page_specs])
+    for p in todo_page_specs:
+        todo_pages[p.name] = scheduler.submit('TODO ' + p.name, 'todo', generate_todo_page, p.name, p.config,
+                                              args.export_todo_json, args.data_pages, not args.skip_build_logs,
+                                              args.propose_notes)
+
+    # Rendering is CPU bound, so the status pages are rendered in separate
+    # processes.  forkserver keeps the workers from inheriting the state of
+    # the fetch threads.
+    render_pool = concurrent.futures.ProcessPoolExecutor(mp_context = multiprocessing.get_context('forkserver'))
+    status_pages = {}
+    watched_pages = {}
+
+    # The package lists of all the sources go into one index, which every
+    # page reads from, with the excluded packages taken out once.  The
+    # sources that failed to load are left out, and so are their pages.
+    loaded = {}
+    failed_sources = {}
+    for name, results in sources.items():
+        try:
+            loaded[name] = results.packages.result()
+        except Exception as e:
+            failed_sources[name] = e
+    with tracer.span('package index', 'compare') as span:
+        index = status_engine.PackageIndex(loaded, package_exclude_list)
+        span.set(items = len(index.names))
 
-        file_prefix = results[0].get_file_prefix(True)
-        if not file_prefix:
-            file_prefix = results[1].get_file_prefix(False)
+    skipped_pages = []
+    compared_pages = []
+    for spec in status_page_specs:
 
-        if file_prefix not in tags:
+        file_prefix = spec.name
+        try:
+            print("Compare: ", file_prefix)
+            for source in [spec.baseline, spec.test]:
+                if source in failed_sources:
+                    raise failed_sources[source]
+            results = (sources[spec.baseline], sources[spec.test])
+            package_notes = get_package_notes(spec.notes)
+
+            baseline_pkgs = index.packages[spec.baseline]
+            test_pkgs = index.packages[spec.test]
+
+            if len(baseline_pkgs) == 0 or len(test_pkgs) == 0:
+                raise Exception('Failed to load package lists')
+
+            with tracer.span('hash ' + file_prefix, 'compare'):
+                page_hash = get_status_page_hash(file_prefix, baseline_pkgs, test_pkgs, package_notes,
+                                                 results[1].get_package_base_link(), args.data_pages)
+            stale = not page_hashes.is_current(f'{file_prefix}-status', page_hash)
+            if not stale:
+                print(f'{file_prefix}-status is up to date')
+            # The history is kept for every comparison, whether its page is
+            # rendered or not.
+            if stale or history:
+                compared_pages.append((spec, package_notes, page_hash, stale))
+        except Exception as e:
+            print(e)
+            skipped_pages.append(file_prefix)
             continue
 
-        baseline_pkgs = results[0].packages
-        test_pkgs = results[1].packages
-
-        # Filter out packages form exclude list
-        baseline_pkgs = baseline_pkgs.result()
-        for p in package_exclude_list:
-            if p in baseline_pkgs:
-                del baseline_pkgs[p]
-
-        pkg_compare_list = []
-        for p in sorted(baseline_pkgs.keys()):
-            pkg_compare_list.append(PkgCompare(baseline_pkgs[p]))
+    # The pages are compared in one pass over the index.
+    with tracer.span('compare', 'compare', items = len(compared_pages)):
+        comparisons = get_comparisons(index, [(spec.baseline, spec.test, package_notes)
+                                              for spec, package_notes, page_hash, stale in compared_pages])
 
-        stats.num_fedora_pkgs = len(pkg_compare_list)
-        test_pkgs = test_pkgs.result()
+    for (spec, package_notes, page_hash, stale), comparison in zip(compared_pages, comparisons):
 
-        if len(baseline_pkgs) == 0 or len(test_pkgs) == 0:
-            raise Exception('Failed to load package lists')
-
-        for c in pkg_compare_list:
-
-            c.package_base_link = results[1].get_package_base_link()
-
-            if c.pkg.name in package_notes.result():
-                c.add_note(package_notes.result()[c.pkg.name])
-            elif '__error' in package_notes.result():
-                c.add_note('Failed to load notes: {}'.format(package_notes.result()['__error']))
-
-            test_pkg = test_pkgs.get(c.pkg.name, None)
-            if not test_pkg:
-                stats.num_missing += 1
+        file_prefix = spec.name
+        try:
+            baseline_pkgs = index.packages[spec.baseline]
+            test_pkgs = index.packages[spec.test]
+            if history:
+                with tracer.span('history ' + file_prefix, 'history') as span:
+                    span.set(items = history.record(history_run, file_prefix,
+                                                    get_history_rows(baseline_pkgs, test_pkgs, comparison)))
+            if not stale:
                 continue
+            page = StatusPage(file_prefix, baseline_pkgs, test_pkgs, package_notes,
+                              sources[spec.test].get_package_base_link(), comparison)
+            if args.watch:
+                watched_pages[file_prefix] = page
+            status_pages[file_prefix] = (render_pool.submit(call_traced, tracer.enabled, render_status_page,
+                                                            file_prefix, page.get_stats(), page.rows,
+                                                            datetime.datetime.utcnow(), args.data_pages),
+                                         page_hash)
+        except Exception as e:
+            print(e)
+            skipped_pages.append(file_prefix)
+            continue
 
-            if test_pkg.build_passes:
-                stats.num_clang_pkgs += 1
-                stats.num_pass_or_note += 1
-            elif c.note:
-                stats.num_pass_or_note +=1
-
-            c.add_other_pkg(test_pkg)
-            if c.is_up_to_date():
-                stats.num_up_to_date_pkgs += 1
-
-            status = c.get_other_pkg_status()
-            if status == c.STATUS_REGRESSION:
-                stats.num_regressions += 1
-            elif status == c.STATUS_FIXED:
-                stats.num_fixed += 1
-
-        loader = jinja2.FileSystemLoader(searchpath="./")
-        environment = jinja2.Environment(loader=loader)
-        template = environment.get_template('status-template.html')
-        for index, c in enumerate(pkg_compare_list):
-            c.html_row(index, package_notes.result())
-        text = template.render(
-          stats = stats,
-          date=datetime.datetime.utcnow(),
-          pkg_compare_list = pkg_compare_list
-        )
-        f = open('{}-status.html'.format(file_prefix), 'w')
-        f.write(text)
-        f.close()
-    except Exception as e:
-        print(e)
-        continue
+    matrix_pages = {}
+    for spec in matrix_page_specs:
+        missing = [s for s in spec.sources if s in failed_sources]
+        if missing:
+            print('{}-matrix: failed to load {}'.format(spec.name, ' '.join(missing)))
+            skipped_pages.append(f'{spec.name}-matrix')
+            continue
+        with tracer.span('matrix ' + spec.name, 'compare', items = len(index.names)):
+            rows = get_matrix_rows(index, spec.sources)
+            page_hash = get_matrix_page_hash(spec.name, spec.sources, rows, args.data_pages)
+        if page_hashes.is_current(f'{spec.name}-matrix', page_hash):
+            print(f'{spec.name}-matrix is up to date')
+            continue
+        matrix_pages[spec.name] = (render_pool.submit(call_traced, tracer.enabled, render_matrix_page, spec.name,
+                                                      spec.sources, rows, datetime.datetime.utcnow(),
+                                                      args.data_pages),
+                                   page_hash)
 
-executor.shutdown(True)
+    for p, (future, page_hash) in status_pages.items():
+        try:
+            result, events = future.result()
+            tracer.add_events(events)
+            page_hashes.update(f'{p}-status', page_hash)
+        except Exception as e:
+            print(p, str(e), file = sys.stderr)
+            skipped_pages.append(p)
+    for p, (future, page_hash) in matrix_pages.items():
+        try:
+            result, events = future.result()
+            tracer.add_events(events)
+            page_hashes.update(f'{p}-matrix', page_hash)
+        except Exception as e:
+            print(p, str(e), file = sys.stderr)
+            skipped_pages.append(f'{p}-matrix')
+    render_pool.shutdown(True)
+
+    for p, task in todo_pages.items():
+        try:
+            task.result()
+        except Exception as e:
+            print(f'{p}-todo', str(e), file = sys.stderr)
+            skipped_pages.append(f'{p}-todo')
+
+    failures = scheduler.get_failures()
+    if failures:
+        print('Failed tasks:', file = sys.stderr)
+        for name, e in sorted(failures.items()):
+            print('  {}: {}'.format(name, str(e)), file = sys.stderr)
+    if skipped_pages:
+        print('Pages not updated:', ' '.join(skipped_pages), file = sys.stderr)
+
+    # A replay writes pages too, so the next run has to compare against
+    # what it wrote.
+    page_hashes.save()
+    write_last_updated()
+
+    if args.watch:
+        watcher = Watcher(status_page_specs, todo_page_specs, matrix_page_specs, sources, index, watched_pages,
+                          args.data_pages, not args.skip_build_logs)
+        copr_sources = [manifest.sources[n] for n in watcher.snapshots]
+        print('Watching', ' '.join([s.project for s in copr_sources]))
+        try:
+            watch(CoprPollSource(copr_sources, watcher.snapshots, copr_snapshots, args.poll_interval),
+                  watcher.handle)
+        except KeyboardInterrupt:
+            pass
+        watcher.todo_pool.shutdown()
+
+    scheduler.shutdown(True)
+    log_analyzer.shutdown()
+    copr_clients.close()
+    bundle.save()
+
+    if not args.replay:
+        history.close()
+
+    if args.trace:
+        tracer.export(args.trace)
+        print(tracer.get_summary(), file = sys.stderr)
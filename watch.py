@@ -0,0 +1,117 @@
+import queue
+import sys
+import time
+
+from copr_client import copr_clients
+from snapshot_cache import FINAL_BUILD_STATES, get_max_build_id, is_unfinished
+from tracing import tracer
+
+POLL_INTERVAL = 60
+
+# A build of package in the Copr project of source that finished.
+class BuildEvent:
+    __slots__ = ['source', 'package', 'build', 'time']
+
+    def __init__(self, source, package, build, time = None):
+        self.source = source
+        self.package = package
+        self.build = build
+        self.time = time
+
+
+# The event sources hand out the builds that finished since the last call
+# to poll(), waiting up to timeout seconds for the first one.
+
+# Builds are put() by whoever learns about them, e.g. a message bus
+# listener, or the benchmarks.
+class QueueEventSource:
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def put(self, event):
+        if event.time is None:
+            event.time = time.time()
+        self.queue.put(event)
+
+    def poll(self, timeout = None):
+        try:
+            events = [self.queue.get(timeout = timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+
+# Asks Copr for the builds of each project that are newer than the newest
+# one seen, or than the oldest one that had not finished.  snapshots maps
+# the name of each source to its CoprSnapshotStore snapshot, which tells
+# where to start.
+class CoprPollSource:
+    def __init__(self, sources, snapshots, snapshot_store, interval = POLL_INTERVAL):
+        self.sources = sources
+        self.snapshot_store = snapshot_store
+        self.interval = interval
+        self.next_poll = time.time() + interval
+        self.max_build_id = {}
+        self.unfinished = {}
+        for s in sources:
+            packages = snapshots[s.name]['packages']
+            self.max_build_id[s.name] = get_max_build_id(packages)
+            self.unfinished[s.name] = set([p['builds']['latest']['id'] for p in packages.values() if is_unfinished(p)])
+
+    def poll_source(self, source):
+        events = []
+        unfinished = self.unfinished[source.name]
+        max_build_id = self.max_build_id[source.name]
+        since_id = max_build_id
+        if unfinished:
+            since_id = min(since_id, min(unfinished) - 1)
+        client = copr_clients.get(source.url)
+        listed = set()
+        with tracer.span('poll ' + source.project, 'watch') as span:
+            for b in self.snapshot_store.get_new_builds(client, source.owner, source.project, since_id):
+                listed.add(b['id'])
+                name = (b['source_package'] or {}).get('name')
+                # Builds have no package name until their SRPM is imported,
+                # so they are asked for again until they have one.
+                if not name or b['state'] not in FINAL_BUILD_STATES:
+                    unfinished.add(b['id'])
+                elif b['id'] > max_build_id or b['id'] in unfinished:
+                    unfinished.discard(b['id'])
+                    events.append(BuildEvent(source.name, name, b, time.time()))
+            # Every build after since_id was listed, so the unfinished ones
+            # that were not have been deleted, and must not hold the next
+            # poll back.  A listing that fails part way leaves the cursor
+            # where it was, so the next poll goes through it all again.
+            unfinished.intersection_update(listed)
+            self.max_build_id[source.name] = max([max_build_id] + list(listed))
+            span.set(items = len(events))
+        return events
+
+    def poll(self, timeout = None):
+        delay = self.next_poll - time.time()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+        self.next_poll = time.time() + self.interval
+        events = []
+        for s in self.sources:
+            try:
+                events += self.poll_source(s)
+            except Exception as e:
+                print('Failed to poll {}: {}'.format(s.project, e), file = sys.stderr)
+        # Oldest first, so the latest build of a package is applied last.
+        return sorted(events, key = lambda e : e.build['id'])
+
+
+# Hands the events of source to handle() until stop is set.
+def watch(source, handle, stop = None, timeout = 1):
+    while not (stop and stop.is_set()):
+        events = source.poll(timeout)
+        if events:
+            handle(events)